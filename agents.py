@@ -1,6 +1,15 @@
 import random
 import math
 import heapq
+from grid import FREE, GOAL, OBSTACLE, OCCUPIED, FlatGrid
+from search import a_star, SearchWorkspace, SQRT2
+from fields import heuristic_field
+from frontier import IndexedPriorityQueue, CoordinateFrontier
+from profiling import NO_PROFILE
+
+# the local search agents give up on a cell with a penalty over 100,
+# so their 16 bit penalty counters stop counting here
+MAX_PENALTY = 101
 
 class Agent():
     '''
@@ -8,7 +17,34 @@ class Agent():
 
     open_moves() and move() are not defined,
     that is left to the child classes.
+
+    Agents keep their state compact: every class declares __slots__, and
+    the visited maps and penalties that grow with a search are kept in
+    lists and arrays indexed by the flat index of a cell in self.flat
+    (see grid.FlatGrid), instead of sets and dicts of (i, j) tuples.
+    Agents placed by a Board share its FlatGrid and borrow those buffers
+    from the Board's search.WorkspacePool, see search_workspace(), so
+    placing an agent allocates nothing the size of the board.
+
+    Phases are timed with self.profile, see profiling.py and set_profile().
+
+    Every agent counts the work of its own searches as it goes, and reports
+    it from stats(), see metrics.py: nodes_expanded, nodes_generated,
+    peak_frontier and peak_visited. Agents that plan a path count the
+    search.SearchResults of their searches with count_search(), agents that
+    search one move at a time count every move with count_step().
     '''
+    __slots__ = ('color', 'i', 'j', 'goal_i', 'goal_j', 'frontier', 'searched', 'penalties', 'start_heuristic',
+                 'no_solution', 'heuristic_calls', 'path_cost', 'board', 'owner', 'field', 'field_goal', 'flat',
+                 'workspace', 'profile', 'nodes_expanded', 'nodes_generated', 'peak_frontier', 'peak_visited')
+
+    # distance metric used by the heuristic field, see fields.METRICS
+    heuristic_metric = 'euclidean'
+
+    # planner class that plans all agents of this class on a board together,
+    # see multiagent.py. None for agents that plan on their own.
+    team_planner = None
+
     def __init__(self, color, i, j, goal_i, goal_j, board):
         self.color = color
         self.i = i
@@ -16,11 +52,23 @@ class Agent():
         self.goal_i = goal_i
         self.goal_j = goal_j
         self.frontier = []
-        self.searched = []
+        self.searched = None
+        self.penalties = None
         self.start_heuristic = 0
         self.no_solution = False
         self.heuristic_calls = 0
+        self.path_cost = -1
         self.board = board
+        self.owner = None
+        self.field = None
+        self.field_goal = None
+        self.flat = None
+        self.workspace = None
+        self.profile = NO_PROFILE
+        self.nodes_expanded = 0
+        self.nodes_generated = 0
+        self.peak_frontier = 0
+        self.peak_visited = 0
 
     def name(self):
         '''
@@ -28,6 +76,100 @@ class Agent():
         '''
         return 'Agent'
 
+    def set_profile(self, profile):
+        '''
+        Time the agent's phases with the given profiling.Profile,
+        or NO_PROFILE to stop timing them
+        '''
+        self.profile = profile
+
+    def attach(self, owner):
+        '''
+        Called by the Board that places this agent, so the agent can use
+        what the Board caches, like its distance fields.
+
+        If the Board's component labels show the goal can't be reached,
+        the agent gives up right away instead of searching until it runs out
+        of cells, penalties or iterations.
+        '''
+        self.owner = owner
+        if not owner.reachable((self.i, self.j), (self.goal_i, self.goal_j)):
+            self.no_solution = True
+
+    def detach(self):
+        '''
+        Called by the Board when it removes this agent. The search workspace
+        goes back to the Board's pool for the next agent.
+        '''
+        if self.workspace != None and self.owner != None:
+            self.owner.workspaces.release(self.workspace)
+        self.workspace = None
+
+    def search_workspace(self, board):
+        '''
+        The agent's search.SearchWorkspace, loaded with the current cells
+        of the board. It comes from the owner's pool, or is made new
+        for an agent without a Board, and is kept until detach().
+        '''
+        if self.workspace == None:
+            if self.owner != None:
+                self.workspace = self.owner.workspaces.acquire(board)
+            else:
+                self.workspace = SearchWorkspace(board)
+        else:
+            self.workspace.load(board)
+        return self.workspace
+
+    def start_penalties(self):
+        '''
+        Take zeroed penalty counters from the agent's workspace, see
+        search.SearchWorkspace.counters(), and the FlatGrid they are
+        indexed by. The local search agents call this on first use.
+        '''
+        self.flat_grid(self.board)
+        self.penalties = self.search_workspace(self.board).counters()
+        return self.penalties
+
+    def count_search(self, result):
+        '''
+        Add the counts of a search.SearchResult. Expanded and generated
+        cells add up over the searches, the peaks are the largest search's.
+        '''
+        self.nodes_expanded += result.expanded
+        self.nodes_generated += result.generated
+        if result.peak_frontier > self.peak_frontier:
+            self.peak_frontier = result.peak_frontier
+        if result.peak_visited > self.peak_visited:
+            self.peak_visited = result.peak_visited
+
+    def count_step(self, expanded, generated, frontier, visited):
+        '''
+        Count a move of an agent that searches one move at a time: the cells
+        it expanded and the new cells it generated on the move, and the size
+        of its frontier and the number of cells it holds after it
+        '''
+        self.nodes_expanded += expanded
+        self.nodes_generated += generated
+        if frontier > self.peak_frontier:
+            self.peak_frontier = frontier
+        if visited > self.peak_visited:
+            self.peak_visited = visited
+
+    def count_local_step(self):
+        '''
+        Count a move of a local search. It expands the cell it stands on into
+        the moves in its frontier, and holds nothing else.
+        '''
+        n = len(self.frontier)
+        self.count_step(1, n, n, n + 1)
+
+    def cells_changed(self, cells):
+        '''
+        Called by the Board when obstacles are added or removed, with the
+        (i, j) cells that changed. Agents that plan ahead override this.
+        '''
+        pass
+
     def is_goal(self):
         '''
         Return True if the agent is in its goal state
@@ -43,9 +185,27 @@ class Agent():
         if j == None:
             j = self.j
         self.heuristic_calls += 1
-        # computing a square root is slow, make a heuristic that doesn't use it?
-        return ((self.goal_i - i) ** 2 + (self.goal_j - j) ** 2) ** (1/2)
-        # return max(abs(self.goal_i - i), abs(self.goal_j - j))
+        return self.heuristic_lookup(i, j)
+
+    def heuristic_lookup(self, i, j):
+        '''
+        Look the heuristic up in a field that is computed once per goal,
+        instead of computing a square root on every call
+        '''
+        if self.field_goal != (self.goal_i, self.goal_j):
+            self.field = self.metric_field(self.goal_i, self.goal_j)
+            self.field_goal = (self.goal_i, self.goal_j)
+        return self.field.item(i, j)
+
+    def metric_field(self, i, j):
+        '''
+        The heuristic field toward (i, j), from the Board's cache if we
+        were placed by one
+        '''
+        if self.owner != None:
+            return self.owner.heuristic_field((i, j), self.heuristic_metric)
+        rows, cols = self.board.shape
+        return heuristic_field(rows, cols, i, j, self.heuristic_metric)
 
     def get_choice(self, frontier, heuristic):
         '''
@@ -53,85 +213,188 @@ class Agent():
 
         Returns a tuple of (index, value)
         '''
+        start = self.profile.start()
         best = float('inf')
         best_idx = -1
         for i in range(len(frontier)):
             coord = frontier[i]
-            if heuristic(coord[0], coord[1]) < best:
-                best = heuristic(coord[0], coord[1])
+            value = heuristic(coord[0], coord[1])
+            if value < best:
+                best = value
                 best_idx = i
 
+        self.profile.stop('get_choice', start)
         return best_idx
     
+    def flat_grid(self, board):
+        '''
+        The grid.FlatGrid that open_moves expands neighbors with.
+        Agents placed by a Board share the Board's, others make their own
+        once per board grid.
+        '''
+        if self.flat == None or self.flat.grid is not board:
+            if self.owner != None and self.owner.board is board:
+                self.flat = self.owner.flat_grid()
+            else:
+                self.flat = FlatGrid(board)
+        return self.flat
+
     def open_moves(self, board):
         pass
+
+    def timed_open_moves(self, board, *args):
+        '''
+        open_moves, timed as the 'open_moves' phase of the agent's profile
+        '''
+        start = self.profile.start()
+        moves = self.open_moves(board, *args)
+        self.profile.stop('open_moves', start)
+        return moves
     
     def move(self, board):
         pass
 
     def sort_frontier(self):
         self.frontier.sort(key=lambda coord: self.heuristic(coord[0], coord[1]) + 1)
+
+    def stats(self):
+        '''
+        Extra statistics to report from Board.test, as a dict of name -> value.
+        Each one becomes a '<name>_<stat>' column in the results.
+        Subclasses add theirs to the search counts of metrics.COUNTS.
+        '''
+        return {'nodes_expanded': self.nodes_expanded, 'nodes_generated': self.nodes_generated,
+                'peak_frontier': self.peak_frontier, 'peak_visited': self.peak_visited}
     
     def __repr__(self):
         return f'Agent at position ({self.i}, {self.j}) color {self.color}'
     
 
 class AStarAgent(Agent):
+    '''
+    A* agent backed by the core search engine in search.py.
+
+    On its first move the agent plans a full path with real g-costs,
+    and every move after that steps one cell along the path. If the board
+    changes it plans again from where it stands, and path_cost is the
+    distance travelled so far plus the new plan's cost.
+
+    The greedy subclasses in optimized_agents.py instead expand one cell per
+    move. Their frontier is an IndexedPriorityQueue keyed on the heuristic,
+    so checking it and taking the best cell don't scan the whole frontier.
+    Both the frontier and the searched map hold flat indices. The searched
+    map is the closed list of the agent's workspace: a cell is searched when
+    its entry holds the agent's stamp, so it never needs clearing.
+    '''
+    __slots__ = ('path', 'path_index', 'stamp', 'travelled')
+
+    def __init__(self, color, i, j, goal_i, goal_j, board):
+        super().__init__(color, i, j, goal_i, goal_j, board)
+        self.path = None
+        self.path_index = 0
+        self.frontier = IndexedPriorityQueue()
+        self.stamp = 0
+        self.travelled = 0
+
     def name(self):
         '''
         Use this name function for hashing
         '''
         return 'AStarAgent'
+
+    def set_profile(self, profile):
+        super().set_profile(profile)
+        self.frontier.profile = profile
         
-    def open_moves(self, board):
+    def start_searched(self, board):
         '''
-        Returns a list of open moves for the given board
+        Take the searched map from the workspace and a fresh stamp for it
         '''
-        options = [
-            (self.i, self.j),
-            (self.i + 1, self.j),
-            (self.i + 1, self.j + 1),
-            (self.i + 1, self.j - 1),
-            (self.i, self.j + 1),
-            (self.i, self.j - 1),
-            (self.i - 1, self.j + 1),
-            (self.i - 1, self.j),
-            (self.i - 1, self.j - 1),
-        ]
+        workspace = self.search_workspace(board)
+        self.searched = workspace.closed
+        self.stamp = workspace.begin()
 
-        out = []
-        n = len(board)
-        for coord in options:
-            i, j = coord
-            is_valid = 0 <= i < n and 0 <= j < n
-            check_searhced = coord not in self.searched and coord not in self.frontier
-            if is_valid and check_searhced and (not board[i][j] or board[i][j] == 1):
-                out.append(coord)
-                # heapq.heappush(self.frontier, (self.heuristic(i, j), coord))
-        return out
+    def open_moves(self, board):
+        '''
+        Returns the flat indices of the open moves for the given board
+        '''
+        if self.searched == None:
+            self.start_searched(board)
+        flat = self.flat_grid(board)
+        searched = self.searched
+        stamp = self.stamp
+        frontier = self.frontier
+        return [k for k in flat.open_neighbors(flat.index(self.i, self.j)) if searched[k] != stamp and k not in frontier]
     
 
-    def move(self, board):
+    def expand(self, board):
         '''
-        Moves the given agent on the board
+        Push the open moves onto the frontier and pop the best cell,
+        or return None if the frontier is empty
         '''
-        if self.is_goal():
-            return
-        
-        moves = self.open_moves(board)
-        self.frontier += moves
-        
+        moves = self.timed_open_moves(board)
+        # open_moves sets up self.flat on the first move
+        flat = self.flat
+        for k in moves:
+            i, j = flat.coord(k)
+            self.frontier.push(k, self.heuristic(i, j))
+        # the search holds the cells it expanded, this one included, and its frontier
+        self.count_step(1, len(moves), len(self.frontier), self.nodes_expanded + 1 + len(self.frontier))
         if not self.frontier:
+            return None
+        return flat.coord(self.frontier.pop())
+
+    def search(self, board):
+        '''
+        Run the search engine from the current position to the goal.
+        Subclasses can swap in a different search algorithm here.
+        '''
+        return a_star(board, (self.i, self.j), (self.goal_i, self.goal_j), self.heuristic, self.search_workspace(board))
+
+    def cells_changed(self, cells):
+        '''
+        The planned path may run through a new obstacle, or a shorter one
+        may have opened up. Drop it and search again from scratch on the
+        next move.
+        '''
+        self.path = None
+
+    def plan(self, board):
+        '''
+        Search for a path to the goal and store it
+        '''
+        result = self.search(board)
+        self.count_search(result)
+        if result.path == None:
             self.no_solution = True
             return
-        
-        idx = self.get_choice(self.frontier, self.heuristic)
-        coord = self.frontier.pop(idx)
 
-        board[self.i][self.j] = 0
+        self.path = result.path
+        self.path_index = 1
+        self.path_cost = self.travelled + result.cost
+
+    def move(self, board):
+        '''
+        Moves the given agent one step along its planned path
+        '''
+        if self.is_goal() or self.no_solution:
+            return
+
+        if self.path == None:
+            start = self.profile.start()
+            self.plan(board)
+            self.profile.stop('search', start)
+            if self.no_solution:
+                return
+
+        coord = self.path[self.path_index]
+        self.path_index += 1
+        i, j = coord
+        self.travelled += SQRT2 if i != self.i and j != self.j else 1
+
+        board[self.i, self.j] = FREE
         self.i, self.j = coord
-        board[self.i][self.j] = self
-        self.searched.append((self.i, self.j))
+        board[self.i, self.j] = OCCUPIED
 
 
 class BidirectionalSearchAgent(Agent):
@@ -141,7 +404,15 @@ class BidirectionalSearchAgent(Agent):
     We will employ A* but from both ways. This way 
     we can search towards each other instead of one direction
     at a time.
+
+    Each end ranks its frontier by the distance to the other end, which
+    moves on every step, so the frontiers are CoordinateFrontiers that
+    find the nearest cell in one vectorized pass. The searched maps of the
+    two ends are the closed lists of the agent's workspace and its reverse,
+    stamped like AStarAgent's.
     '''    
+    __slots__ = ('goal_frontier', 'goal_searched', 'stamp', 'goal_stamp')
+
     def __init__(self, color, i, j, goal_i, goal_j, board):
         '''
         In this new init function, we define 'self.iterations',
@@ -152,11 +423,19 @@ class BidirectionalSearchAgent(Agent):
         spaces we will search for a move after running into a local max
         '''
         super().__init__(color, i, j, goal_i, goal_j, board)
-        self.goal_frontier = []
-        self.goal_searched = []
+        self.frontier = CoordinateFrontier()
+        self.goal_frontier = CoordinateFrontier()
+        self.goal_searched = None
+        self.stamp = 0
+        self.goal_stamp = 0
     
     def name(self):
         return 'BidirectionalSearchAgent'
+
+    def set_profile(self, profile):
+        super().set_profile(profile)
+        self.frontier.profile = profile
+        self.goal_frontier.profile = profile
         
     def open_moves(self, board, i=None, j=None, goal=False):
         '''
@@ -167,40 +446,22 @@ class BidirectionalSearchAgent(Agent):
         if j == None:
             j = self.j
 
-        options = [
-            (i + 1, j),
-            (i + 1, j + 1),
-            (i + 1, j - 1),
-            (i, j + 1),
-            (i, j - 1),
-            (i - 1, j + 1),
-            (i - 1, j),
-            (i - 1, j - 1),
-        ]
+        flat = self.flat_grid(board)
+        meeting = flat.marked_neighbor(i, j)
+        if meeting != None:
+            self.frontier.reset([meeting])
+            self.goal_frontier.reset([meeting])
+            return []
 
-        out = []
-        n = len(board)
-        for coord in options:
-            i, j = coord
-
-            is_valid = 0 <= i and i < n and 0 <= j and j < n
-            if not is_valid:
-                continue
-
-            check_searhced = coord not in self.searched and coord not in self.frontier
-
-            if goal:
-                check_searhced = coord not in self.goal_searched and coord not in self.goal_frontier
-
-            if board[i][j] == 1 or isinstance(board[i][j], Agent):
-                self.frontier = [(i, j)]
-                self.goal_frontier = [(i, j)]
-                return []
-                # return [coord]
-            
-            if check_searhced and (not board[i][j] or board[i][j] == 1):
-                out.append(coord)
-        return out
+        searched = self.searched
+        stamp = self.stamp
+        frontier = self.frontier
+        if goal:
+            searched = self.goal_searched
+            stamp = self.goal_stamp
+            frontier = self.goal_frontier
+        return [(ni, nj) for ni, nj in flat.open_coords(i, j)
+                if searched[flat.index(ni, nj)] != stamp and (ni, nj) not in frontier]
     
 
     def move(self, board):
@@ -212,38 +473,48 @@ class BidirectionalSearchAgent(Agent):
         '''
         if self.is_goal():
             return
-        
-        moves = self.open_moves(board)
-        self.frontier += moves
 
-        moves = self.open_moves(board, self.goal_i, self.goal_j, True)
-        self.goal_frontier += moves
+        if self.searched == None:
+            workspace = self.search_workspace(board)
+            self.searched = workspace.closed
+            self.stamp = workspace.begin()
+            self.goal_searched = workspace.reverse().closed
+            self.goal_stamp = workspace.reverse().begin()
+        
+        moves = self.timed_open_moves(board)
+        for coord in moves:
+            self.frontier.add(coord)
+
+        goal_moves = self.timed_open_moves(board, self.goal_i, self.goal_j, True)
+        for coord in goal_moves:
+            self.goal_frontier.add(coord)
+
+        # both ends expand the cell they stand on, and hold the cells they
+        # expanded and their frontiers
+        frontiers = len(self.frontier) + len(self.goal_frontier)
+        self.count_step(2, len(moves) + len(goal_moves), frontiers, self.nodes_expanded + 2 + frontiers)
         
         if not self.frontier or not self.goal_frontier:
             self.no_solution = True
             return
         
-        idx = self.get_choice(self.frontier, self.heuristic)
-        coord = self.frontier.pop(idx)
-
-        idx = self.get_choice(self.goal_frontier, self.goal_heuristic)
-        goal_coord = self.goal_frontier.pop(idx)
+        # every cell on both frontiers gets its distance checked
+        self.heuristic_calls += len(self.frontier) + len(self.goal_frontier)
+        coord = self.frontier.pop_nearest(self.goal_i, self.goal_j)
+        goal_coord = self.goal_frontier.pop_nearest(self.i, self.j)
 
-        board[self.i][self.j] = 0
+        board[self.i, self.j] = FREE
         self.i, self.j = coord
-        board[self.i][self.j] = self
+        board[self.i, self.j] = OCCUPIED
 
-        board[self.goal_i][self.goal_j] = 0
+        board[self.goal_i, self.goal_j] = FREE
         self.goal_i, self.goal_j = goal_coord
-        board[self.goal_i][self.goal_j] = self
+        board[self.goal_i, self.goal_j] = OCCUPIED
 
-        self.searched.append((self.i, self.j))
-        self.goal_searched.append((self.goal_i, self.goal_j))
+        self.searched[self.flat.index(self.i, self.j)] = self.stamp
+        self.goal_searched[self.flat.index(self.goal_i, self.goal_j)] = self.goal_stamp
 
 
-    def sort_goal_frontier(self):
-        self.goal_frontier.sort(key=lambda coord: self.goal_heuristic(coord[0], coord[1]) + 1)
-
     def goal_heuristic(self, i=None, j=None):
         '''
         Redefine a new heuristic that calculates distance to the
@@ -257,6 +528,13 @@ class BidirectionalSearchAgent(Agent):
         self.heuristic_calls += 1        
         return ((self.i - i) ** 2 + (self.j - j) ** 2) ** (1/2)
 
+    def heuristic_lookup(self, i, j):
+        '''
+        The goal moves on every step, so a field precomputed for one goal
+        would be thrown away right after. Compute the distance directly.
+        '''
+        return ((self.goal_i - i) ** 2 + (self.goal_j - j) ** 2) ** (1/2)
+
 
 ''' =================================== LOCAL SEARCH AGENTS =================================== 
     Agents defined below are local search agents. They do not keep track of old searches, and only
@@ -264,6 +542,8 @@ class BidirectionalSearchAgent(Agent):
 '''
     
 class SteepestAscentAgent(Agent):
+    __slots__ = ()
+
     def name(self):
         return 'SteepestAscentAgent'
     
@@ -274,26 +554,10 @@ class SteepestAscentAgent(Agent):
         Because of steepest ascent hill climb rules, we only
         check out moves that are closer to the goal than we are.
         '''
-        options = [
-            (self.i, self.j),
-            (self.i + 1, self.j),
-            (self.i + 1, self.j + 1),
-            (self.i + 1, self.j - 1),
-            (self.i, self.j + 1),
-            (self.i, self.j - 1),
-            (self.i - 1, self.j + 1),
-            (self.i - 1, self.j),
-            (self.i - 1, self.j - 1),
-        ]
-
+        current = self.heuristic()
         out = []
-        n = len(board)
-        for coord in options:
-            i, j = coord
-            is_valid = 0 <= i < n and 0 <= j < n
-            check_searhced = coord not in self.searched and coord not in self.frontier
-            check_good_heuristic = self.heuristic(i, j) < self.heuristic()
-            if is_valid and check_searhced and check_good_heuristic and (not board[i][j] or board[i][j] == 1):
+        for coord in self.flat_grid(board).open_coords(self.i, self.j):
+            if coord not in self.frontier and self.heuristic(coord[0], coord[1]) < current:
                 out.append(coord)
         return out
     
@@ -308,20 +572,23 @@ class SteepestAscentAgent(Agent):
         if self.is_goal():
             return
 
-        self.frontier = self.open_moves(board)
+        self.frontier = self.timed_open_moves(board)
+        self.count_local_step()
         
         if not self.frontier:
             self.no_solution = True
             return
         coord = self.frontier.pop(0)
 
-        board[self.i][self.j] = 0
+        board[self.i, self.j] = FREE
         self.i, self.j = coord
-        board[self.i][self.j] = self
+        board[self.i, self.j] = OCCUPIED
 
 
 
 class DelayedImprovementAgent(Agent):
+    __slots__ = ('iterations', 'iter_cap', 'current_search')
+
     def __init__(self, color, i, j, goal_i, goal_j, board):
         '''
         In this new init function, we define 'self.iterations',
@@ -334,6 +601,7 @@ class DelayedImprovementAgent(Agent):
         super().__init__(color, i, j, goal_i, goal_j, board)
         self.iterations = 2
         self.iter_cap = 100
+        self.current_search = None
 
     def name(self):
         return 'DelayedImprovementAgent'
@@ -351,6 +619,8 @@ class DelayedImprovementAgent(Agent):
         for move in moves:
             if self.heuristic(move[0], move[1]) < self.heuristic():
                 out.append(move)
+        # open_moves_helper counted the cells it expanded
+        self.count_step(0, len(self.current_search), len(out), len(self.current_search) + 1)
         return out
     
     def open_moves_helper(self, board, iteration, i=None, j=None):
@@ -367,37 +637,19 @@ class DelayedImprovementAgent(Agent):
         '''
         if iteration <= 0:
             return []
-        else:
 
-            if i == None:
-                i = self.i
-            if j == None:
-                j = self.j
-
-            options = [
-            (i, j),
-            (i + 1, j),
-            (i + 1, j + 1),
-            (i + 1, j - 1),
-            (i, j + 1),
-            (i, j - 1),
-            (i - 1, j + 1),
-            (i - 1, j),
-            (i - 1, j - 1),
-        ]
+        if i == None:
+            i = self.i
+        if j == None:
+            j = self.j
 
+        self.nodes_expanded += 1
         out = []
-        n = len(board)
-        for coord in options:
-            if not coord:
-                pass
-            i, j = coord
-            is_valid = 0 <= i < n and 0 <= j < n
-            check_searhced = coord not in self.current_search
-            if is_valid and (check_searhced and (not board[i][j] or board[i][j] == 1)):
-                self.current_search.add((i, j))
-                out.append((i, j))
-                res = self.open_moves_helper(board, iteration - 1, i, j) # don't immediatley return bc we need to check if its empty or not
+        for coord in self.flat_grid(board).open_coords(i, j):
+            if coord not in self.current_search:
+                self.current_search.add(coord)
+                out.append(coord)
+                res = self.open_moves_helper(board, iteration - 1, coord[0], coord[1]) # don't immediatley return bc we need to check if its empty or not
                 if res:
                     out += res
         return out
@@ -417,11 +669,11 @@ class DelayedImprovementAgent(Agent):
             self.no_solution = (self.iterations == self.iter_cap)
             return
                 
-        self.frontier = self.open_moves(board)
+        self.frontier = self.timed_open_moves(board)
 
         if not self.frontier:
             self.iterations += 1
-            self.frontier = self.open_moves(board)
+            self.frontier = self.timed_open_moves(board)
 
             # frontier is still empty. return so that we can move again
             if not self.frontier:
@@ -430,14 +682,15 @@ class DelayedImprovementAgent(Agent):
         idx = self.get_choice(self.frontier, self.heuristic)
         coord = self.frontier.pop(idx)
 
-        board[self.i][self.j] = 0
+        board[self.i, self.j] = FREE
         self.i, self.j = coord
-        board[self.i][self.j] = self
-        self.searched.add((self.i, self.j))
+        board[self.i, self.j] = OCCUPIED
     
 
 
 class SimulatedAnnealingAgent(Agent):
+    __slots__ = ('iterations', 'temp', 'repeats')
+
     def __init__(self, color, i, j, goal_i, goal_j, board):
         '''
         This agnet uses an element of randomness to find a solution.
@@ -459,25 +712,9 @@ class SimulatedAnnealingAgent(Agent):
         '''
         Returns a list of open moves for the given board.
         '''
-        options = [
-            (self.i, self.j),
-            (self.i + 1, self.j),
-            (self.i + 1, self.j + 1),
-            (self.i + 1, self.j - 1),
-            (self.i, self.j + 1),
-            (self.i, self.j - 1),
-            (self.i - 1, self.j + 1),
-            (self.i - 1, self.j),
-            (self.i - 1, self.j - 1),
-        ]
-
         out = []
-        n = len(board)
-        for coord in options:
-            i, j = coord
-            is_valid = 0 <= i < n and 0 <= j < n
-            if is_valid and (not board[i][j] or board[i][j] == 1):
-                heapq.heappush(out, (self.heuristic(i, j), coord))
+        for coord in self.flat_grid(board).open_coords(self.i, self.j):
+            heapq.heappush(out, (self.heuristic(coord[0], coord[1]), coord))
         return out
     
 
@@ -489,7 +726,8 @@ class SimulatedAnnealingAgent(Agent):
             return
         
         #frontier is already sorted because we used a heap
-        self.frontier = self.open_moves(board)
+        self.frontier = self.timed_open_moves(board)
+        self.count_local_step()
         
         if not self.frontier or self.repeats > 10:
             self.no_solution = True
@@ -526,16 +764,18 @@ class SimulatedAnnealingAgent(Agent):
                 idx_to_pop = next_idx
                 coord = next
         self.iterations += 1
-        board[self.i][self.j] = 0
+        board[self.i, self.j] = FREE
         self.i, self.j = coord[1]
-        board[self.i][self.j] = self
+        board[self.i, self.j] = OCCUPIED
         self.frontier.pop(idx_to_pop)
 
 
 class GuidedLocalSearchAgent(Agent):
-    def __init__(self, color, i, j, goal_i, goal_j, board):
-        super().__init__(color, i, j, goal_i, goal_j, board)
-        self.penalties = {}
+    '''
+    Local search that adds a penalty for every time a cell was chosen,
+    counted by flat index in self.penalties, see start_penalties().
+    '''
+    __slots__ = ()
 
     def name(self):
         return 'GuidedLocalSearchAgent'
@@ -549,7 +789,9 @@ class GuidedLocalSearchAgent(Agent):
         # grab heuristic so we only need to calculate it once
         heuristic_val = super().heuristic(i, j)
         straight_line = heuristic_val
-        penalty = self.penalties.get((i, j), 0)
+        if self.penalties == None:
+            self.start_penalties()
+        penalty = self.penalties[(i + 1) * self.flat.width + j + 1]
 
         # we've visited the same square 100 times. time to stop
         if (penalty > 100):
@@ -558,26 +800,7 @@ class GuidedLocalSearchAgent(Agent):
         return straight_line + penalty * heuristic_val
     
     def open_moves(self, board):
-        options = [
-            (self.i, self.j),
-            (self.i + 1, self.j),
-            (self.i + 1, self.j + 1),
-            (self.i + 1, self.j - 1),
-            (self.i, self.j + 1),
-            (self.i, self.j - 1),
-            (self.i - 1, self.j + 1),
-            (self.i - 1, self.j),
-            (self.i - 1, self.j - 1),
-        ]
-
-        out = []
-        n = len(board)
-        for coord in options:
-            i, j = coord
-            is_valid = 0 <= i < n and 0 <= j < n
-            if is_valid and (not board[i][j] or board[i][j] == 1):
-                out.append(coord)
-        return out
+        return self.flat_grid(board).open_coords(self.i, self.j)
 
     def move(self, board):
         '''
@@ -586,7 +809,8 @@ class GuidedLocalSearchAgent(Agent):
         if self.is_goal() or self.no_solution:
             return
 
-        self.frontier = self.open_moves(board)
+        self.frontier = self.timed_open_moves(board)
+        self.count_local_step()
         
         if not self.frontier:
             self.no_solution = True
@@ -594,21 +818,20 @@ class GuidedLocalSearchAgent(Agent):
         
         idx = self.get_choice(self.frontier, self.heuristic)
         coord = self.frontier.pop(idx)
+        k = self.flat.index(coord[0], coord[1])
+        self.penalties[k] = min(self.penalties[k] + 1, MAX_PENALTY)
 
-        if coord not in self.penalties:
-            self.penalties[coord] = 1
-        else:
-            self.penalties[coord] += 1
-
-        board[self.i][self.j] = 0
+        board[self.i, self.j] = FREE
         self.i, self.j = coord
-        board[self.i][self.j] = self
+        board[self.i, self.j] = OCCUPIED
 
 
 class RandomLocalSearchAgent(Agent):
     '''
     This agnet is just a benchmark to make sure other agents are working correctly.     
     '''
+    __slots__ = ('moves',)
+
     def __init__(self, color, i, j, goal_i, goal_j, board):
         super().__init__(color, i, j, goal_i, goal_j, board)
         self.moves = 0
@@ -617,36 +840,23 @@ class RandomLocalSearchAgent(Agent):
         return 'RandomLocalSearchAgent'
     
     def open_moves(self, board):
-        options = [
-            (self.i, self.j),
-            (self.i + 1, self.j),
-            (self.i + 1, self.j + 1),
-            (self.i + 1, self.j - 1),
-            (self.i, self.j + 1),
-            (self.i, self.j - 1),
-            (self.i - 1, self.j + 1),
-            (self.i - 1, self.j),
-            (self.i - 1, self.j - 1),
-        ]
-
-        out = []
-        n = len(board)
-        for coord in options:
-            i, j = coord
-            is_valid = 0 <= i < n and 0 <= j < n
-            if is_valid and (not board[i][j] or board[i][j] == 1):
-                out.append(coord)
-        return out
+        return self.flat_grid(board).open_coords(self.i, self.j)
 
     def move(self, board):
         '''
         Moves the given agent on the board.
         '''
-        if self.is_goal() or self.no_solution or self.moves > 1000000:
+        if self.is_goal() or self.no_solution:
+            return
+
+        # still wandering after a million moves, give up like the other local searches
+        if self.moves > 1000000:
+            self.no_solution = True
             return
 
         self.moves += 1
-        self.frontier = self.open_moves(board)
+        self.frontier = self.timed_open_moves(board)
+        self.count_local_step()
         
         if not self.frontier:
             self.no_solution = True
@@ -654,6 +864,6 @@ class RandomLocalSearchAgent(Agent):
         
         coord = random.choice(self.frontier)
 
-        board[self.i][self.j] = 0
+        board[self.i, self.j] = FREE
         self.i, self.j = coord
-        board[self.i][self.j] = self
\ No newline at end of file
+        board[self.i, self.j] = OCCUPIED
\ No newline at end of file
@@ -1,8 +1,15 @@
 import pygame
 import random
+import numpy as np
 from agents import AStarAgent
+from grid import FREE, GOAL, OBSTACLE, OCCUPIED, FlatGrid, make_grid, padding
+from search import a_star, WorkspacePool
+from fields import heuristic_field, distance_field, component_labels
+from hierarchy import ClusterGraph
+from multiagent import step_agents
+from profiling import Profile, NO_PROFILE
+from metrics import team_counts, traced
 import time
-from copy import deepcopy
 
     
 # set colors
@@ -15,12 +22,33 @@ rows = cols = 30
 cell_width = width // cols
 cell_height = height // rows
 
+# number of distance fields a Board keeps cached
+max_fields = 8
+
 def make_random_color():
     '''
     Return a tuple of a random color
     '''
     return (random.randint(0, 255), random.randint(0, 255), random.randint(0, 255))
 
+
+def iteration_seed(seed, iteration):
+    '''
+    Derive an independent seed for one test iteration from a base seed
+    '''
+    return int(np.random.SeedSequence([seed, iteration]).generate_state(1)[0])
+
+
+def add_record(out, name, record):
+    '''
+    Add a record from Board.run_agent to the output of Board.test
+    '''
+    for key, value in record.items():
+        if key == 'time':
+            out.setdefault(name, []).append(value)
+        else:
+            out.setdefault(name + '_' + key, []).append(value)
+
 class Board():
     '''
     This class holds all of the necessary methods for creating a board,
@@ -36,55 +64,230 @@ class Board():
         self.cols = cols
 
         self.agents = []
-        self.board = []
+        self.positions = {}
+        self.board = make_grid(rows, cols)
+        self.random = random.Random()
+        self.rng = np.random.default_rng()
+        # search buffers shared by the agents and queries on this board, one after another
+        self.workspaces = WorkspacePool()
+
+        # bumped whenever the obstacles change, cached fields and graphs are only valid for one version
+        self.version = 0
+        self.flat = None
+        self.heuristics = {}
+        self.fields = {}
+        self.graphs = {}
+        self.labels = None
+
+
+    def seed(self, seed):
+        '''
+        Seed the random number generators used for boards and coordinates
+        '''
+        self.random.seed(seed)
+        self.rng = np.random.default_rng(seed)
+
+
+    def changed(self):
+        '''
+        Record that the obstacles on the board changed,
+        which drops the cached fields, cluster graphs and labels
+        '''
+        self.version += 1
+        self.heuristics = {}
+        self.fields = {}
+        self.graphs = {}
+        self.labels = None
+
+
+    def components(self):
+        '''
+        Return the connected area labels of the board, see
+        fields.component_labels. They are computed once per board version.
+        '''
+        if self.labels is None:
+            self.labels = component_labels(self.board)
+        return self.labels
+
+
+    def reachable(self, start, goal):
+        '''
+        Return True if start and goal are in the same connected area,
+        which is the case exactly when some path between them exists
+        '''
+        labels = self.components()
+        label = labels[start]
+        return label != 0 and label == labels[goal]
+
+
+    def flat_grid(self):
+        '''
+        The grid.FlatGrid of the current board grid, shared by the agents
+        placed on it
+        '''
+        if self.flat == None or self.flat.grid is not self.board:
+            self.flat = FlatGrid(self.board)
+        return self.flat
+
+
+    def heuristic_field(self, goal, metric='euclidean'):
+        '''
+        Return the heuristic field for the given goal and metric,
+        see fields.heuristic_field. Fields are cached per board version,
+        goal and metric, so agents heading to the same goal share one.
+        '''
+        key = (self.version, goal, metric)
+        if key not in self.heuristics:
+            if len(self.heuristics) >= max_fields:
+                # drop the oldest field
+                del self.heuristics[next(iter(self.heuristics))]
+            self.heuristics[key] = heuristic_field(self.rows, self.cols, goal[0], goal[1], metric)
+        return self.heuristics[key]
+
+
+    def distance_field(self, goals):
+        '''
+        Return the distance field for the given goal coordinates,
+        see fields.distance_field. Fields are cached per board version
+        and set of goals, so agents heading to the same goals share one.
+        '''
+        key = (self.version, tuple(goals))
+        if key not in self.fields:
+            if len(self.fields) >= max_fields:
+                # drop the oldest field
+                del self.fields[next(iter(self.fields))]
+            self.fields[key] = distance_field(self.board, goals)
+        return self.fields[key]
+
+
+    def cluster_graph(self, cluster_size=16):
+        '''
+        Return the hierarchy.ClusterGraph of the board. It is built once
+        per board version and cluster size, and shared by every query.
+        '''
+        key = (self.version, cluster_size)
+        if key not in self.graphs:
+            self.graphs[key] = ClusterGraph(self.board, cluster_size)
+        return self.graphs[key]
+
+
+    def set_obstacle(self, i, j, blocked=True):
+        '''
+        Add or remove a single obstacle, and tell the placed agents
+        which cell changed so they can fix up their plans
+        '''
+        self.board[i, j] = OBSTACLE if blocked else FREE
+        self.changed()
+        for agent in self.positions.values():
+            agent.cells_changed([(i, j)])
 
 
     def generate_board(self):
         '''
         Generates the game board with the give number of islands.
-        Must be used on a square board.
-        '''
-        intermediate = [0 for i in range(self.cols)]
-        board = [intermediate[:] for i in range(self.cols)]
-
-        def make_choice_list(i, j):
-            return [(i + 1, j), (i, j + 1), (i - 1, j), (i, j - 1)]
-
-        for _ in range(self.num_islands):
-            i = random.randint(1, self.cols - 2)
-            j = random.randint(1, self.cols - 2)
-            blocks = random.randint(self.min_island_size, self.max_island_size)
-            board[i][j] = 2
-            choice_list = make_choice_list(i, j)
-            for _ in range(blocks - 1):
-                choice_i, choice_j = random.choice(choice_list)
-
-                choice_in_range = 0 < choice_i < (self.cols - 1) and 0 < choice_j < (self.cols - 1)
-                tries = 0
-
-                while tries < 10 and choice_in_range and board[choice_i][choice_j]:
-                    choice_i, choice_j = random.choice(choice_list)
-                    choice_in_range = 0 < choice_i < (self.cols - 1) and 0 < choice_j < (self.cols - 1)
-                    tries += 1
-                if choice_in_range:
-                    board[choice_i][choice_j] = 2
-                    choice_list = make_choice_list(choice_i, choice_j)
-        self.board = deepcopy(board) 
+
+        Each island starts on a random cell away from the edge of the board and
+        grows by a random walk, one block per step, until it reaches its size.
+        A step tries up to 10 more directions to find a cell that isn't blocked
+        yet, and a step that would leave the inside of the board is skipped.
+
+        All of the islands take their steps together, so growing them is a
+        handful of vectorized operations per step instead of a Python loop
+        per block, and the random numbers come in batches from self.rng.
+        '''
+        board = make_grid(self.rows, self.cols)
+        self.positions = {}
+        rng = self.rng
+
+        n = self.num_islands
+        i = rng.integers(1, self.rows - 1, n)
+        j = rng.integers(1, self.cols - 1, n)
+        blocks = rng.integers(self.min_island_size, self.max_island_size + 1, n)
+
+        # islands only ever stand on inner cells, so a step from one always
+        # lands on the board and cells can be addressed by flat index into
+        # the bordered array from make_grid
+        cells = padding(board).reshape(-1)
+        width = self.cols + 2
+        inner = np.zeros((self.rows + 2, width), dtype=bool)
+        inner[2:-2, 2:-2] = True
+        inner = inner.reshape(-1)
+        offsets = np.array([width, 1, -width, -1])
+        position = (i + 1) * width + j + 1
+        cells[position] = OBSTACLE
+
+        steps = max(int(blocks.max(initial=0)) - 1, 0)
+        first_choices = rng.integers(0, 4, (steps, n))
+        for step in range(steps):
+            growing = np.flatnonzero(blocks > step + 1)
+            choice = position[growing] + offsets[first_choices[step, growing]]
+            in_range = inner[choice]
+            retry = in_range & (cells[choice] != FREE)
+
+            # most islands are done after one choice, the rest get up to 10 more tries
+            # and keep the first choice that is off the board or not blocked yet
+            again = np.flatnonzero(retry)
+            if len(again):
+                retries = position[growing[again], None] + offsets[rng.integers(0, 4, (len(again), 10))]
+                retry_in_range = inner[retries]
+                done = ~retry_in_range | (cells[retries] == FREE)
+                done[:, -1] = True
+                pick = retries[np.arange(len(again)), done.argmax(axis=1)]
+                choice[again] = pick
+                in_range[again] = inner[pick]
+
+            cells[choice[in_range]] = OBSTACLE
+            position[growing[in_range]] = choice[in_range]
+        self.board = board
+        self.changed()
 
         
     def get_open_coords(self):
         '''
         Get open start and destination coordinates on the board.
         '''
-        i, j = random.randint(0, self.rows - 1), random.randint(0, self.cols - 1)
-        while self.board[i][j]:
-            i, j = random.randint(0, self.rows - 1), random.randint(0, self.cols - 1)
+        i, j = self.random.randint(0, self.rows - 1), self.random.randint(0, self.cols - 1)
+        while self.board[i, j]:
+            i, j = self.random.randint(0, self.rows - 1), self.random.randint(0, self.cols - 1)
 
-        goal_i, goal_j = random.randint(0, self.rows - 1), random.randint(0, self.cols - 1)
-        while self.board[i][j]:
-            goal_i, goal_j = random.randint(0, self.rows - 1), random.randint(0, self.cols - 1)
+        goal_i, goal_j = self.random.randint(0, self.rows - 1), self.random.randint(0, self.cols - 1)
+        while self.board[goal_i, goal_j]:
+            goal_i, goal_j = self.random.randint(0, self.rows - 1), self.random.randint(0, self.cols - 1)
 
         return [(i, j), (goal_i, goal_j)]
+
+
+    def get_open_pairs(self, count, pairs=[]):
+        '''
+        Get {count} start and goal pairs for agents sharing the board,
+        starting with the given pairs. The cells of the pairs that are added
+        are all different from each other and from the given pairs, and their
+        goals can be reached from their starts.
+        '''
+        pairs = [tuple(pair) for pair in pairs]
+        taken = {cell for pair in pairs for cell in pair}
+        while len(pairs) < count:
+            start, goal = self.get_open_coords()
+            if start in taken or goal in taken or start == goal or not self.reachable(start, goal):
+                continue
+            pairs.append((start, goal))
+            taken.add(start)
+            taken.add(goal)
+        return pairs
+    
+    
+    def load_scenario(self, scenarios, k):
+        '''
+        Replace the board with scenario k from a scenarios.ScenarioFile
+        and return its [start, goal] coordinates.
+        '''
+        self.rows = scenarios.rows
+        self.cols = scenarios.cols
+        self.board = scenarios.board(k)
+        self.agents = []
+        self.positions = {}
+        self.changed()
+        return scenarios.coords_for(k)
     
     
     def place_agents(self, agent_class=AStarAgent):
@@ -93,7 +296,7 @@ class Board():
 
         Parameters:
             num_agents (int): the number of agents to place on the board
-            board ((Agent | int) [][]) the given board
+            agent_class (Agent): the class of agent to place
         '''
         for _ in range(self.num_agents):
             [agent_coord, goal_coord] = self.get_open_coords()
@@ -101,9 +304,11 @@ class Board():
             goal_i, goal_j = goal_coord            
 
             agent = agent_class(make_random_color(), i, j, goal_i, goal_j, self.board)
+            agent.attach(self)
             self.agents.append(agent)
-            self.board[i][j] = agent
-            self.board[goal_i][goal_j] = 1
+            self.positions[(i, j)] = agent
+            self.board[i, j] = OCCUPIED
+            self.board[goal_i, goal_j] = GOAL
 
 
     def place_single_agent(self, agent_class, i, j, goal_i, goal_j):
@@ -113,21 +318,40 @@ class Board():
         Assume that the position is valid when parameters are passed in.
         '''
         agent = agent_class(make_random_color(), i, j, goal_i, goal_j, self.board)
-        self.board[i][j] = agent
-        self.board[goal_i][goal_j] = 1
+        agent.attach(self)
+        self.positions[(i, j)] = agent
+        self.board[i, j] = OCCUPIED
+        self.board[goal_i, goal_j] = GOAL
         return agent
 
 
+    def index_agents(self):
+        '''
+        Rebuild the agent position index after agents have moved.
+
+        Agents only write OCCUPIED markers into the grid, so this index
+        is the way to find out which agent sits in a given cell.
+        '''
+        self.positions = {(agent.i, agent.j): agent for agent in self.agents}
+
+
+    def agent_at(self, i, j):
+        '''
+        Return the agent at the given cell, or None if there isn't one
+        '''
+        return self.positions.get((i, j))
+
+
     def clear_agents(self):
         '''
         Remove all agents and goal states from the board.
+        Their search workspaces go back to the pool.
         '''
+        for agent in set(self.agents) | set(self.positions.values()):
+            agent.detach()
         self.agents = []
-
-        for i in range(self.rows):
-            for j in range(self.cols):
-                if self.board[i][j] != 2:
-                    self.board[i][j] = 0
+        self.positions = {}
+        self.board[self.board != OBSTACLE] = FREE
 
 
     def draw_board(self, screen):
@@ -143,7 +367,7 @@ class Board():
             for col in range(self.cols):
                 rect = pygame.Rect(col * cell_width, row * cell_height, cell_width, cell_height)
 
-                if (self.board[row][col] == 2):
+                if (self.board[row, col] == OBSTACLE):
                     pygame.draw.rect(screen, GREY, rect)
 
                 else:
@@ -175,12 +399,17 @@ class Board():
     def play(self, agent_class=AStarAgent):
         '''
         Creates a loop that initializes the board and plays until done
+
+        Left click adds or removes an obstacle, any other click
+        generates a new board with new agents.
         '''
         pygame.init()
         screen = pygame.display.set_mode((width, height))
 
         for agent in self.agents:
             agent.start_heuristic = agent.heuristic()
+        if agent_class.team_planner != None:
+            agent_class.team_planner(self.board).plan(self.agents)
 
         screen.fill(WHITE)
         self.draw_board(screen)
@@ -191,11 +420,26 @@ class Board():
                 if event.type == pygame.QUIT:
                     pygame.quit()
                 if event.type == 1025:
-                    self.generate_board()
-                    self.agents = []
-                    self.place_agents(agent_class)
-            for agent in self.agents:
-                agent.move(self.board)
+                    if event.button == 1:
+                        # left click toggles the obstacle under the mouse
+                        row = event.pos[1] // cell_height
+                        col = event.pos[0] // cell_width
+                        if row < self.rows and col < self.cols and self.board[row, col] in (FREE, OBSTACLE):
+                            self.set_obstacle(row, col, self.board[row, col] == FREE)
+                    else:
+                        self.generate_board()
+                        self.agents = []
+                        self.place_agents(agent_class)
+                    if agent_class.team_planner != None:
+                        # plan the team again from where it stands
+                        agent_class.team_planner(self.board).plan(self.agents)
+            if agent_class.team_planner != None:
+                step_agents(self.board, self.agents)
+            else:
+                for agent in self.agents:
+                    if not agent.no_solution:
+                        agent.move(self.board)
+            self.index_agents()
 
             time.sleep(0.1)
 
@@ -204,43 +448,220 @@ class Board():
             self.draw_board(screen)
         
 
-    def test(self, iterations=10, agent_classes=[]):
+    def run_agent(self, agent_class, coord, goal_coord, profile=NO_PROFILE):
+        '''
+        Place a single agent on the current board and run it until it
+        either finds the goal or decides there is no solution.
+
+        Returns a record of the run as a dict. 'time' is the time to solution
+        in ms, or -1 if there was no solution. The other entries, including
+        the agent's stats() and its search counts from metrics.COUNTS,
+        become '<name>_<key>' columns in the output of Board.test.
+
+        The agent times its phases with the given profiling.Profile,
+        and each move is timed as the 'move' phase.
+        '''
+        i, j = coord
+        goal_i, goal_j = goal_coord
+
+        self.clear_agents()
+        agent = self.place_single_agent(agent_class, i, j, goal_i, goal_j)
+        agent.start_heuristic = agent.heuristic()
+        agent.set_profile(profile)
+
+        start = time.time_ns()
+
+        # run the agent until we either find the goal or no solution
+        while not agent.is_goal() and not agent.no_solution:
+            move_start = profile.start()
+            agent.move(self.board)
+            profile.stop('move', move_start)
+        end = time.time_ns()
+
+        record = {'time': -1}
+        if not agent.no_solution:
+            record['time'] = (end - start) / 1000000
+
+        record['heuristic_calls'] = agent.heuristic_calls
+        record['path_cost'] = agent.path_cost
+        record.update(agent.stats())
+        agent.detach()
+        return record
+
+
+    def run_team(self, agent_class, pairs, profile=NO_PROFILE):
+        '''
+        Place one agent per start and goal pair, plan them all together with
+        the team_planner of the agent class (see multiagent.py), and step them in
+        lockstep until every agent is at its goal.
+
+        Returns a record like run_agent does, for all of the agents together.
+        'time' covers planning and moving, or is -1 if some agent has no route,
+        heuristic_calls and path_cost are summed over the agents, the search
+        counts are combined with metrics.team_counts, and the planner's stats
+        are added on.
+
+        With a profiling.Profile, planning the team is timed as the 'search'
+        phase and each lockstep step of the team as the 'move' phase.
+        '''
+        self.clear_agents()
+        for (i, j), (goal_i, goal_j) in pairs:
+            agent = self.place_single_agent(agent_class, i, j, goal_i, goal_j)
+            agent.start_heuristic = agent.heuristic()
+            agent.set_profile(profile)
+            self.agents.append(agent)
+
+        start = time.time_ns()
+        planner = agent_class.team_planner(self.board)
+        plan_start = profile.start()
+        planned = planner.plan(self.agents)
+        profile.stop('search', plan_start)
+        if planned:
+            while not all(agent.is_goal() for agent in self.agents):
+                move_start = profile.start()
+                step_agents(self.board, self.agents)
+                profile.stop('move', move_start)
+        end = time.time_ns()
+
+        record = {'time': -1}
+        if planned:
+            record['time'] = (end - start) / 1000000
+
+        record['heuristic_calls'] = sum(agent.heuristic_calls for agent in self.agents)
+        record['path_cost'] = sum(agent.path_cost for agent in self.agents)
+        record.update(team_counts(self.agents))
+        record.update(planner.stats())
+        self.clear_agents()
+        return record
+
+
+    def run_class(self, agent_class, coord, goal_coord, pairs=None, profile=NO_PROFILE, metrics=False):
+        '''
+        Run an agent class like test does, as a team on the start and goal
+        pairs with run_team if it has a team_planner, otherwise on its own
+        with run_agent.
+
+        With metrics, the run is traced with metrics.traced and its record
+        gets a 'peak_bytes' entry. The board lends the run a new WorkspacePool,
+        so the search buffers the agent needs count towards it. tracemalloc
+        slows every allocation down, so the time of a traced run is only
+        comparable with other traced runs.
+        '''
+        if metrics:
+            workspaces = self.workspaces
+            self.workspaces = WorkspacePool()
+            try:
+                record, peak_bytes = traced(self.run_class, agent_class, coord, goal_coord, pairs, profile)
+            finally:
+                self.workspaces = workspaces
+            record['peak_bytes'] = peak_bytes
+            return record
+
+        if agent_class.team_planner != None:
+            return self.run_team(agent_class, pairs, profile)
+        return self.run_agent(agent_class, coord, goal_coord, profile)
+
+
+    def solve_many(self, pairs, algorithm=a_star):
+        '''
+        Find paths for many start and goal pairs on the current board.
+
+        Only obstacles block the searches, agents and goals on the board are
+        ignored, and the board is never written to. Every query reuses the
+        same search.SearchWorkspace from the pool, so there's no per-query
+        clearing or allocating of board-sized buffers.
+
+        Parameters:
+            pairs ([((int, int), (int, int))]): (start, goal) coordinates
+            algorithm (function): a_star, jump_point_search or bidirectional_a_star
+                from search.py
+
+        Returns a list of search.SearchResult, one per pair, in order.
+        '''
+        obstacles = (self.board == OBSTACLE).astype(np.uint8) * OBSTACLE
+        workspace = self.workspaces.acquire(obstacles)
+        results = [algorithm(obstacles, start, goal, workspace=workspace) for start, goal in pairs]
+        self.workspaces.release(workspace)
+        return results
+
+
+    def test(self, iterations=10, agent_classes=[], seed=None, scenarios=None, sink=None, run='', profile=False,
+             metrics=False):
         '''
         Method for testing different agent classes against each other.
 
         There will be no display
+
+        If a seed is given, every iteration is seeded with iteration_seed(seed, i),
+        so the boards, coordinates and any randomness in the agents can be
+        reproduced, including by parallel.parallel_test. Without one, the
+        boards and the agents carry on from the current random state.
+
+        If a scenarios.ScenarioFile is given, iteration i replays scenario i
+        from the file instead of generating a new board.
+
+        Agent classes with a team_planner (see multiagent.py) run as a team of
+        num_agents agents with run_team. The first agent of the team gets the
+        same start and goal as the other agent classes.
+
+        With profile, every agent is run with a profiling.Profile, and every
+        record also gets a '<name>_profile_<phase>_calls' and
+        '<name>_profile_<phase>_ms' column for each of profiling.PHASES. The
+        timers slow the agents down a little, so profiled times are only
+        comparable with each other.
+
+        Every record has the nodes_expanded, nodes_generated, peak_frontier
+        and peak_visited columns the agents count for themselves, see
+        metrics.py. With metrics, the runs are also traced for a peak_bytes
+        column, which slows them down, see run_class().
+
+        If a results.ResultsSink is given, every record is written to it as soon
+        as it completes, labelled with the given run, instead of being kept in
+        memory, and nothing is returned. Records already in the sink are skipped,
+        so an interrupted test picks up where it left off (use a seed or scenarios
+        so the remaining iterations see the same boards).
         '''
+        if scenarios != None and iterations > len(scenarios):
+            raise ValueError(f'{iterations} iterations requested but there are only {len(scenarios)} scenarios')
+
         out = {}
         for agent in agent_classes:
             out[agent.__name__] = []
             out[agent.__name__ + '_heuristic_calls'] = []
+            out[agent.__name__ + '_path_cost'] = []
         
         for i in range(iterations):
             print(f'Iteration: {i}')
-            self.generate_board()
-            [coord, goal_coord] = self.get_open_coords()
-            i, j = coord
-            goal_i, goal_j = goal_coord
-
-            for agent_class in agent_classes:
-                self.clear_agents()
-                agent = self.place_single_agent(agent_class, i, j, goal_i, goal_j)
-                agent.start_heuristic = agent.heuristic()
-
-                start = time.time_ns()
-
-                # run the agent until we either find the goal or no solution
-                while not agent.is_goal() and not agent.no_solution:
-                    agent.move(self.board)
-                end = time.time_ns()
-
-                if agent.no_solution:
-                    out[agent.name()].append(-1)
+            remaining = agent_classes
+            if sink != None:
+                remaining = [agent for agent in agent_classes if not sink.completed(run, i, agent.__name__)]
+                if not remaining:
+                    continue
+
+            if scenarios != None:
+                [coord, goal_coord] = self.load_scenario(scenarios, i)
+            else:
+                if seed != None:
+                    self.seed(iteration_seed(seed, i))
+                self.generate_board()
+                [coord, goal_coord] = self.get_open_coords()
+
+            pairs = None
+            if any(agent_class.team_planner != None for agent_class in remaining):
+                # agents that plan together share the board with num_agents - 1 others
+                pairs = self.get_open_pairs(self.num_agents, [(coord, goal_coord)])
+
+            for agent_class in remaining:
+                if seed != None:
+                    random.seed(iteration_seed(seed, i))
+                phases = Profile() if profile else NO_PROFILE
+                record = self.run_class(agent_class, coord, goal_coord, pairs, phases, metrics)
+                record.update(phases.record())
+                if sink != None:
+                    sink.write(run, i, agent_class.__name__, record)
                 else:
-                    delta = (end - start) / 1000000
-                    out[agent.name()].append(delta)
-                    # print(f'finished in {delta} seconds!')
+                    add_record(out, agent_class.__name__, record)
 
-                out[agent.name() + '_heuristic_calls'].append(agent.heuristic_calls)
+        if sink != None:
+            return None
         return out
-        
\ No newline at end of file
@@ -0,0 +1,148 @@
+'''
+Per-agent heuristic caches.
+
+Putting @lru_cache on a method shares one cache between every instance of the
+class, keys it on self, and keeps every agent alive for as long as its entries
+are in the cache. These caches belong to a single agent instead, so they go
+away with the agent, and they keep count of their hits, misses and evictions.
+
+Every cache has the same interface:
+    lookup(i, j, compute) returns the cached value for (i, j), calling
+    compute(i, j) to fill it on a miss
+    stats() returns the hit, miss and eviction counters
+'''
+from collections import OrderedDict
+
+POLICIES = ('lru', 'lfu', 'dense')
+
+
+class LRUCache():
+    '''
+    Bounded cache that evicts the least recently used entry
+    '''
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, i, j, compute):
+        key = (i, j)
+        entries = self.entries
+        if key in entries:
+            self.hits += 1
+            entries.move_to_end(key)
+            return entries[key]
+
+        self.misses += 1
+        value = compute(i, j)
+        entries[key] = value
+        if len(entries) > self.capacity:
+            entries.popitem(last=False)
+            self.evictions += 1
+        return value
+
+    def stats(self):
+        return {'cache_hits': self.hits, 'cache_misses': self.misses, 'cache_evictions': self.evictions}
+
+
+class LFUCache():
+    '''
+    Bounded cache that evicts the least frequently used entry.
+
+    Keys are grouped into buckets by how often they've been used, so both
+    lookups and evictions are O(1). Ties within a bucket go to the least
+    recently used key.
+    '''
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.values = {}
+        self.counts = {}
+        self.buckets = {}
+        self.min_count = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, i, j, compute):
+        key = (i, j)
+        if key in self.values:
+            self.hits += 1
+            count = self.counts[key]
+            bucket = self.buckets[count]
+            del bucket[key]
+            if not bucket:
+                del self.buckets[count]
+                if self.min_count == count:
+                    self.min_count = count + 1
+            self.counts[key] = count + 1
+            self.buckets.setdefault(count + 1, OrderedDict())[key] = None
+            return self.values[key]
+
+        self.misses += 1
+        value = compute(i, j)
+        if len(self.values) >= self.capacity:
+            bucket = self.buckets[self.min_count]
+            evicted, _ = bucket.popitem(last=False)
+            if not bucket:
+                del self.buckets[self.min_count]
+            del self.values[evicted]
+            del self.counts[evicted]
+            self.evictions += 1
+
+        self.values[key] = value
+        self.counts[key] = 1
+        self.buckets.setdefault(1, OrderedDict())[key] = None
+        self.min_count = 1
+        return value
+
+    def stats(self):
+        return {'cache_hits': self.hits, 'cache_misses': self.misses, 'cache_evictions': self.evictions}
+
+
+class DenseCache():
+    '''
+    Unbounded cache with one slot per cell on the board, stored in a flat list.
+    Nothing is ever evicted.
+    '''
+    def __init__(self, rows, cols):
+        self.cols = cols
+        self.entries = [None] * (rows * cols)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, i, j, compute):
+        k = i * self.cols + j
+        value = self.entries[k]
+        if value != None:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        value = compute(i, j)
+        self.entries[k] = value
+        return value
+
+    def stats(self):
+        return {'cache_hits': self.hits, 'cache_misses': self.misses, 'cache_evictions': self.evictions}
+
+
+def make_cache(policy, capacity, board):
+    '''
+    Create a cache with the given eviction policy.
+
+    Parameters:
+        policy (str): one of 'lru', 'lfu' or 'dense'
+        capacity (int): maximum number of entries, ignored by 'dense'
+        board (np.ndarray): the board grid, used to size the 'dense' cache
+    '''
+    if policy == 'lru':
+        return LRUCache(capacity)
+    if policy == 'lfu':
+        return LFUCache(capacity)
+    if policy == 'dense':
+        rows, cols = board.shape
+        return DenseCache(rows, cols)
+    raise ValueError(f'Unknown cache policy: {policy}, expected one of {POLICIES}')
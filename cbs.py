@@ -0,0 +1,275 @@
+'''
+Conflict-Based Search, for optimal collision free routes for a team of agents.
+
+CBS searches a constraint tree. Every node of the tree holds a set of
+constraints for each agent, and a route for each agent that is optimal under
+its own constraints, found by multiagent.space_time_a_star. The routes of a
+node ignore each other, so they can collide. Expanding a node takes one of
+its conflicts between two agents and splits it in two: one child forbids
+the first agent from the contested cell or move, the other forbids the
+second, and each child replans only that agent. Nodes are expanded lowest
+sum of costs first, so the first node without conflicts has the lowest sum
+of costs of all collision free plans.
+
+A few things keep the tree small:
+    - The children of every conflict of a node are planned when the node is
+      made, and kept per agent and set of constraints, so a child only
+      plans again for the conflicts of the agent that changed.
+    - Cardinal conflicts, where both children cost more, are split first.
+      Splitting any other conflict leaves a child of the same cost, where
+      the same two agents usually just collide somewhere else.
+    - Every cardinal conflict adds at least its cheaper child's extra cost
+      to any plan below the node, and conflicts between different pairs of
+      agents add up. Nodes are ordered by their sum of costs plus that bound,
+      so the tree doesn't fill up with cheap nodes that can't be finished.
+    - Nodes with the same bound are expanded fewest conflicts first.
+    - Of its best routes, a replanned agent takes the one crossing the
+      other agents' routes the least.
+    - Bypassing: when a child's new route costs the same as the old one and
+      leaves fewer conflicts, the node takes that route and is expanded again,
+      instead of adding both children to the tree.
+    - Target conflicts, where an agent runs over another one that is already
+      parked on its goal, split into the parked agent finishing later and the
+      other agent keeping off that goal for good. Forbidding single time
+      steps would push the crossing back one step per level of the tree.
+'''
+import heapq
+from grid import FlatGrid
+from multiagent import ReservationTable, CooperativeAStarAgent
+
+# costs closer than this are the same, they are sums of 1s and sqrt(2)s
+EPSILON = 1e-9
+
+
+def find_conflicts(routes):
+    '''
+    Find every collision between routes of flat indices with one cell per
+    time step. An agent stays on its last cell after its route ends.
+
+    Returns a list of (t, a, b, k, nk), earliest first, for agents a and b.
+    For a vertex conflict both are on cell k at time t and nk is None.
+    For a swap, a moves from k to nk and b from nk to k between time t
+    and t + 1.
+    '''
+    conflicts = []
+    end = max(len(route) for route in routes)
+    for t in range(end):
+        holders = {}
+        moving = {}
+        for a, route in enumerate(routes):
+            if t < len(route):
+                k = route[t]
+            else:
+                k = route[-1]
+            if k in holders:
+                conflicts.append((t, holders[k], a, k, None))
+            else:
+                holders[k] = a
+
+            if 0 < t < len(route) and route[t - 1] != k:
+                prev = route[t - 1]
+                b = moving.get((k, prev))
+                if b != None:
+                    conflicts.append((t - 1, b, a, k, prev))
+                moving[(prev, k)] = a
+    conflicts.sort(key=lambda conflict: conflict[0])
+    return conflicts
+
+
+class ConflictBasedSearch():
+    '''
+    Planner for CBSAgent, plans the whole team at once with CBS.
+
+    A node of the tree is (constraints, paths, routes, costs, conflicts),
+    with one entry per agent in the first four. Gives up after expanding
+    max_nodes nodes.
+    '''
+    max_nodes = 2000
+    bypass = True
+
+    def __init__(self, board):
+        self.board = board
+        self.flat = FlatGrid(board)
+        self.nodes = 0
+        self.bypasses = 0
+        self.searches = 0
+        self.makespan = 0
+        # (agent, constraints) -> the agent's best route under them
+        self.results = {}
+        # nodes put on the tree so far, breaks ties in the order they were made
+        self.count = 0
+
+    def splits(self, conflict, routes):
+        '''
+        The two ways to resolve a conflict from find_conflicts,
+        as (agent, constraint) for each child
+        '''
+        t, a, b, k, nk = conflict
+        if nk != None:
+            return ((a, ('forbid_move', k, nk, t)), (b, ('forbid_move', nk, k, t)))
+        if t >= len(routes[a]) - 1:
+            return ((a, ('finish_after', k, t)), (b, ('forbid_from', k, t)))
+        if t >= len(routes[b]) - 1:
+            return ((b, ('finish_after', k, t)), (a, ('forbid_from', k, t)))
+        return ((a, ('forbid', k, t)), (b, ('forbid', k, t)))
+
+    def route(self, agent, constraints, others=()):
+        '''
+        Search for the agent's best route under its constraints. Each one is
+        the name of a ReservationTable method and its arguments:
+            ('forbid', k, t): keep off cell k at time t
+            ('forbid_move', k, nk, t): don't move from k to nk at time t
+            ('forbid_from', k, t): keep off cell k from time t on
+            ('finish_after', k, t): don't stop on cell k before time t + 1
+        Of the best routes, it takes one crossing the other routes the least.
+        '''
+        table = ReservationTable(self.flat.size)
+        for constraint in constraints:
+            getattr(table, constraint[0])(*constraint[1:])
+        avoid = ReservationTable(self.flat.size)
+        for route in others:
+            avoid.reserve(route)
+        agent.table = table
+        self.searches += 1
+        result = agent.search(self.board, avoid)
+        agent.count_search(result)
+        return result
+
+    def children(self, agents, node):
+        '''
+        For every conflict of a node, the two children it splits into,
+        as (agent, constraints, result, extra cost) for each child
+        '''
+        constraints, _, routes, costs, conflicts = node
+        options = []
+        for conflict in conflicts:
+            children = []
+            for x, constraint in self.splits(conflict, routes):
+                key = (x, constraints[x] + (constraint,))
+                if key not in self.results:
+                    self.results[key] = self.route(agents[x], key[1], routes[:x] + routes[x + 1:])
+                result = self.results[key]
+                if result.path == None:
+                    extra = float('inf')
+                else:
+                    extra = max(result.cost - costs[x], 0)
+                children.append((x, key[1], result, extra))
+            options.append(children)
+        return options
+
+    def lower_bound(self, options):
+        '''
+        How much more the routes of a node have to cost at least. Each
+        cardinal conflict adds the extra cost of its cheaper child, counting
+        only conflicts between agents that aren't in another counted one.
+        '''
+        bound = 0
+        counted = set()
+        for (a, _, _, extra_a), (b, _, _, extra_b) in sorted(options, key=lambda children: -min(children[0][3], children[1][3])):
+            extra = min(extra_a, extra_b)
+            if extra < EPSILON:
+                break
+            if a in counted or b in counted:
+                continue
+            counted.add(a)
+            counted.add(b)
+            bound += extra
+        return bound
+
+    def push(self, tree, agents, node):
+        '''
+        Work out the children of a node and put it on the tree,
+        unless none of its plans can be finished
+        '''
+        options = self.children(agents, node)
+        bound = self.lower_bound(options)
+        if bound < float('inf'):
+            costs, conflicts = node[3], node[4]
+            heapq.heappush(tree, (sum(costs) + bound, len(conflicts), self.count, node, options))
+            self.count += 1
+
+    def plan(self, agents):
+        '''
+        Plan a route for every agent from where it stands now.
+        Returns True if CBS found a collision free plan.
+        '''
+        for agent in agents:
+            agent.path = None
+        if any(agent.no_solution for agent in agents):
+            return False
+
+        paths = []
+        routes = []
+        costs = []
+        for agent in agents:
+            result = self.route(agent, (), routes)
+            if result.path == None:
+                agent.no_solution = True
+                return False
+            paths.append(result.path)
+            routes.append([self.flat.index(i, j) for i, j in result.path])
+            costs.append(result.cost)
+
+        tree = []
+        self.push(tree, agents, ([()] * len(agents), paths, routes, costs, find_conflicts(routes)))
+        while tree:
+            _, _, _, node, options = heapq.heappop(tree)
+            constraints, paths, routes, costs, conflicts = node
+            if not conflicts:
+                for agent, path, cost in zip(agents, paths, costs):
+                    agent.path = path
+                    agent.path_index = 1
+                    agent.path_cost = cost
+                self.makespan = max(len(route) for route in routes) - 1
+                return True
+
+            self.nodes += 1
+            if self.nodes > self.max_nodes:
+                return False
+
+            # cardinal conflicts first, then ones where one child costs more
+            split = max(options, key=lambda children: (min(children[0][3], children[1][3]),
+                                                       max(children[0][3], children[1][3])))
+            children = []
+            for x, child_constraints, result, extra in split:
+                if result.path == None:
+                    continue
+                child_paths = list(paths)
+                child_routes = list(routes)
+                child_costs = list(costs)
+                child_paths[x] = result.path
+                child_routes[x] = [self.flat.index(i, j) for i, j in result.path]
+                child_costs[x] = result.cost
+                child_conflicts = find_conflicts(child_routes)
+
+                if self.bypass and extra < EPSILON and len(child_conflicts) < len(conflicts):
+                    # the new route also meets this node's constraints, so take it here
+                    self.bypasses += 1
+                    children = [(constraints, child_paths, child_routes, child_costs, child_conflicts)]
+                    break
+
+                node_constraints = list(constraints)
+                node_constraints[x] = child_constraints
+                children.append((node_constraints, child_paths, child_routes, child_costs, child_conflicts))
+
+            for child in children:
+                self.push(tree, agents, child)
+        return False
+
+    def stats(self):
+        return {'makespan': self.makespan, 'ct_nodes': self.nodes, 'bypasses': self.bypasses,
+                'searches': self.searches}
+
+
+class CBSAgent(CooperativeAStarAgent):
+    '''
+    Space-time A* agent that a Board plans together with the rest of its team
+    using Conflict-Based Search. The routes have the lowest sum of costs of
+    any collision free plan, where waiting a time step costs 1.
+    '''
+    __slots__ = ()
+
+    team_planner = ConflictBasedSearch
+
+    def name(self):
+        return 'CBSAgent'
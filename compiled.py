@@ -0,0 +1,311 @@
+'''
+Optional compiled backend for the hot loops.
+
+When Numba is installed, the inner loops of A* and of guided local search
+are compiled to machine code, and run straight over the bordered array
+behind the board grid (see grid.make_grid), so they need no bounds checks.
+Without Numba, the agents in here fall back to the Python agents they extend
+and behave exactly like them.
+
+Both agents have the same interface as every other agent, so Board.test can
+run them next to their Python versions:
+
+    board.test(agent_classes=[OptimizedAStarAgent, CompiledAStarAgent])
+
+Nothing is compiled when this module is imported. The kernels are compiled
+in memory the first time a compiled agent is placed on a board, by running
+them once on a tiny grid (see warm_up), so the compile time never shows up
+in the timings of Board.test, which start after the agent is placed.
+Each agent reports a 'compiled' stat of 1 when its kernel ran.
+'''
+import heapq
+import math
+import numpy as np
+from grid import FREE, OBSTACLE, OCCUPIED, FlatGrid, make_grid, padding
+from search import SQRT2, SearchResult, SearchWorkspace
+from agents import GuidedLocalSearchAgent, MAX_PENALTY
+from optimized_agents import OptimizedAStarAgent
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# set once warm_up has compiled the kernels
+warmed_up = False
+
+
+def compiled(function):
+    '''
+    Compile a kernel with Numba on its first call,
+    or leave it as plain Python without Numba
+    '''
+    if njit == None:
+        return function
+    return njit(nogil=True)(function)
+
+
+@compiled
+def a_star_kernel(padded, s, t, g, parent, seen, closed, generation):
+    '''
+    search.a_star with the octile heuristic, over the flat indices of a
+    bordered grid. Breaks ties the same way, so it finds the same path.
+
+    g, parent, seen and closed are the arrays of a search.SearchWorkspace,
+    see SearchWorkspace.arrays(). Like search.a_star, an entry only counts
+    when seen or closed holds this search's generation, so they are never
+    cleared.
+
+    Returns (path, cost, expanded, generated, peak_frontier, peak_visited),
+    where path holds the flat indices from s to t, or is empty with cost -1
+    when t can't be reached.
+    '''
+    width = padded.shape[1]
+    cells = padded.reshape(-1)
+
+    # the move order and costs of search.MOVES
+    offsets = np.array([width, 1, -width, -1, width + 1, width - 1, -width + 1, -width - 1])
+    costs = np.array([1.0, 1.0, 1.0, 1.0, SQRT2, SQRT2, SQRT2, SQRT2])
+    ti = t // width
+    tj = t % width
+
+    g[s] = 0.0
+    seen[s] = generation
+    di = abs(s // width - ti)
+    dj = abs(s % width - tj)
+    h = max(di, dj) + (SQRT2 - 1) * min(di, dj)
+    frontier = [(h, h, s)]
+    expanded = 0
+    generated = 1
+    peak_frontier = 1
+    visited = 1
+
+    while frontier:
+        _, _, k = heapq.heappop(frontier)
+        if closed[k] == generation:
+            continue
+        if k == t:
+            length = 1
+            x = t
+            while x != s:
+                x = parent[x]
+                length += 1
+            path = np.empty(length, dtype=np.int64)
+            x = t
+            for y in range(length - 1, -1, -1):
+                path[y] = x
+                if y > 0:
+                    x = parent[x]
+            return path, g[t], expanded, generated, peak_frontier, visited
+
+        closed[k] = generation
+        expanded += 1
+        g_k = g[k]
+        for m in range(8):
+            nk = k + offsets[m]
+            if closed[nk] == generation or cells[nk] >= OBSTACLE:
+                continue
+            g_new = g_k + costs[m]
+            if seen[nk] != generation or g_new < g[nk]:
+                if seen[nk] != generation:
+                    visited += 1
+                    seen[nk] = generation
+                g[nk] = g_new
+                parent[nk] = k
+                di = abs(nk // width - ti)
+                dj = abs(nk % width - tj)
+                h = max(di, dj) + (SQRT2 - 1) * min(di, dj)
+                heapq.heappush(frontier, (g_new + h, h, nk))
+                generated += 1
+        if len(frontier) > peak_frontier:
+            peak_frontier = len(frontier)
+
+    return np.empty(0, dtype=np.int64), -1.0, expanded, generated, peak_frontier, visited
+
+
+@compiled
+def guided_walk_kernel(padded, s, t, offsets):
+    '''
+    Run GuidedLocalSearchAgent from flat index s until it reaches t or
+    gives up, on a copy of the bordered grid.
+
+    Returns (steps, heuristic_calls, failed, expanded, peak_frontier).
+    steps holds the flat index of every move in order, not including s.
+    failed is True when the agent gives up, which it does after its last
+    step. Every step expands a cell into its open neighbors, which are the
+    heuristic calls, and peak_frontier is the most open neighbors of a cell.
+    '''
+    width = padded.shape[1]
+    cells = padded.copy().reshape(-1)
+    penalties = np.zeros(cells.size, dtype=np.int64)
+    ti = t // width
+    tj = t % width
+
+    steps = []
+    calls = 0
+    expanded = 0
+    peak_frontier = 0
+    k = s
+    while k != t:
+        expanded += 1
+        best = np.inf
+        best_k = -1
+        failed = False
+        moves = 0
+        for d in offsets:
+            nk = k + d
+            if cells[nk] >= OBSTACLE:
+                continue
+            calls += 1
+            moves += 1
+            penalty = penalties[nk]
+            if penalty > 100:
+                failed = True
+                value = -1.0
+            else:
+                di = nk // width - ti
+                dj = nk % width - tj
+                h = math.sqrt(di * di + dj * dj)
+                value = h + penalty * h
+            if value < best:
+                best = value
+                best_k = nk
+
+        if moves > peak_frontier:
+            peak_frontier = moves
+        if best_k == -1:
+            return np.array(steps, dtype=np.int64), calls, True, expanded, peak_frontier
+
+        penalties[best_k] += 1
+        cells[k] = FREE
+        cells[best_k] = OCCUPIED
+        k = best_k
+        steps.append(k)
+        if failed:
+            return np.array(steps, dtype=np.int64), calls, True, expanded, peak_frontier
+
+    return np.array(steps, dtype=np.int64), calls, False, expanded, peak_frontier
+
+
+def warm_up():
+    '''
+    Compile the kernels by running them once on a tiny grid. The compiled
+    agents call this when a Board places them, before Board.test starts
+    timing their moves.
+    '''
+    global warmed_up
+    if njit == None or warmed_up:
+        return
+    grid = make_grid(3, 3)
+    workspace = SearchWorkspace(grid)
+    flat = FlatGrid(grid)
+    s = flat.index(0, 0)
+    t = flat.index(2, 2)
+    a_star_kernel(padding(grid), s, t, *workspace.arrays(), workspace.begin())
+    guided_walk_kernel(padding(grid), s, t, np.array(flat.offsets, dtype=np.int64))
+    warmed_up = True
+
+
+class CompiledAStarAgent(OptimizedAStarAgent):
+    '''
+    OptimizedAStarAgent with its search in a_star_kernel. It finds the same
+    paths and counts the same heuristic calls, one per generated node.
+    '''
+    __slots__ = ()
+
+    def name(self):
+        return 'CompiledAStarAgent'
+
+    def attach(self, owner):
+        warm_up()
+        super().attach(owner)
+
+    def search(self, board):
+        if njit == None:
+            return super().search(board)
+
+        flat = self.flat_grid(board)
+        s = flat.index(self.i, self.j)
+        t = flat.index(self.goal_i, self.goal_j)
+        workspace = self.search_workspace(board)
+        g, parent, seen, closed = workspace.arrays()
+        path, cost, expanded, generated, peak_frontier, visited = a_star_kernel(padding(board), s, t, g, parent, seen,
+                                                                                closed, workspace.begin())
+        self.heuristic_calls += generated
+        if cost < 0:
+            return SearchResult(None, -1, expanded, generated, peak_frontier, visited)
+        return SearchResult([self.flat.coord(k) for k in path.tolist()], cost, expanded, generated,
+                            peak_frontier, visited)
+
+    def stats(self):
+        stats = super().stats()
+        stats['compiled'] = int(njit != None)
+        return stats
+
+
+class CompiledGuidedLocalSearchAgent(GuidedLocalSearchAgent):
+    '''
+    GuidedLocalSearchAgent with its whole walk run by guided_walk_kernel on
+    the first move. Every move after that takes the next step of the walk,
+    so it visits the same cells and gives up at the same point.
+
+    Like the A* agents, it doesn't see agents that move after it has planned.
+    '''
+    __slots__ = ('steps', 'step_index', 'failed')
+
+    def __init__(self, color, i, j, goal_i, goal_j, board):
+        super().__init__(color, i, j, goal_i, goal_j, board)
+        self.steps = None
+        self.step_index = 0
+        self.failed = False
+
+    def name(self):
+        return 'CompiledGuidedLocalSearchAgent'
+
+    def attach(self, owner):
+        warm_up()
+        super().attach(owner)
+
+    def plan(self, board):
+        if self.penalties == None:
+            self.start_penalties()
+        s = self.flat.index(self.i, self.j)
+        t = self.flat.index(self.goal_i, self.goal_j)
+        offsets = np.array(self.flat.offsets, dtype=np.int64)
+        steps, calls, self.failed, expanded, peak_frontier = guided_walk_kernel(padding(board), s, t, offsets)
+        self.steps = steps.tolist()
+        self.step_index = 0
+        self.heuristic_calls += calls
+        # counted like the moves of GuidedLocalSearchAgent, see Agent.count_local_step
+        self.count_step(expanded, calls, peak_frontier, peak_frontier + 1)
+
+    def move(self, board):
+        if njit == None:
+            return super().move(board)
+
+        if self.is_goal() or self.no_solution:
+            return
+
+        if self.steps == None:
+            start = self.profile.start()
+            self.plan(board)
+            self.profile.stop('search', start)
+        if self.step_index == len(self.steps):
+            self.no_solution = True
+            return
+
+        k = self.steps[self.step_index]
+        self.step_index += 1
+        self.penalties[k] = min(self.penalties[k] + 1, MAX_PENALTY)
+
+        board[self.i, self.j] = FREE
+        self.i, self.j = self.flat.coord(k)
+        board[self.i, self.j] = OCCUPIED
+
+        if self.failed and self.step_index == len(self.steps):
+            self.no_solution = True
+
+    def stats(self):
+        stats = super().stats()
+        stats['compiled'] = int(njit != None)
+        return stats
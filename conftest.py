@@ -0,0 +1,159 @@
+'''
+Shared helpers for the tests: seeded random boards, a plain Dijkstra
+search to check costs against, and checks of paths and team routes.
+'''
+import heapq
+import random
+import numpy as np
+import pytest
+from board import Board
+from grid import FREE, OBSTACLE, make_grid
+from search import MOVES
+from multiagent import step_agents
+
+
+def random_board(rng, rows, cols, density):
+    '''
+    A board grid with about density of its cells blocked
+    '''
+    board = make_grid(rows, cols)
+    for i in range(rows):
+        for j in range(cols):
+            if rng.random() < density:
+                board[i, j] = OBSTACLE
+    return board
+
+
+def open_cell(rng, board):
+    rows, cols = board.shape
+    while True:
+        i = rng.randrange(rows)
+        j = rng.randrange(cols)
+        if board[i, j] < OBSTACLE:
+            return (i, j)
+
+
+def dijkstra(board, start, goal):
+    '''
+    Length of the shortest path from start to goal, or -1 if there is none
+    '''
+    rows, cols = board.shape
+    dist = {start: 0}
+    frontier = [(0, start)]
+    while frontier:
+        d, (i, j) = heapq.heappop(frontier)
+        if (i, j) == goal:
+            return d
+        if d > dist[(i, j)]:
+            continue
+        for di, dj, cost in MOVES:
+            ni = i + di
+            nj = j + dj
+            if 0 <= ni < rows and 0 <= nj < cols and board[ni, nj] < OBSTACLE:
+                if d + cost < dist.get((ni, nj), float('inf')):
+                    dist[(ni, nj)] = d + cost
+                    heapq.heappush(frontier, (d + cost, (ni, nj)))
+    return -1
+
+
+def queries(seed, count=4):
+    '''
+    A random board and count start and goal pairs on it
+    '''
+    rng = random.Random(seed)
+    board = random_board(rng, rng.randint(5, 30), rng.randint(5, 30), rng.choice((0.1, 0.25, 0.4)))
+    return board, [(open_cell(rng, board), open_cell(rng, board)) for _ in range(count)]
+
+
+def check_path(board, result, start, goal):
+    '''
+    The path of a result has to run from start to goal over open
+    neighboring cells, and add up to its cost
+    '''
+    if result.path == None:
+        assert result.cost == -1
+        return
+    assert result.path[0] == start
+    assert result.path[-1] == goal
+    length = 0
+    for (i, j), (ni, nj) in zip(result.path, result.path[1:]):
+        assert max(abs(ni - i), abs(nj - j)) == 1
+        assert board[ni, nj] < OBSTACLE
+        length += ((ni - i) ** 2 + (nj - j) ** 2) ** (1/2)
+    assert length == pytest.approx(result.cost)
+
+
+def place_team(agent_class, seed, count, rows=20, cols=20):
+    '''
+    A seeded board with a team of count agents placed on it
+    '''
+    board = Board(num_islands=20, min_island_size=3, max_island_size=10, num_agents=count, rows=rows, cols=cols)
+    board.seed(seed)
+    board.generate_board()
+    for (i, j), (goal_i, goal_j) in board.get_open_pairs(count):
+        board.agents.append(board.place_single_agent(agent_class, i, j, goal_i, goal_j))
+    return board
+
+
+def check_routes(board, agents):
+    '''
+    Every route has to be a walk over open cells from the agent's start to
+    its goal, one step or wait per time step, and no two agents may share
+    a cell or swap places at any time step, counting agents that wait on
+    their goals after their routes end
+    '''
+    obstacles = board.board == OBSTACLE
+    steps = {(di, dj) for di, dj, _ in MOVES} | {(0, 0)}
+    for agent in agents:
+        path = agent.path
+        assert path[0] == (agent.i, agent.j)
+        assert path[-1] == (agent.goal_i, agent.goal_j)
+        for (i, j), (ni, nj) in zip(path, path[1:]):
+            assert (ni - i, nj - j) in steps
+            assert not obstacles[ni, nj]
+
+    def at(path, t):
+        return path[min(t, len(path) - 1)]
+
+    paths = [agent.path for agent in agents]
+    for t in range(max(len(path) for path in paths)):
+        cells = [at(path, t) for path in paths]
+        assert len(set(cells)) == len(cells), f'vertex conflict at time {t}'
+        if t:
+            moves = {(at(path, t - 1), at(path, t)) for path in paths if at(path, t - 1) != at(path, t)}
+            for a, b in moves:
+                assert (b, a) not in moves, f'swap conflict at time {t - 1}'
+
+
+def route_cost(path):
+    '''
+    Cost of a route where waiting a time step costs 1
+    '''
+    cost = 0
+    for (i, j), (ni, nj) in zip(path, path[1:]):
+        if (i, j) == (ni, nj):
+            cost += 1
+        else:
+            cost += ((ni - i) ** 2 + (nj - j) ** 2) ** (1/2)
+    return cost
+
+
+def check_team(board, agent_class):
+    '''
+    Plan the team on a board, check its routes, and return whether it planned
+    '''
+    planned = agent_class.team_planner(board.board).plan(board.agents)
+    if not planned:
+        return False
+    check_routes(board, board.agents)
+
+    free = np.where(board.board == OBSTACLE, OBSTACLE, FREE)
+    for agent in board.agents:
+        assert agent.path_cost == pytest.approx(route_cost(agent.path))
+        assert agent.path_cost >= dijkstra(free, (agent.i, agent.j), (agent.goal_i, agent.goal_j)) - 1e-9
+
+    # stepping the team follows the routes, and never puts two agents on one cell
+    while not all(agent.is_goal() for agent in board.agents):
+        step_agents(board.board, board.agents)
+        assert len({(agent.i, agent.j) for agent in board.agents}) == len(board.agents)
+    return True
@@ -0,0 +1,200 @@
+'''
+Precomputed fields over the whole board.
+
+A field is a NumPy array with one value per cell, computed once,
+so looking a value up is plain array indexing instead of running
+Python arithmetic on every call.
+
+Heuristic fields ignore obstacles and are built with vectorized operations.
+Distance fields are flooded over the board with Dijkstra, so they hold the
+true distance around obstacles.
+'''
+import heapq
+import numpy as np
+from grid import OBSTACLE
+from search import SQRT2, MOVES
+
+METRICS = ('euclidean', 'octile', 'manhattan', 'chebyshev')
+
+
+def heuristic_field(rows, cols, goal_i, goal_j, metric='euclidean'):
+    '''
+    Give the distance from every cell to the goal, ignoring obstacles.
+
+    The distances along each axis are broadcast against each other,
+    so the whole field is built without a Python loop. Fields are
+    read-only, since the Board caches them for all of its agents,
+    see Board.heuristic_field.
+
+    Parameters:
+        rows, cols (int): size of the board
+        goal_i, goal_j (int): the goal coordinate
+        metric (str): one of 'euclidean', 'octile', 'manhattan' or 'chebyshev'
+    '''
+    di = np.abs(np.arange(rows, dtype=np.float64) - goal_i)[:, None]
+    dj = np.abs(np.arange(cols, dtype=np.float64) - goal_j)[None, :]
+
+    if metric == 'euclidean':
+        field = np.sqrt(di ** 2 + dj ** 2)
+    elif metric == 'octile':
+        field = np.maximum(di, dj) + (SQRT2 - 1) * np.minimum(di, dj)
+    elif metric == 'manhattan':
+        field = di + dj
+    elif metric == 'chebyshev':
+        field = np.maximum(di, dj)
+    else:
+        raise ValueError(f'Unknown heuristic metric: {metric}, expected one of {METRICS}')
+
+    field.flags.writeable = False
+    return field
+
+
+def distance_field(board, sources):
+    '''
+    Give the shortest path distance from every cell to the nearest source.
+
+    Runs Dijkstra from all of the sources at once over the 8-connected grid,
+    with the same move costs as search.a_star. Only obstacles block, agents
+    and goals on the board don't, so agents standing on the board can still
+    read their distance. Unreachable cells are inf. The field is read-only.
+
+    Since it is exact, the field is a perfect heuristic for any of the sources,
+    and follow_field walks it straight to the nearest one.
+
+    Parameters:
+        board (np.ndarray): the board grid
+        sources ([(int, int)]): the coordinates to measure distances from
+    '''
+    rows, cols = board.shape
+    cells = board.tobytes()
+    n = rows * cols
+
+    dist = [float('inf')] * n
+    done = bytearray(n)
+    frontier = []
+    for i, j in sources:
+        k = i * cols + j
+        dist[k] = 0
+        frontier.append((0, k))
+    heapq.heapify(frontier)
+
+    while frontier:
+        d, k = heapq.heappop(frontier)
+        if done[k]:
+            continue
+        done[k] = 1
+        i, j = divmod(k, cols)
+
+        for di, dj, cost in MOVES:
+            ni = i + di
+            nj = j + dj
+            if not (0 <= ni < rows and 0 <= nj < cols):
+                continue
+            nk = ni * cols + nj
+            if done[nk] or cells[nk] == OBSTACLE:
+                continue
+
+            d_new = d + cost
+            if d_new < dist[nk]:
+                dist[nk] = d_new
+                heapq.heappush(frontier, (d_new, nk))
+
+    field = np.array(dist, dtype=np.float64).reshape(rows, cols)
+    field.flags.writeable = False
+    return field
+
+
+def follow_field(field, start):
+    '''
+    Walk a distance field downhill from start to a source.
+
+    Every step goes to the neighbor with the lowest distance plus move cost,
+    which is the next cell on a shortest path. Returns the path as a list of
+    (i, j) coordinates, or None if start can't reach any source.
+    '''
+    rows, cols = field.shape
+    i, j = start
+    if field.item(i, j) == float('inf'):
+        return None
+
+    path = [(i, j)]
+    while field.item(i, j) > 0:
+        best = None
+        best_value = float('inf')
+        for di, dj, cost in MOVES:
+            ni = i + di
+            nj = j + dj
+            if 0 <= ni < rows and 0 <= nj < cols:
+                value = field.item(ni, nj) + cost
+                if value < best_value:
+                    best = (ni, nj)
+                    best_value = value
+        i, j = best
+        path.append(best)
+    return path
+
+
+def component_labels(board):
+    '''
+    Label the connected areas of open cells, with 8-connectivity.
+
+    Every horizontal run of open cells is a node of a union-find, and runs
+    in neighbouring rows are joined when they touch, diagonals included.
+    That makes one Python step per run instead of per cell, and the labels
+    are written back into the grid with a single vectorized assignment.
+
+    Returns a read-only int32 array. Obstacles are 0, and two open cells
+    are connected exactly when they have the same label.
+    '''
+    rows, cols = board.shape
+    free = board != OBSTACLE
+
+    # runs start where a row goes from blocked to open and end where it goes back
+    padded = np.zeros((rows, cols + 2), dtype=np.int8)
+    padded[:, 1:-1] = free
+    steps = np.diff(padded, axis=1)
+    run_rows, run_starts = np.nonzero(steps == 1)
+    _, run_ends = np.nonzero(steps == -1)
+    run_rows = run_rows.tolist()
+    run_starts = run_starts.tolist()
+    run_ends = run_ends.tolist()
+
+    parent = list(range(len(run_rows)))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    # walk the runs of each pair of neighbouring rows side by side
+    first = np.searchsorted(run_rows, np.arange(rows + 1)).tolist()
+    for r in range(rows - 1):
+        a, a_end = first[r], first[r + 1]
+        b, b_end = first[r + 1], first[r + 2]
+        while a < a_end and b < b_end:
+            # touching, or only diagonally touching, counts as connected
+            if run_starts[b] <= run_ends[a] and run_starts[a] <= run_ends[b]:
+                root_a = find(a)
+                root_b = find(b)
+                if root_a != root_b:
+                    parent[root_b] = root_a
+            if run_ends[a] < run_ends[b]:
+                a += 1
+            else:
+                b += 1
+
+    roots = {}
+    run_labels = []
+    for x in range(len(parent)):
+        root = find(x)
+        if root not in roots:
+            roots[root] = len(roots) + 1
+        run_labels.append(roots[root])
+
+    labels = np.zeros(rows * cols, dtype=np.int32)
+    # open cells in row-major order are exactly the runs in order
+    labels[free.ravel()] = np.repeat(np.array(run_labels, dtype=np.int32), np.array(run_ends) - np.array(run_starts))
+    labels = labels.reshape(rows, cols)
+    labels.flags.writeable = False
+    return labels
@@ -0,0 +1,184 @@
+'''
+Frontiers for the step-by-step search agents.
+
+The agents used to keep their frontier in a plain list, so checking whether a
+cell was already on it and finding the best cell to expand were both a scan of
+the whole list, which made every step O(frontier).
+
+IndexedPriorityQueue is for frontiers whose priorities don't change. It is a
+binary heap with a position index, so membership is a dict lookup and push,
+pop and decrease-key are O(log n).
+
+CoordinateFrontier is for frontiers ranked by the distance to a target that
+moves on every step, like the two ends of BidirectionalSearchAgent. It keeps
+the cells in NumPy arrays and finds the nearest one in a single vectorized pass.
+
+Both break ties by insertion order, the same as taking the first best cell
+from a list, so the agents expand cells in the same order as before.
+
+Both time their operations with their profile, see profiling.py. The
+agents that own them set it, and it is NO_PROFILE otherwise.
+'''
+import numpy as np
+from profiling import NO_PROFILE
+
+
+class IndexedPriorityQueue():
+    '''
+    Binary min-heap of items with an index from item to heap position
+    '''
+    def __init__(self):
+        self.heap = []
+        self.position = {}
+        self.count = 0
+        self.profile = NO_PROFILE
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, item):
+        return item in self.position
+
+    def push(self, item, priority):
+        '''
+        Add an item, or lower its priority if it is already queued
+        with a higher one
+        '''
+        start = self.profile.start()
+        if item in self.position:
+            k = self.position[item]
+            if priority < self.heap[k][0]:
+                self.heap[k] = (priority, self.heap[k][1], item)
+                self.sift_up(k)
+        else:
+            self.heap.append((priority, self.count, item))
+            self.count += 1
+            self.position[item] = len(self.heap) - 1
+            self.sift_up(len(self.heap) - 1)
+        self.profile.stop('queue_push', start)
+
+    def pop(self):
+        '''
+        Remove and return the item with the lowest priority
+        '''
+        start = self.profile.start()
+        heap = self.heap
+        entry = heap.pop()
+        if heap:
+            entry, heap[0] = heap[0], entry
+            self.position[heap[0][2]] = 0
+            self.sift_down(0)
+        del self.position[entry[2]]
+        self.profile.stop('queue_pop', start)
+        return entry[2]
+
+    def sift_up(self, k):
+        heap = self.heap
+        position = self.position
+        entry = heap[k]
+        while k > 0:
+            parent = (k - 1) >> 1
+            if heap[parent] <= entry:
+                break
+            heap[k] = heap[parent]
+            position[heap[k][2]] = k
+            k = parent
+        heap[k] = entry
+        position[entry[2]] = k
+
+    def sift_down(self, k):
+        heap = self.heap
+        position = self.position
+        n = len(heap)
+        entry = heap[k]
+        while True:
+            child = 2 * k + 1
+            if child >= n:
+                break
+            if child + 1 < n and heap[child + 1] < heap[child]:
+                child += 1
+            if entry <= heap[child]:
+                break
+            heap[k] = heap[child]
+            position[heap[k][2]] = k
+            k = child
+        heap[k] = entry
+        position[entry[2]] = k
+
+
+class CoordinateFrontier():
+    '''
+    Set of (i, j) cells that can pop the one nearest to any point.
+
+    Removal swaps the last cell into the gap, so the arrays never shift,
+    and each cell keeps its insertion number to break ties.
+    '''
+    def __init__(self, capacity=64):
+        self.rows = np.empty(capacity, dtype=np.int64)
+        self.cols = np.empty(capacity, dtype=np.int64)
+        self.order = np.empty(capacity, dtype=np.int64)
+        self.size = 0
+        self.count = 0
+        self.position = {}
+        self.profile = NO_PROFILE
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, coord):
+        return coord in self.position
+
+    def add(self, coord):
+        '''
+        Add a cell if it isn't already in the frontier
+        '''
+        start = self.profile.start()
+        if coord not in self.position:
+            if self.size == len(self.rows):
+                self.rows = np.resize(self.rows, 2 * self.size)
+                self.cols = np.resize(self.cols, 2 * self.size)
+                self.order = np.resize(self.order, 2 * self.size)
+
+            k = self.size
+            self.rows[k], self.cols[k] = coord
+            self.order[k] = self.count
+            self.position[coord] = k
+            self.size += 1
+            self.count += 1
+        self.profile.stop('frontier_add', start)
+
+    def reset(self, coords):
+        '''
+        Replace the contents of the frontier with the given cells
+        '''
+        self.size = 0
+        self.position = {}
+        for coord in coords:
+            self.add(coord)
+
+    def pop_nearest(self, i, j):
+        '''
+        Remove and return the cell with the smallest straight line distance
+        to (i, j). Squared distances are compared, which are exact integers.
+        '''
+        start = self.profile.start()
+        n = self.size
+        di = self.rows[:n] - i
+        dj = self.cols[:n] - j
+        distances = di * di + dj * dj
+        ties = np.flatnonzero(distances == distances.min())
+        k = ties[0]
+        if len(ties) > 1:
+            k = ties[np.argmin(self.order[ties])]
+
+        coord = (int(self.rows[k]), int(self.cols[k]))
+        last = n - 1
+        if k != last:
+            self.rows[k] = self.rows[last]
+            self.cols[k] = self.cols[last]
+            self.order[k] = self.order[last]
+            self.position[(int(self.rows[k]), int(self.cols[k]))] = k
+        del self.position[coord]
+        self.size = last
+        self.profile.stop('frontier_pop_nearest', start)
+        return coord
@@ -0,0 +1,104 @@
+'''
+Cell values for the board grid.
+
+The board is stored as a compact uint8 NumPy array instead of a list of lists
+holding Python objects. Agents are never written into the grid themselves,
+only the OCCUPIED marker is. The Board keeps a separate index of which agent
+sits where.
+
+Values below OBSTACLE are passable, so a neighbor check is a single
+comparison: board[i, j] < OBSTACLE
+
+Every grid from make_grid is the inside of a larger array with a border of
+OBSTACLE cells around it. FlatGrid uses the border to expand neighbors by
+flat index without any bounds checks.
+'''
+import numpy as np
+
+FREE = 0
+GOAL = 1
+OBSTACLE = 2
+OCCUPIED = 3
+
+# (di, dj) of the 8 neighbors of a cell, in the order the agents try their moves
+NEIGHBORS = ((1, 0), (1, 1), (1, -1), (0, 1), (0, -1), (-1, 1), (-1, 0), (-1, -1))
+
+
+def make_grid(rows, cols):
+    '''
+    Create an empty board grid of the given size
+    '''
+    padded = np.full((rows + 2, cols + 2), OBSTACLE, dtype=np.uint8)
+    grid = padded[1:-1, 1:-1]
+    grid[:] = FREE
+    return grid
+
+
+def padding(grid):
+    '''
+    Return the bordered array a grid from make_grid is the inside of
+    '''
+    rows, cols = grid.shape
+    padded = grid.base
+    if not isinstance(padded, np.ndarray) or padded.shape != (rows + 2, cols + 2) or \
+            grid.ctypes.data - padded.ctypes.data != cols + 3 or not padded.flags.c_contiguous:
+        raise ValueError('Expected a board grid from grid.make_grid')
+    return padded
+
+
+class FlatGrid():
+    '''
+    Neighbor expansion by flat cell index.
+
+    A cell (i, j) of the grid is index (i + 1) * width + (j + 1) of its bordered
+    array, and its neighbors are that index plus a fixed offset each. Cells past
+    the edge of the grid land on the border, which reads as OBSTACLE, so a
+    neighbor is open exactly when its value is below OBSTACLE. cells is a flat
+    memoryview of the bordered array, so it sees every write to the grid and
+    reading it gives a plain int.
+    '''
+    def __init__(self, grid):
+        rows, cols = grid.shape
+        self.grid = grid
+        self.rows = rows
+        self.cols = cols
+        self.width = cols + 2
+        self.cells = memoryview(padding(grid)).cast('B')
+        self.size = len(self.cells)
+        self.offsets = tuple(di * self.width + dj for di, dj in NEIGHBORS)
+        # (di, dj, offset) for the moves that hand back coordinates
+        self.moves = tuple((di, dj, di * self.width + dj) for di, dj in NEIGHBORS)
+
+    def index(self, i, j):
+        return (i + 1) * self.width + j + 1
+
+    def coord(self, k):
+        i, j = divmod(k, self.width)
+        return (i - 1, j - 1)
+
+    def open_neighbors(self, k):
+        '''
+        Flat indices of the open neighbors of flat index k
+        '''
+        cells = self.cells
+        return [k + d for d in self.offsets if cells[k + d] < OBSTACLE]
+
+    def open_coords(self, i, j):
+        '''
+        (i, j) coordinates of the open neighbors of (i, j)
+        '''
+        cells = self.cells
+        k = (i + 1) * self.width + j + 1
+        return [(i + di, j + dj) for di, dj, d in self.moves if cells[k + d] < OBSTACLE]
+
+    def marked_neighbor(self, i, j):
+        '''
+        The first neighbor of (i, j) holding a GOAL or OCCUPIED marker,
+        or None if there isn't one
+        '''
+        cells = self.cells
+        k = (i + 1) * self.width + j + 1
+        for di, dj, d in self.moves:
+            if cells[k + d] == GOAL or cells[k + d] == OCCUPIED:
+                return (i + di, j + dj)
+        return None
@@ -0,0 +1,282 @@
+'''
+Hierarchical pathfinding (HPA*, Botea, Mueller and Schaeffer, 2004).
+
+The board is split into square clusters. Wherever two neighbouring clusters
+touch with open cells on both sides, transition cells are picked on each side,
+and the distance between every pair of transition cells in the same cluster is
+computed once, staying inside the cluster. Those cells and distances make up a
+small abstract graph, which is built once per board and shared by every query.
+
+A query connects its start and goal to the transition cells of their clusters,
+searches the abstract graph, and then fills in each hop with a search that is
+confined to a single cluster. Paths are close to optimal but not always optimal,
+since they have to pass through the chosen transition cells.
+
+Only obstacles block, like the distance fields in fields.py.
+'''
+import heapq
+import numpy as np
+from grid import FREE, OBSTACLE
+from search import SQRT2, MOVES, SearchResult, a_star, octile
+
+
+def cluster_distances(free, sources):
+    '''
+    Distances from each source to every cell of a small grid, moving only
+    through free cells. All of the sources are relaxed together with
+    vectorized min-plus sweeps until nothing changes.
+
+    Returns an array of shape (len(sources), rows, cols), inf where unreachable.
+    '''
+    rows, cols = free.shape
+    dist = np.full((len(sources), rows, cols), np.inf)
+    for x, (i, j) in enumerate(sources):
+        dist[x, i, j] = 0
+    # entering a blocked cell costs inf, so it never gets a finite distance
+    enter = np.where(free, 0, np.inf)
+
+    moves = []
+    for di, dj, cost in MOVES:
+        target = (slice(max(di, 0), rows + min(di, 0)), slice(max(dj, 0), cols + min(dj, 0)))
+        origin = (slice(max(-di, 0), rows + min(-di, 0)), slice(max(-dj, 0), cols + min(-dj, 0)))
+        moves.append((target, origin, enter[target] + cost))
+
+    while True:
+        before = dist.copy()
+        for target, origin, cost in moves:
+            dist_target = dist[:, target[0], target[1]]
+            np.minimum(dist_target, dist[:, origin[0], origin[1]] + cost, out=dist_target)
+        if np.array_equal(before, dist):
+            return dist
+
+
+def runs(mask):
+    '''
+    Yield (start, end) of every run of True values in a 1D boolean array
+    '''
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    for start, end in zip(edges[::2], edges[1::2]):
+        yield int(start), int(end)
+
+
+class ClusterGraph():
+    '''
+    The abstract graph of a board, see the module docstring.
+
+    Nodes are flat cell indices. edges[k] maps every node reachable from
+    node k in one hop to the cost of the hop: either a step across a cluster
+    border, or the shortest path to another node in the same cluster.
+    '''
+    def __init__(self, board, cluster_size=16):
+        rows, cols = board.shape
+        self.rows = rows
+        self.cols = cols
+        self.cluster_size = cluster_size
+        self.free = board != OBSTACLE
+        self.obstacles = np.where(self.free, FREE, OBSTACLE).astype(np.uint8)
+        self.edges = {}
+        # (cluster_i, cluster_j) -> transition cells in that cluster
+        self.nodes = {}
+
+        self.find_transitions()
+        self.connect_clusters()
+
+    def cluster_of(self, i, j):
+        return (i // self.cluster_size, j // self.cluster_size)
+
+    def bounds(self, cluster):
+        '''
+        (top, bottom, left, right) of a cluster, bottom and right exclusive
+        '''
+        size = self.cluster_size
+        top = cluster[0] * size
+        left = cluster[1] * size
+        return top, min(top + size, self.rows), left, min(left + size, self.cols)
+
+    def add_transition(self, a, b, cost):
+        '''
+        Connect two cells on either side of a cluster border
+        '''
+        ka = a[0] * self.cols + a[1]
+        kb = b[0] * self.cols + b[1]
+        for k, coord in ((ka, a), (kb, b)):
+            if k not in self.edges:
+                self.edges[k] = {}
+                self.nodes.setdefault(self.cluster_of(*coord), []).append(k)
+        self.edges[ka][kb] = cost
+        self.edges[kb][ka] = cost
+
+    def find_transitions(self):
+        '''
+        Pick transition cells along every cluster border.
+
+        Along each run of open cell pairs, short runs get one transition in
+        the middle and longer runs one at each end. Diagonal steps across a
+        border or a cluster corner that can't be made any other way get
+        their own transitions, so no connection between clusters is lost.
+        '''
+        free = self.free
+        size = self.cluster_size
+        for top in range(0, self.rows, size):
+            bottom = min(top + size, self.rows)
+            for left in range(0, self.cols, size):
+                right = min(left + size, self.cols)
+
+                # border with the cluster to the right, columns right - 1 and right
+                if right < self.cols:
+                    a = free[top:bottom, right - 1]
+                    b = free[top:bottom, right]
+                    for start, end in runs(a & b):
+                        for r in self.run_transitions(start, end):
+                            self.add_transition((top + r, right - 1), (top + r, right), 1)
+                    for r in np.flatnonzero(a[:-1] & b[1:] & ~b[:-1] & ~a[1:]):
+                        self.add_transition((top + r, right - 1), (top + r + 1, right), SQRT2)
+                    for r in np.flatnonzero(a[1:] & b[:-1] & ~b[1:] & ~a[:-1]):
+                        self.add_transition((top + r + 1, right - 1), (top + r, right), SQRT2)
+
+                # border with the cluster below, rows bottom - 1 and bottom
+                if bottom < self.rows:
+                    a = free[bottom - 1, left:right]
+                    b = free[bottom, left:right]
+                    for start, end in runs(a & b):
+                        for c in self.run_transitions(start, end):
+                            self.add_transition((bottom - 1, left + c), (bottom, left + c), 1)
+                    for c in np.flatnonzero(a[:-1] & b[1:] & ~b[:-1] & ~a[1:]):
+                        self.add_transition((bottom - 1, left + c), (bottom, left + c + 1), SQRT2)
+                    for c in np.flatnonzero(a[1:] & b[:-1] & ~b[1:] & ~a[:-1]):
+                        self.add_transition((bottom - 1, left + c + 1), (bottom, left + c), SQRT2)
+
+                # corners with the clusters diagonally below
+                if bottom < self.rows and right < self.cols:
+                    if free[bottom - 1, right - 1] and free[bottom, right] and \
+                            not free[bottom - 1, right] and not free[bottom, right - 1]:
+                        self.add_transition((bottom - 1, right - 1), (bottom, right), SQRT2)
+                    if free[bottom - 1, right] and free[bottom, right - 1] and \
+                            not free[bottom - 1, right - 1] and not free[bottom, right]:
+                        self.add_transition((bottom - 1, right), (bottom, right - 1), SQRT2)
+
+    def run_transitions(self, start, end):
+        if end - start < 6:
+            return [start + (end - start) // 2]
+        return [start, end - 1]
+
+    def connect_clusters(self):
+        '''
+        Add an edge between every pair of transition cells in the same
+        cluster that can reach each other without leaving it
+        '''
+        for cluster, nodes in self.nodes.items():
+            top, bottom, left, right = self.bounds(cluster)
+            local = [(k // self.cols - top, k % self.cols - left) for k in nodes]
+            dist = cluster_distances(self.free[top:bottom, left:right], local)
+            for x, kx in enumerate(nodes):
+                for y, ky in enumerate(nodes):
+                    d = dist[x, local[y][0], local[y][1]]
+                    if x != y and d < float('inf'):
+                        self.edges[kx][ky] = float(d)
+
+    def connect(self, coord):
+        '''
+        Distances from a cell to the transition cells of its cluster,
+        plus the distance field of the whole cluster, as (edges, dist)
+        '''
+        cluster = self.cluster_of(*coord)
+        top, bottom, left, right = self.bounds(cluster)
+        dist = cluster_distances(self.free[top:bottom, left:right], [(coord[0] - top, coord[1] - left)])[0]
+        edges = {}
+        for k in self.nodes.get(cluster, []):
+            d = dist[k // self.cols - top, k % self.cols - left]
+            if d < float('inf'):
+                edges[k] = float(d)
+        return edges, dist
+
+    def refine(self, a, b):
+        '''
+        Fill in the cells between two consecutive nodes of an abstract path,
+        not including a
+        '''
+        ai, aj = divmod(a, self.cols)
+        bi, bj = divmod(b, self.cols)
+        cluster = self.cluster_of(ai, aj)
+        if cluster != self.cluster_of(bi, bj):
+            # a step across a border
+            return [(bi, bj)]
+
+        top, bottom, left, right = self.bounds(cluster)
+        window = self.obstacles[top:bottom, left:right]
+        result = a_star(window, (ai - top, aj - left), (bi - top, bj - left))
+        return [(i + top, j + left) for i, j in result.path[1:]]
+
+    def find_path(self, start, goal):
+        '''
+        Find a path from start to goal through the abstract graph.
+
+        Returns a search.SearchResult. expanded and generated count
+        nodes of the abstract graph.
+        '''
+        cols = self.cols
+        s = start[0] * cols + start[1]
+        t = goal[0] * cols + goal[1]
+        if s == t:
+            return SearchResult([start], 0, 0, 1, 1, 1)
+
+        start_edges, start_dist = self.connect(start)
+        goal_edges, _ = self.connect(goal)
+        if self.cluster_of(*start) == self.cluster_of(*goal):
+            # the goal may be reachable without leaving the cluster
+            top, _, left, _ = self.bounds(self.cluster_of(*start))
+            d = start_dist[goal[0] - top, goal[1] - left]
+            if d < float('inf'):
+                start_edges[t] = float(d)
+
+        g = {s: 0}
+        parent = {s: -1}
+        closed = set()
+        frontier = [(octile(start[0], start[1], goal[0], goal[1]), s)]
+        expanded = 0
+        generated = 1
+        peak_frontier = 1
+
+        while frontier:
+            _, k = heapq.heappop(frontier)
+            if k in closed:
+                continue
+            if k == t:
+                break
+            closed.add(k)
+            expanded += 1
+
+            neighbors = list(self.edges.get(k, {}).items())
+            if k == s:
+                neighbors += start_edges.items()
+            if k in goal_edges:
+                neighbors.append((t, goal_edges[k]))
+
+            for nk, cost in neighbors:
+                if nk in closed:
+                    continue
+                g_new = g[k] + cost
+                if g_new < g.get(nk, float('inf')):
+                    g[nk] = g_new
+                    parent[nk] = k
+                    ni, nj = divmod(nk, cols)
+                    heapq.heappush(frontier, (g_new + octile(ni, nj, goal[0], goal[1]), nk))
+                    generated += 1
+            if len(frontier) > peak_frontier:
+                peak_frontier = len(frontier)
+
+        if t not in parent:
+            return SearchResult(None, -1, expanded, generated, peak_frontier, len(g))
+
+        nodes = []
+        k = t
+        while k != -1:
+            nodes.append(k)
+            k = parent[k]
+        nodes.reverse()
+
+        path = [start]
+        for a, b in zip(nodes, nodes[1:]):
+            path += self.refine(a, b)
+        return SearchResult(path, g[t], expanded, generated, peak_frontier, len(g))
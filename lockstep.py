@@ -0,0 +1,338 @@
+'''
+Lockstep stepping for many local search agents at once.
+
+Moving thousands of local search agents one Python object at a time spends
+most of its time in the interpreter. LocalSearchBatch keeps the positions,
+goals and search state of a whole batch of agents in NumPy arrays instead,
+and every tick looks at the 8 neighbors of every agent with a few array
+operations. Cells are flat indices of the bordered grid (see grid.make_grid),
+so the neighbors of every agent are its index plus a fixed offset each, and
+the border keeps them all on the board.
+
+The move rules are the ones of the agent classes, applied to every agent:
+    - SteepestAscentAgent: the first neighbor, in NEIGHBORS order, closer to
+      the goal than the agent, skipping the other closer cells of the move
+      before. Gives up when there isn't one.
+    - GuidedLocalSearchAgent: the neighbor with the lowest distance plus
+      penalty times distance, where the penalty is how often the agent chose
+      that cell before. Gives up after a move that saw a penalty over 100.
+    - SimulatedAnnealingAgent: the closest neighbor, unless a random
+      neighbor is taken by the annealing rule, at temperature 1000 over the
+      number of iterations. After more than 1000 iterations the temperature
+      resets, and it gives up after 10 resets. The agent class compares the
+      distances of (i, i) for a cell (i, j), the batch uses the cells' own.
+    - RandomLocalSearchAgent: a random neighbor, for at most 1000000 moves.
+Run alone, the deterministic ones take exactly the moves of their class.
+The random ones draw from a NumPy generator, so they take the same kind of
+moves but not the same ones.
+'''
+import numpy as np
+from grid import FREE, GOAL, OBSTACLE, OCCUPIED, NEIGHBORS, padding
+from fields import component_labels
+from agents import SteepestAscentAgent, GuidedLocalSearchAgent, SimulatedAnnealingAgent, RandomLocalSearchAgent
+
+# marks a free slot in a PairCounts table
+EMPTY = -1
+
+
+class PairCounts():
+    '''
+    Capped counts for (agent, cell) pairs, in a hash table of NumPy arrays.
+
+    A pair is the key agent * cells + cell. The table uses open addressing
+    with linear probing, and grows before it gets more than half full,
+    so its memory grows with the pairs that were counted instead of with
+    agents times cells. Counts stop at limit + 1, which is all the move
+    rules ever need to see, so they fit in a byte.
+    '''
+    def __init__(self, limit, capacity=1024):
+        self.limit = limit
+        self.keys = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.uint8)
+        self.resize(capacity)
+
+    def resize(self, capacity):
+        '''
+        Move the pairs into a table with room for capacity of them
+        '''
+        keys = self.keys
+        counts = self.counts
+        used = keys != EMPTY
+        self.size = 0
+        self.bits = max(int(capacity - 1).bit_length(), 1)
+        self.keys = np.full(1 << self.bits, EMPTY, dtype=np.int64)
+        self.counts = np.zeros(1 << self.bits, dtype=np.uint8)
+        self.insert(keys[used], counts[used])
+
+    def hash(self, keys):
+        # Fibonacci hashing, the top bits of the key times 2^64 over the golden ratio
+        return ((keys.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(64 - self.bits)).astype(np.int64)
+
+    def slots(self, keys):
+        '''
+        The slot of every key, or the free slot where it would go
+        '''
+        mask = len(self.keys) - 1
+        slot = self.hash(keys)
+        pending = np.arange(len(keys))
+        while pending.size:
+            found = self.keys[slot[pending]]
+            pending = pending[(found != keys[pending]) & (found != EMPTY)]
+            slot[pending] = (slot[pending] + 1) & mask
+        return slot
+
+    def insert(self, keys, counts):
+        '''
+        Put pairs that aren't in the table yet into free slots. When
+        several keys land on the same free slot, one of them gets it and
+        the others look further on.
+        '''
+        mask = len(self.keys) - 1
+        slot = self.hash(keys)
+        pending = np.arange(len(keys))
+        while pending.size:
+            taken = self.keys[slot[pending]] != EMPTY
+            slot[pending[taken]] = (slot[pending[taken]] + 1) & mask
+            claims = pending[~taken]
+            self.keys[slot[claims]] = keys[claims]
+            won = claims[self.keys[slot[claims]] == keys[claims]]
+            self.counts[slot[won]] = counts[won]
+            placed = np.zeros(len(keys), dtype=bool)
+            placed[won] = True
+            pending = pending[~placed[pending]]
+        self.size += len(keys)
+
+    def get(self, keys):
+        '''
+        The counts of the pairs, 0 for pairs never counted
+        '''
+        slot = self.slots(keys.reshape(-1))
+        counts = np.where(self.keys[slot] == keys.reshape(-1), self.counts[slot], 0)
+        return counts.reshape(keys.shape)
+
+    def add(self, keys):
+        '''
+        Count each of the pairs once more, the keys have to be different
+        '''
+        slot = self.slots(keys)
+        present = self.keys[slot] == keys
+        slot = slot[present]
+        self.counts[slot] = np.minimum(self.counts[slot], self.limit) + 1
+        new = keys[~present]
+        if 2 * (self.size + len(new)) > len(self.keys):
+            self.resize(4 * (self.size + len(new)))
+        self.insert(new, np.ones(len(new), dtype=np.uint8))
+
+
+class LocalSearchBatch():
+    '''
+    A batch of local search agents of one class on one board.
+
+    With collide, the agents are marked on the board and block each other,
+    like agents placed by a Board. They choose their moves at the same time,
+    and when two choose the same cell, the one earlier in the batch gets it
+    and the other waits a tick. Without collide, the agents only see the
+    obstacles, as if each one was alone on the board, and the board is never
+    written to. Agents whose goal is in another connected area give up
+    before their first move.
+
+    Parameters:
+        board (np.ndarray): the board grid, made by grid.make_grid
+        agent_class (Agent): one of the classes in rules
+        starts ([(int, int)]): start coordinate of every agent
+        goals ([(int, int)]): goal coordinate of every agent
+        seed (int): seed for the random moves
+        collide (bool): whether the agents block each other
+    '''
+    rules = {
+        SteepestAscentAgent: 'steepest_ascent',
+        GuidedLocalSearchAgent: 'guided_local_search',
+        SimulatedAnnealingAgent: 'simulated_annealing',
+        RandomLocalSearchAgent: 'random_local_search',
+    }
+
+    def __init__(self, board, agent_class, starts, goals, seed=None, collide=True):
+        if agent_class not in self.rules:
+            raise ValueError(f'No lockstep rule for {agent_class.__name__}, expected one of '
+                             f'{[rule.__name__ for rule in self.rules]}')
+        self.board = board
+        self.rule = getattr(self, self.rules[agent_class])
+        self.collide = collide
+        self.rng = np.random.default_rng(seed)
+
+        padded = padding(board)
+        self.width = padded.shape[1]
+        if collide:
+            # the live cells of the board, so the agents see each other
+            self.cells = padded.reshape(-1)
+        else:
+            self.cells = np.where(padded == OBSTACLE, OBSTACLE, FREE).astype(np.uint8).reshape(-1)
+        self.offsets = np.array([di * self.width + dj for di, dj in NEIGHBORS], dtype=np.int64)
+
+        starts = np.array(starts, dtype=np.int64).reshape(-1, 2) + 1
+        goals = np.array(goals, dtype=np.int64).reshape(-1, 2) + 1
+        n = len(starts)
+        self.pos = starts[:, 0] * self.width + starts[:, 1]
+        self.goal = goals[:, 0] * self.width + goals[:, 1]
+        self.goal_i = goals[:, 0]
+        self.goal_j = goals[:, 1]
+        if collide:
+            self.cells[self.goal] = GOAL
+            self.cells[self.pos] = OCCUPIED
+
+        self.done = self.pos == self.goal
+        # like agents placed by a Board, give up right away on goals in another area
+        labels = component_labels(board)
+        start_labels = labels[starts[:, 0] - 1, starts[:, 1] - 1]
+        self.failed = ~self.done & ((start_labels == 0) | (start_labels != labels[goals[:, 0] - 1, goals[:, 1] - 1]))
+        self.moves = np.zeros(n, dtype=np.int64)
+        self.heuristic_calls = np.zeros(n, dtype=np.int64)
+        self.ticks = 0
+
+        if self.rule == self.steepest_ascent:
+            # the closer cells an agent didn't take on its last move, -1 for none
+            self.skipped = np.full((n, len(NEIGHBORS)), -1, dtype=np.int64)
+        elif self.rule == self.guided_local_search:
+            # penalties only matter up to 101, past that the agent gives up
+            self.penalties = PairCounts(100)
+        elif self.rule == self.simulated_annealing:
+            self.iterations = np.ones(n, dtype=np.int64)
+            self.repeats = np.zeros(n, dtype=np.int64)
+            self.temp = 1000
+
+    def distance(self, k, goal_i, goal_j):
+        '''
+        Straight line distance from flat indices k to the goals,
+        the same values as the agents' heuristic field
+        '''
+        di = (k // self.width - goal_i).astype(np.float64)
+        dj = (k % self.width - goal_j).astype(np.float64)
+        return np.sqrt(di ** 2 + dj ** 2)
+
+    def coords(self):
+        '''
+        Current (i, j) coordinate of every agent, as an array of shape (n, 2)
+        '''
+        return np.stack([self.pos // self.width - 1, self.pos % self.width - 1], axis=1)
+
+    def step(self):
+        '''
+        Move every agent that is still searching by one cell.
+        Returns how many agents were searching.
+        '''
+        active = np.flatnonzero(~self.done & ~self.failed)
+        if active.size:
+            nk = self.pos[active, None] + self.offsets
+            self.rule(active, nk, self.cells[nk] < OBSTACLE)
+            self.ticks += 1
+        return active.size
+
+    def run(self, max_ticks=None):
+        '''
+        Step until every agent reached its goal or gave up,
+        or for at most max_ticks ticks
+        '''
+        while (max_ticks == None or self.ticks < max_ticks) and self.step():
+            pass
+
+    def move(self, active, nk, choice):
+        '''
+        Move the active agents to the neighbors they chose, as an index into
+        their row of nk, or -1 to stay. Returns a mask of the agents that moved.
+        '''
+        rows = np.arange(len(active))
+        moving = choice >= 0
+        target = nk[rows, np.maximum(choice, 0)]
+        if self.collide:
+            chosen = np.flatnonzero(moving)
+            # np.unique gives the first agent to choose each cell
+            _, first = np.unique(target[chosen], return_index=True)
+            moving = np.zeros(len(active), dtype=bool)
+            moving[chosen[first]] = True
+            self.cells[self.pos[active[moving]]] = FREE
+            self.cells[target[moving]] = OCCUPIED
+
+        agents = active[moving]
+        self.pos[agents] = target[moving]
+        self.moves[agents] += 1
+        self.done[agents] = self.pos[agents] == self.goal[agents]
+        return moving
+
+    def steepest_ascent(self, active, nk, open):
+        goal_i = self.goal_i[active]
+        goal_j = self.goal_j[active]
+        current = self.distance(self.pos[active], goal_i, goal_j)
+        h = self.distance(nk, goal_i[:, None], goal_j[:, None])
+
+        skipped = (nk[:, :, None] == self.skipped[active][:, None, :]).any(axis=2)
+        checked = open & ~skipped
+        self.heuristic_calls[active] += 1 + checked.sum(axis=1)
+        closer = checked & (h < current[:, None])
+        choice = np.where(closer.any(axis=1), closer.argmax(axis=1), -1)
+        self.failed[active[choice < 0]] = True
+
+        moved = self.move(active, nk, choice)
+        rows = np.flatnonzero(moved)
+        closer[rows, choice[rows]] = False
+        self.skipped[active[rows]] = np.where(closer[rows], nk[rows], -1)
+
+    def guided_local_search(self, active, nk, open):
+        h = self.distance(nk, self.goal_i[active, None], self.goal_j[active, None])
+        penalty = self.penalties.get(active[:, None] * len(self.cells) + nk).astype(np.float64)
+        values = np.where(penalty > 100, -1.0, h + penalty * h)
+        values[~open] = np.inf
+        self.heuristic_calls[active] += open.sum(axis=1)
+        choice = np.where(open.any(axis=1), values.argmin(axis=1), -1)
+        self.failed[active[choice < 0]] = True
+
+        moved = self.move(active, nk, choice)
+        rows = np.flatnonzero(moved)
+        self.penalties.add(active[rows] * len(self.cells) + nk[rows, choice[rows]])
+        self.failed[active[(open & (penalty > 100)).any(axis=1)]] = True
+
+    def simulated_annealing(self, active, nk, open):
+        count = open.sum(axis=1)
+        self.heuristic_calls[active] += count
+        give_up = (count == 0) | (self.repeats[active] > 10)
+        self.failed[active[give_up]] = True
+
+        # stuck for too long, reset the temperature
+        reset = active[~give_up & (self.iterations[active] > 1000)]
+        self.repeats[reset] += 1
+        self.iterations[reset] = 1
+        temperature = self.temp / self.iterations[active]
+
+        # the open neighbors sorted by distance then cell, like the heap of the agent
+        goal_i = self.goal_i[active]
+        goal_j = self.goal_j[active]
+        h = np.where(open, self.distance(nk, goal_i[:, None], goal_j[:, None]), np.inf)
+        order = np.lexsort((nk, h), axis=-1)
+        rows = np.arange(len(active))
+        best = order[:, 0]
+        pick = order[rows, np.minimum((self.rng.random(len(active)) * count).astype(np.int64), 7)]
+
+        several = ~give_up & (count > 1)
+        self.heuristic_calls[active[several]] += 2
+        delta = self.distance(nk[rows, best], goal_i, goal_j) - self.distance(nk[rows, pick], goal_i, goal_j)
+        accept = (delta > 0) | (self.rng.random(len(active)) < np.exp(np.minimum(delta / temperature, 0)))
+
+        choice = np.where(several & accept, pick, best)
+        choice[give_up] = -1
+        self.iterations[active[~give_up]] += 1
+        self.move(active, nk, choice)
+
+    def random_local_search(self, active, nk, open):
+        # past this many moves the agent stops, like RandomLocalSearchAgent
+        self.failed[active[self.moves[active] > 1000000]] = True
+        count = open.sum(axis=1)
+        self.failed[active[count == 0]] = True
+
+        pick = (self.rng.random(len(active)) * count).astype(np.int64)
+        rank = np.cumsum(open, axis=1) - 1
+        choice = np.where(count > 0, (open & (rank == pick[:, None])).argmax(axis=1), -1)
+        choice[self.failed[active]] = -1
+        self.move(active, nk, choice)
+
+    def stats(self):
+        return {'reached': int(self.done.sum()), 'failed': int(self.failed.sum()), 'ticks': self.ticks,
+                'heuristic_calls': int(self.heuristic_calls.sum())}
@@ -0,0 +1,69 @@
+'''
+Algorithmic metrics of an agent's run.
+
+Wall clock times change from run to run and from machine to machine. The
+metrics here only depend on what the agent did, so they can be compared
+across runs and used to estimate how the agents scale:
+    - nodes_expanded: cells the agent expanded
+    - nodes_generated: cells the agent put on its frontier
+    - peak_frontier: the most cells on its frontier at once
+    - peak_visited: the most cells it held at once, on its frontier or searched
+    - peak_bytes: the most memory allocated during the run, from tracemalloc
+
+The agents count the first four themselves while they run, and report them
+from Agent.stats(), so every record of Board.run_agent has them. Agents that
+plan with a search add up its search.SearchResult, DStarLiteAgent reads the
+counts of its search.DStarLite, and agents that search one move at a time
+count every move, see Agent.count_step(). A team adds up the counts of its
+agents with team_counts().
+
+peak_bytes needs tracemalloc, which makes every allocation slower, so it is
+only measured when asked for, by running the agent inside traced():
+
+    record, peak_bytes = traced(board.run_agent, GuidedLocalSearchAgent, coord, goal_coord)
+'''
+import tracemalloc
+
+# the metrics of a run, peak_bytes is only there when it was traced
+METRICS = ('nodes_expanded', 'nodes_generated', 'peak_frontier', 'peak_visited', 'peak_bytes')
+
+# the metrics every agent counts for itself, see Agent.stats()
+COUNTS = METRICS[:4]
+
+
+def team_counts(agents):
+    '''
+    The counts of a team of agents. Expanded and generated cells are summed
+    over the agents, the peaks are the largest of any one agent, since the
+    team planners search for one agent at a time.
+    '''
+    counts = dict.fromkeys(COUNTS, 0)
+    for agent in agents:
+        stats = agent.stats()
+        counts['nodes_expanded'] += stats['nodes_expanded']
+        counts['nodes_generated'] += stats['nodes_generated']
+        counts['peak_frontier'] = max(counts['peak_frontier'], stats['peak_frontier'])
+        counts['peak_visited'] = max(counts['peak_visited'], stats['peak_visited'])
+    return counts
+
+
+def traced(function, *args):
+    '''
+    Call function with tracemalloc tracing its allocations.
+
+    Returns what the function returned and the most bytes it had allocated
+    at once, on top of what was allocated before the call.
+    '''
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+    else:
+        tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    try:
+        out = function(*args)
+        peak_bytes = tracemalloc.get_traced_memory()[1] - base
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+    return out, peak_bytes
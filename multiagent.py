@@ -0,0 +1,368 @@
+'''
+Many agents on one board, planned in space and time.
+
+Board.play moves its agents one after another, and they only keep out of
+each other's way by chance, when one of them reads another's OCCUPIED marker.
+Here every agent plans a route with one cell per time step instead, and the
+routes that are already planned are held in a ReservationTable. Checking
+whether any agent holds a cell at a time step is one dict lookup, however
+many agents there are.
+
+PrioritizedPlanner is cooperative A*: agents plan one at a time, in order
+of priority, each one around the routes of the agents before it.
+step_agents() then moves all of the agents one step along their routes at
+once, so their moves never collide.
+'''
+import heapq
+from grid import FREE, OBSTACLE, OCCUPIED, FlatGrid
+from search import MOVES, SearchResult, octile
+from agents import AStarAgent
+from fields import distance_field
+
+
+class ReservationTable():
+    '''
+    The cells and moves held by planned routes, by time step.
+
+    A route is a list of flat indices (see grid.FlatGrid), with the cell for
+    time step t at index t. After its last step, the agent stays on its last
+    cell, which is then held for good. A table can also hold single cells
+    and moves that one agent isn't allowed, like the constraints in cbs.py.
+    '''
+    __slots__ = ('size', 'cells', 'moves', 'parked', 'last', 'makespan')
+
+    def __init__(self, size):
+        self.size = size
+        # t * size + k -> the owner of cell k at time t
+        self.cells = {}
+        # (t, k, nk) for a move from cell k to nk between time t and t + 1
+        self.moves = set()
+        # k -> the time from which cell k is held for good
+        self.parked = {}
+        # k -> the last time cell k is held
+        self.last = {}
+        # the last time step held by any route, after it nothing changes
+        self.makespan = 0
+
+    def reserve(self, route, owner=None):
+        '''
+        Hold the cells and moves of a route for its owner
+        '''
+        size = self.size
+        prev = None
+        for t, k in enumerate(route):
+            self.cells[t * size + k] = owner
+            if prev != None and prev != k:
+                self.moves.add((t - 1, prev, k))
+            if self.last.get(k, -1) < t:
+                self.last[k] = t
+            prev = k
+        end = len(route) - 1
+        self.parked[route[-1]] = end
+        self.makespan = max(self.makespan, end)
+
+    def forbid(self, k, t):
+        '''
+        Keep the agent planning with this table off cell k at time t
+        '''
+        self.cells[t * self.size + k] = None
+        if self.last.get(k, -1) < t:
+            self.last[k] = t
+        self.makespan = max(self.makespan, t)
+
+    def forbid_move(self, k, nk, t):
+        '''
+        Keep the agent planning with this table from moving from cell k
+        to nk between time t and t + 1
+        '''
+        # moves are checked against routes making the opposite move
+        self.moves.add((t, nk, k))
+        self.makespan = max(self.makespan, t + 1)
+
+    def forbid_from(self, k, t):
+        '''
+        Keep the agent planning with this table off cell k from time t on
+        '''
+        since = self.parked.get(k)
+        if since == None or t < since:
+            self.parked[k] = t
+        self.makespan = max(self.makespan, t)
+
+    def finish_after(self, k, t):
+        '''
+        Keep the agent planning with this table from stopping
+        on cell k for good before time t + 1
+        '''
+        if self.last.get(k, -1) < t:
+            self.last[k] = t
+        self.makespan = max(self.makespan, t)
+
+    def owner(self, k, t):
+        '''
+        The owner of the route holding cell k at time t, or None
+        '''
+        owner = self.cells.get(t * self.size + k)
+        if owner == None:
+            since = self.parked.get(k)
+            if since != None and since <= t:
+                owner = self.cells.get(since * self.size + k)
+        return owner
+
+    def free(self, k, t):
+        '''
+        Return True if no route holds cell k at time t
+        '''
+        if t * self.size + k in self.cells:
+            return False
+        since = self.parked.get(k)
+        return since == None or t < since
+
+    def crossing(self, k, nk, t):
+        '''
+        Return True if a route moves from nk to k between time t and t + 1,
+        so a move from k to nk would swap places with it
+        '''
+        return (t, nk, k) in self.moves
+
+    def free_after(self, k, t):
+        '''
+        Return True if no route holds cell k at time t or later,
+        so an agent can stop there for good at time t
+        '''
+        return self.last.get(k, -1) < t
+
+
+def space_time_a_star(flat, start, goal, table, heuristic=None, avoid=None):
+    '''
+    Run A* over (cell, time) states from start at time 0 to goal, around the
+    cells and moves held in a ReservationTable.
+
+    Every step either moves to one of the 8 neighbors, costing 1 or sqrt(2)
+    like search.a_star, or waits in place, costing 1. Only obstacles block,
+    agents are in the table instead. The goal only counts as reached at
+    time t if no route holds it from t on, so the agent can stay there.
+
+    Every step costs at least 1, so an agent that can't stay on its goal
+    before time ready has at least ready - t left to pay at time t. The
+    heuristic is raised to that, which keeps the search from flooding every
+    cell at every time step before ready.
+
+    The table doesn't change after its makespan, so all states past it are
+    merged by cell. That keeps the search finite when there is no route.
+
+    If a second table is given to avoid, ties on f go to the route through
+    the fewest cells it holds. The route is still optimal around table.
+
+    Parameters:
+        flat (grid.FlatGrid): the board grid
+        start ((int, int)): start coordinate
+        goal ((int, int)): goal coordinate
+        table (ReservationTable): the routes to plan around
+        heuristic (function): heuristic(i, j) -> estimated distance to goal.
+            Defaults to the octile distance.
+        avoid (ReservationTable): routes to cross as little as possible
+
+    Returns a search.SearchResult whose path has one (i, j) per time step.
+    '''
+    goal_i, goal_j = goal
+    if heuristic == None:
+        heuristic = lambda i, j: octile(i, j, goal_i, goal_j)
+
+    size = flat.size
+    cells = flat.cells
+    coord = flat.coord
+    reserved = table.cells
+    parked = table.parked
+    moves = table.moves
+    # the neighbors in the order of search.MOVES, then waiting in place
+    steps = [(di * flat.width + dj, cost) for di, dj, cost in MOVES] + [(0, 1)]
+    horizon = table.makespan + 1
+
+    s = flat.index(start[0], start[1])
+    t = flat.index(goal_i, goal_j)
+    ready = table.last.get(t, -1) + 1
+    g = {s: 0}
+    parent = {s: None}
+    # the number of cells held in avoid along the way, only used to break ties
+    crossed = {s: 0}
+    closed = set()
+    h = max(heuristic(start[0], start[1]), ready)
+    frontier = [(h, 0, h, 0, s)]
+    expanded = 0
+    generated = 1
+    peak_frontier = 1
+
+    while frontier:
+        _, _, _, time, k = heapq.heappop(frontier)
+        key = min(time, horizon) * size + k
+        if key in closed:
+            continue
+        if k == t and table.free_after(k, time):
+            cost = g[key]
+            path = []
+            while key != None:
+                path.append(coord(key % size))
+                key = parent[key]
+            path.reverse()
+            return SearchResult(path, cost, expanded, generated, peak_frontier, len(g))
+
+        closed.add(key)
+        expanded += 1
+        g_k = g[key]
+        next_time = time + 1
+        for offset, cost in steps:
+            nk = k + offset
+            if cells[nk] == OBSTACLE or next_time * size + nk in reserved:
+                continue
+            since = parked.get(nk)
+            if since != None and since <= next_time:
+                continue
+            if offset and (time, nk, k) in moves:
+                continue
+            nkey = min(next_time, horizon) * size + nk
+            if nkey in closed:
+                continue
+
+            g_new = g_k + cost
+            if nkey not in g or g_new < g[nkey]:
+                g[nkey] = g_new
+                parent[nkey] = key
+                c = crossed[key]
+                if avoid != None and not avoid.free(nk, next_time):
+                    c += 1
+                crossed[nkey] = c
+                i, j = coord(nk)
+                h = max(heuristic(i, j), ready - next_time)
+                heapq.heappush(frontier, (g_new + h, c, h, next_time, nk))
+                generated += 1
+        if len(frontier) > peak_frontier:
+            peak_frontier = len(frontier)
+
+    return SearchResult(None, -1, expanded, generated, peak_frontier, len(g))
+
+
+class PrioritizedPlanner():
+    '''
+    Cooperative A*: plan the agents one at a time, each around the routes
+    reserved by the agents before it.
+
+    Agents farther from their goals go first. Prioritized planning is fast,
+    but an agent can get walled in by the routes before it. When an agent
+    finds no route, it moves to the front of the order and every agent plans
+    again, up to max_restarts times.
+    '''
+    max_restarts = 5
+
+    def __init__(self, board):
+        self.board = board
+        self.flat = FlatGrid(board)
+        self.table = ReservationTable(self.flat.size)
+        self.restarts = 0
+
+    def plan(self, agents):
+        '''
+        Plan a route for every agent from where it stands now.
+        Returns True if every agent has a route.
+        '''
+        if any(agent.no_solution for agent in agents):
+            return False
+
+        order = sorted(agents, key=lambda agent: -octile(agent.i, agent.j, agent.goal_i, agent.goal_j))
+        for _ in range(self.max_restarts + 1):
+            self.table = ReservationTable(self.flat.size)
+            failed = None
+            for agent in order:
+                agent.path = None
+                agent.table = self.table
+                agent.plan(self.board)
+                if agent.no_solution:
+                    failed = agent
+                    break
+                self.table.reserve([self.flat.index(i, j) for i, j in agent.path], agent)
+
+            if failed == None:
+                return True
+            if failed == order[0]:
+                # it has no route even on its own
+                return False
+            failed.no_solution = False
+            order.remove(failed)
+            order.insert(0, failed)
+            self.restarts += 1
+        return False
+
+    def stats(self):
+        return {'makespan': self.table.makespan, 'restarts': self.restarts}
+
+
+def step_agents(board, agents):
+    '''
+    Move every agent one step along its route at the same time.
+
+    All of the agents leave their cells before any of them are marked
+    in their new ones, so an agent can follow right behind another.
+    Agents without a route stay where they are.
+    '''
+    moving = [agent for agent in agents if agent.path != None and not agent.is_goal() and not agent.no_solution]
+    for agent in moving:
+        board[agent.i, agent.j] = FREE
+    for agent in moving:
+        agent.i, agent.j = agent.path[agent.path_index]
+        agent.path_index += 1
+    for agent in moving:
+        board[agent.i, agent.j] = OCCUPIED
+
+
+class CooperativeAStarAgent(AStarAgent):
+    '''
+    A* agent that plans in space and time, around the routes in its
+    reservation table. Its path has one cell per time step, with the same
+    cell repeated while it waits.
+
+    A Board plans all of the agents of this class together with its team_planner,
+    and moves them with step_agents(). Without a table, the agent plans
+    around no one.
+
+    The heuristic is the true distance around obstacles, from a distance
+    field flooded from the goal. With a heuristic that ignores obstacles,
+    the search would wait out every time step behind an island before
+    trying to go around it. A Board caches the field, so agents with the
+    same goal flood it once.
+    '''
+    __slots__ = ('table',)
+
+    team_planner = PrioritizedPlanner
+
+    def __init__(self, color, i, j, goal_i, goal_j, board):
+        super().__init__(color, i, j, goal_i, goal_j, board)
+        self.table = None
+
+    def name(self):
+        return 'CooperativeAStarAgent'
+
+    def is_goal(self):
+        '''
+        A route can pass through the goal on the way,
+        the agent is only done at the end of it
+        '''
+        return super().is_goal() and (self.path == None or self.path_index == len(self.path))
+
+    def heuristic_lookup(self, i, j):
+        if self.field_goal != (self.goal_i, self.goal_j):
+            goals = [(self.goal_i, self.goal_j)]
+            if self.owner != None:
+                self.field = self.owner.distance_field(goals)
+            else:
+                self.field = distance_field(self.board, goals)
+            self.field_goal = (self.goal_i, self.goal_j)
+        return self.field.item(i, j)
+
+    def cells_changed(self, cells):
+        super().cells_changed(cells)
+        self.field_goal = None
+
+    def search(self, board, avoid=None):
+        if self.table == None:
+            self.table = ReservationTable(self.flat.size)
+        return space_time_a_star(self.flat_grid(board), (self.i, self.j), (self.goal_i, self.goal_j),
+                                 self.table, self.heuristic, avoid)
@@ -1,5 +1,8 @@
 from agents import *
-from functools import lru_cache
+from cache import make_cache
+from search import jump_point_search, bidirectional_a_star, DStarLite, SearchResult, SQRT2
+from fields import distance_field, follow_field
+from hierarchy import ClusterGraph
 import heapq
 
 ''' ===============================================================================================================
@@ -20,10 +23,12 @@ class MemoryLookupLocalSearchAgent(Agent):
 
     There are definetley memory issues with this approach on larger datasets.
     '''
+    __slots__ = ('heuristics',)
+
     def __init__(self, color, i, j, goal_i, goal_j, board):
         super().__init__(color, i, j, goal_i, goal_j, board)
+        # keyed by flat index, like the penalties
         self.heuristics = {}
-        self.penalties = {}
 
     def name(self):
         return 'MemoryLookupLocalSearchAgent'
@@ -42,42 +47,25 @@ class MemoryLookupLocalSearchAgent(Agent):
         if j == None:
             j = self.j
         
-        coord = (i, j)
-        penalty = self.penalties.get(coord, 0)
+        if self.penalties == None:
+            self.start_penalties()
+        k = self.flat.index(i, j)
+        penalty = self.penalties[k]
 
         if (penalty > 100):
             self.no_solution = True
             return -1
     
-        if coord not in self.heuristics:
-            self.heuristics[coord] = super().heuristic(i, j)
+        if k not in self.heuristics:
+            self.heuristics[k] = super().heuristic(i, j)
 
-        return self.heuristics[coord] * (penalty + 1)
+        return self.heuristics[k] * (penalty + 1)
     
     def open_moves(self, board):
         '''
         Same as open moves for local search.
         '''
-        options = [
-            (self.i, self.j),
-            (self.i + 1, self.j),
-            (self.i + 1, self.j + 1),
-            (self.i + 1, self.j - 1),
-            (self.i, self.j + 1),
-            (self.i, self.j - 1),
-            (self.i - 1, self.j + 1),
-            (self.i - 1, self.j),
-            (self.i - 1, self.j - 1),
-        ]
-
-        out = []
-        n = len(board)
-        for coord in options:
-            i, j = coord
-            is_valid = 0 <= i < n and 0 <= j < n
-            if is_valid and (not board[i][j] or board[i][j] == 1):
-                out.append(coord)
-        return out
+        return self.flat_grid(board).open_coords(self.i, self.j)
     
     def move(self, board):
         '''
@@ -87,7 +75,8 @@ class MemoryLookupLocalSearchAgent(Agent):
         if self.is_goal() or self.no_solution:
             return
 
-        self.frontier = self.open_moves(board)
+        self.frontier = self.timed_open_moves(board)
+        self.count_local_step()
         
         if not self.frontier:
             self.no_solution = True
@@ -96,14 +85,12 @@ class MemoryLookupLocalSearchAgent(Agent):
         idx = self.get_choice(self.frontier, self.heuristic)
         coord = self.frontier.pop(idx)
 
-        if coord not in self.penalties:
-            self.penalties[coord] = 1
-        else:
-            self.penalties[coord] += 1
+        k = self.flat.index(coord[0], coord[1])
+        self.penalties[k] = min(self.penalties[k] + 1, MAX_PENALTY)
 
-        board[self.i][self.j] = 0
+        board[self.i, self.j] = FREE
         self.i, self.j = coord
-        board[self.i][self.j] = self
+        board[self.i, self.j] = OCCUPIED
 
 
 class CachedGuidedLocalSearchAgent(GuidedLocalSearchAgent):
@@ -111,21 +98,27 @@ class CachedGuidedLocalSearchAgent(GuidedLocalSearchAgent):
     This agent is essentially a GuidedLocalSearch agent, but with
     a small cache to store heuristic calculations so we can severly
     minimize the number of times we calculate the heuristic.
+
+    The cache belongs to this agent only, see cache.py for the policies.
     '''
+    __slots__ = ('cache',)
+
+    cache_policy = 'lru'
+    cache_capacity = 256
+
+    def __init__(self, color, i, j, goal_i, goal_j, board):
+        super().__init__(color, i, j, goal_i, goal_j, board)
+        self.cache = make_cache(self.cache_policy, self.cache_capacity, board)
+
     def name(self):
         return "CachedGuidedLocalSearchAgent"
     
-    @lru_cache(maxsize=256)
     def heuristic_value(self, i, j):
         '''
         We can't directly cache the heuristic since we need to calculate
         varying penalties, so let's cache the value of the heuristic,
         and leave the penalty calculation to the 'self.heuristic' function
         '''
-        if i == None:
-            i = self.i
-        if j == None:
-            j = self.j
         self.heuristic_calls += 1
         return ((self.goal_i - i) ** 2 + (self.goal_j - j) ** 2) ** (1/2)
 
@@ -136,9 +129,11 @@ class CachedGuidedLocalSearchAgent(GuidedLocalSearchAgent):
             j = self.j
 
         # grab heuristic so we only need to calculate it once
-        heuristic_val = self.heuristic_value(i, j)
+        heuristic_val = self.cache.lookup(i, j, self.heuristic_value)
         straight_line = heuristic_val
-        penalty = self.penalties.get((i, j), 0)
+        if self.penalties == None:
+            self.start_penalties()
+        penalty = self.penalties[(i + 1) * self.flat.width + j + 1]
 
         # we've visited the same square 100 times. time to stop
         if (penalty > 100):
@@ -146,6 +141,11 @@ class CachedGuidedLocalSearchAgent(GuidedLocalSearchAgent):
             return -1
         return straight_line + penalty * heuristic_val
 
+    def stats(self):
+        stats = super().stats()
+        stats.update(self.cache.stats())
+        return stats
+
 
 class BidirectionalLocalSearchAgent(GuidedLocalSearchAgent):
     '''
@@ -153,12 +153,22 @@ class BidirectionalLocalSearchAgent(GuidedLocalSearchAgent):
 
     Takes the ideas of bidirectional search and local search and combines them
     '''
+    __slots__ = ('goal_frontier', 'goal_penalties')
+
     def __init__(self, color, i, j, goal_i, goal_j, board):
         super().__init__(color, i, j, goal_i, goal_j, board)
-        self.goal_penalties = {}
+        self.goal_penalties = None
 
     def name(self):
         return 'BidirectionalLocalSearchAgent'
+
+    def start_penalties(self):
+        '''
+        The goal side keeps its penalties in the workspace's reverse buffers
+        '''
+        super().start_penalties()
+        self.goal_penalties = self.workspace.reverse().counters()
+        return self.penalties
     
     def open_moves(self, board, i=None, j=None):
         '''
@@ -169,32 +179,11 @@ class BidirectionalLocalSearchAgent(GuidedLocalSearchAgent):
         if j == None:
             j = self.j
 
-        options = [
-            (i + 1, j),
-            (i + 1, j + 1),
-            (i + 1, j - 1),
-            (i, j + 1),
-            (i, j - 1),
-            (i - 1, j + 1),
-            (i - 1, j),
-            (i - 1, j - 1),
-        ]
-
-        out = []
-        n = len(board)
-        for coord in options:
-            i, j = coord
-
-            is_valid = 0 <= i and i < n and 0 <= j and j < n
-            if not is_valid:
-                continue
-
-            if board[i][j] == 1 or isinstance(board[i][j], Agent):
-                return [(i, j)]
-            
-            if (not board[i][j] or board[i][j] == 1):
-                out.append(coord)
-        return out
+        flat = self.flat_grid(board)
+        meeting = flat.marked_neighbor(i, j)
+        if meeting != None:
+            return [meeting]
+        return flat.open_coords(i, j)
     
     def move(self, board):
         '''
@@ -207,12 +196,16 @@ class BidirectionalLocalSearchAgent(GuidedLocalSearchAgent):
             return
         
         # get the open moves
-        moves = self.open_moves(board)
+        moves = self.timed_open_moves(board)
         self.frontier = moves
 
-        moves = self.open_moves(board, self.goal_i, self.goal_j)
+        moves = self.timed_open_moves(board, self.goal_i, self.goal_j)
         self.goal_frontier = moves
 
+        # both ends expand the cell they stand on, and hold nothing but their moves
+        frontiers = len(self.frontier) + len(self.goal_frontier)
+        self.count_step(2, frontiers, frontiers, frontiers + 2)
+
         if not self.frontier or not self.goal_frontier:
             self.no_solution = True
             return
@@ -224,29 +217,25 @@ class BidirectionalLocalSearchAgent(GuidedLocalSearchAgent):
         goal_coord = self.goal_frontier.pop(idx)
 
         # move agents
-        board[self.i][self.j] = 0
+        board[self.i, self.j] = FREE
         self.i, self.j = coord
-        board[self.i][self.j] = self
+        board[self.i, self.j] = OCCUPIED
 
         # there was only one coordinate in both of them, this means we're at the goal
         # move only one agent so we don't get infinite loop
         if (not self.goal_frontier and not self.frontier):
             return
 
-        board[self.goal_i][self.goal_j] = 0
+        board[self.goal_i, self.goal_j] = FREE
         self.goal_i, self.goal_j = goal_coord
-        board[self.goal_i][self.goal_j] = self
+        board[self.goal_i, self.goal_j] = OCCUPIED
 
         # add coordinates to penalties
-        if coord not in self.penalties:
-            self.penalties[coord] = 1
-        else:
-            self.penalties[coord] += 1
+        k = self.flat.index(coord[0], coord[1])
+        self.penalties[k] = min(self.penalties[k] + 1, MAX_PENALTY)
 
-        if goal_coord not in self.goal_penalties:
-            self.goal_penalties[goal_coord] = 1
-        else:
-            self.goal_penalties[goal_coord] += 1
+        k = self.flat.index(goal_coord[0], goal_coord[1])
+        self.goal_penalties[k] = min(self.goal_penalties[k] + 1, MAX_PENALTY)
 
     def sort_goal_frontier(self):
         self.goal_frontier.sort(key=lambda coord: self.goal_heuristic(coord[0], coord[1]) + 1)
@@ -260,8 +249,9 @@ class BidirectionalLocalSearchAgent(GuidedLocalSearchAgent):
             i = self.i
         if j == None:
             j = self.j
-        coord = (i, j)
-        penalty = self.goal_penalties.get(coord, 0)
+        if self.goal_penalties == None:
+            self.start_penalties()
+        penalty = self.goal_penalties[self.flat.index(i, j)]
 
         if (penalty > 100):
             self.no_solution = True
@@ -271,6 +261,13 @@ class BidirectionalLocalSearchAgent(GuidedLocalSearchAgent):
               
         heuristic_val = ((self.i - i) ** 2 + (self.j - j) ** 2) ** (1/2)
         return (heuristic_val) * (penalty + 1)
+
+    def heuristic_lookup(self, i, j):
+        '''
+        The goal moves on every step, so a field precomputed for one goal
+        would be thrown away right after. Compute the distance directly.
+        '''
+        return ((self.goal_i - i) ** 2 + (self.goal_j - j) ** 2) ** (1/2)
     
 class OptimizedLocalSearchAgent(CachedGuidedLocalSearchAgent):
     '''
@@ -280,6 +277,8 @@ class OptimizedLocalSearchAgent(CachedGuidedLocalSearchAgent):
         - A heap for finding the best next move
 
     '''
+    __slots__ = ()
+
     def __init__(self, color, i, j, goal_i, goal_j, board):
         super().__init__(color, i, j, goal_i, goal_j, board)
 
@@ -291,7 +290,8 @@ class OptimizedLocalSearchAgent(CachedGuidedLocalSearchAgent):
             return
 
     
-        self.frontier = self.open_moves(board)
+        self.frontier = self.timed_open_moves(board)
+        self.count_local_step()
         
         if not self.frontier:
             self.no_solution = True
@@ -300,71 +300,19 @@ class OptimizedLocalSearchAgent(CachedGuidedLocalSearchAgent):
         modified_coord = heapq.heappop(self.frontier)
         coord = (modified_coord[1], modified_coord[2])
 
-        if coord not in self.penalties:
-            self.penalties[coord] = 1
-        else:
-            self.penalties[coord] += 1
+        k = self.flat.index(coord[0], coord[1])
+        self.penalties[k] = min(self.penalties[k] + 1, MAX_PENALTY)
 
-        board[self.i][self.j] = 0
+        board[self.i, self.j] = FREE
         self.i, self.j = coord
-        board[self.i][self.j] = self
+        board[self.i, self.j] = OCCUPIED
 
     def open_moves(self, board):
-        return super().open_moves(board)
-    
-    def open_moves(self, board):
-        options = [
-            (self.i, self.j),
-            (self.i + 1, self.j),
-            (self.i + 1, self.j + 1),
-            (self.i + 1, self.j - 1),
-            (self.i, self.j + 1),
-            (self.i, self.j - 1),
-            (self.i - 1, self.j + 1),
-            (self.i - 1, self.j),
-            (self.i - 1, self.j - 1),
-        ]
-
         out = []
-        n = len(board)
-        for coord in options:
-            i, j = coord
-            is_valid = 0 <= i < n and 0 <= j < n
-            if is_valid and (not board[i][j] or board[i][j] == 1):
-                heapq.heappush(out, (self.heuristic(i, j), i, j))
+        for i, j in self.flat_grid(board).open_coords(self.i, self.j):
+            heapq.heappush(out, (self.heuristic(i, j), i, j))
         return out
     
-    @lru_cache(maxsize=256)
-    def heuristic_value(self, i, j):
-        '''
-        We can't directly cache the heuristic since we need to calculate
-        varying penalties, so let's cache the value of the heuristic,
-        and leave the penalty calculation to the 'self.heuristic' function
-        '''
-        if i == None:
-            i = self.i
-        if j == None:
-            j = self.j
-        self.heuristic_calls += 1
-        return ((self.i - i) ** 2 + (self.j - j) ** 2) ** (1/2)
-
-    def heuristic(self, i=None, j=None):
-        if i == None:
-            i = self.i
-        if j == None:
-            j = self.j
-
-        # grab heuristic so we only need to calculate it once
-        heuristic_val = self.heuristic_value(i, j)
-        straight_line = heuristic_val
-        penalty = self.penalties.get((i, j), 0)
-
-        # we've visited the same square 100 times. time to stop
-        if (penalty > 100):
-            self.no_solution = True
-            return -1
-        return straight_line + penalty * heuristic_val
-
 
 ''' ===============================================================================================================
     A* Agents
@@ -374,21 +322,23 @@ class OptimizedLocalSearchAgent(CachedGuidedLocalSearchAgent):
     4. CachedAStarAgent
     5. SetLookupCachedAStarAgent
     6. OptimizedAStarAgent
+    7. JPSAStarAgent
+    8. BidirectionalAStarAgent
+    9. DistanceFieldAgent
+    10. DStarLiteAgent
+    11. HPAStarAgent
 '''
 
 class MatrixLookupAStarAgent(AStarAgent):
     '''
-    Change the 'searched' data structure to a matrix
+    Change the 'searched' data structure to a matrix.
+
+    The matrix used to be a list of lists of bools, allocated for every
+    agent. It is now AStarAgent's searched map, which is borrowed from a
+    pooled workspace. This agent marks a cell as searched when it leaves
+    it rather than when it arrives.
     '''
-    def __init__(self, color, i, j, goal_i, goal_j, board):
-        super().__init__(color, i, j, goal_i, goal_j, board)
-        rows = cols = len(self.board)
-        self.searched = []
-        for i in range(rows):
-            inner = []
-            for j in range(cols):
-                inner.append(False)
-            self.searched.append(inner)
+    __slots__ = ()
 
     def name(self):
         return 'MatrixLookupAStarAgent'
@@ -400,54 +350,26 @@ class MatrixLookupAStarAgent(AStarAgent):
         if self.is_goal():
             return
         
-        moves = self.open_moves(board)
-        self.frontier += moves
-        
-        if not self.frontier:
+        coord = self.expand(board)
+        if coord == None:
             self.no_solution = True
             return
-        
-        idx = self.get_choice(self.frontier, self.heuristic)
-        coord = self.frontier.pop(idx)
 
-        board[self.i][self.j] = 0
-        self.searched[self.i][self.j] = True
+        board[self.i, self.j] = FREE
+        self.searched[self.flat.index(self.i, self.j)] = self.stamp
         self.i, self.j = coord
-        board[self.i][self.j] = self
+        board[self.i, self.j] = OCCUPIED
 
-    def open_moves(self, board):
-        '''
-        Returns a list of open moves for the given board
-        '''
-        options = [
-            (self.i, self.j),
-            (self.i + 1, self.j),
-            (self.i + 1, self.j + 1),
-            (self.i + 1, self.j - 1),
-            (self.i, self.j + 1),
-            (self.i, self.j - 1),
-            (self.i - 1, self.j + 1),
-            (self.i - 1, self.j),
-            (self.i - 1, self.j - 1),
-        ]
-
-        out = []
-        n = len(board)
-        for coord in options:
-            i, j = coord
-            is_valid = 0 <= i < n and 0 <= j < n
-            check_searhced = is_valid and not self.searched[coord[0]][coord[1]] and coord not in self.frontier
-            if is_valid and check_searhced and (not board[i][j] or board[i][j] == 1):
-                out.append(coord)
-        return out
     
 class SetLookupAStarAgent(AStarAgent):
     '''
     Change data structure to a set. O(1) lookup and doesn't require as much space as a matrix
+
+    The set has since been replaced by AStarAgent's searched map, which has
+    the same O(1) lookup and is reused from agent to agent instead of
+    growing a tuple per searched cell.
     '''
-    def __init__(self, color, i, j, goal_i, goal_j, board):
-        super().__init__(color, i, j, goal_i, goal_j, board)
-        self.searched = set() # use a set here for faster lookup
+    __slots__ = ()
 
     def name(self):
         return 'SetLookupAStarAgent'
@@ -459,29 +381,22 @@ class SetLookupAStarAgent(AStarAgent):
         if self.is_goal():
             return
         
-        moves = self.open_moves(board)
-        self.frontier += moves
-        
-        if not self.frontier:
+        coord = self.expand(board)
+        if coord == None:
             self.no_solution = True
             return
 
-        idx = self.get_choice(self.frontier, self.heuristic)
-        coord = self.frontier.pop(idx)
-
-        board[self.i][self.j] = 0
+        board[self.i, self.j] = FREE
         self.i, self.j = coord
-        board[self.i][self.j] = self
-        self.searched.add((self.i, self.j))
+        board[self.i, self.j] = OCCUPIED
+        self.searched[self.flat.index(self.i, self.j)] = self.stamp
 
 
 class HeapFrontierAStarAgent(AStarAgent):
     '''
     Change the data structure to a heap for finding the best next move
     '''
-    def __init__(self, color, i, j, goal_i, goal_j, board):
-        super().__init__(color, i, j, goal_i, goal_j, board)
-        self.searched = set()
+    __slots__ = ()
 
     def name(self):
         return 'HeapFrontierAStarAgent'
@@ -493,57 +408,55 @@ class HeapFrontierAStarAgent(AStarAgent):
         if self.is_goal():
             return
         
-        self.open_moves(board)
+        queued = len(self.frontier)
+        self.timed_open_moves(board)
+        # the search holds the cells it expanded, this one included, and its frontier
+        self.count_step(1, len(self.frontier) - queued, len(self.frontier),
+                        self.nodes_expanded + 1 + len(self.frontier))
 
         if not self.frontier:
             self.no_solution = True
             return
         
-        coord = heapq.heappop(self.frontier)
+        k = self.frontier.pop()
 
-        board[self.i][self.j] = 0
-        _, self.i, self.j = coord
-        board[self.i][self.j] = self
-        self.searched.add(coord)
+        board[self.i, self.j] = FREE
+        self.i, self.j = self.flat.coord(k)
+        board[self.i, self.j] = OCCUPIED
+        self.searched[k] = self.stamp
 
     def open_moves(self, board):
         '''
         Automatically push all open moves to the frontier
         '''
-        options = [
-            (self.i, self.j),
-            (self.i + 1, self.j),
-            (self.i + 1, self.j + 1),
-            (self.i + 1, self.j - 1),
-            (self.i, self.j + 1),
-            (self.i, self.j - 1),
-            (self.i - 1, self.j + 1),
-            (self.i - 1, self.j),
-            (self.i - 1, self.j - 1),
-        ]
-
-        n = len(board)
-        for coord in options:
-            i, j = coord
-            modified_coord = (self.heuristic(i, j) + 1, coord[0], coord[1])
-
-            is_valid = 0 <= i < n and 0 <= j < n
-            check_searhced = modified_coord not in self.searched and modified_coord not in self.frontier
-            if is_valid and check_searhced and (not board[i][j] or board[i][j] == 1):
-                heapq.heappush(self.frontier, modified_coord)
+        if self.searched == None:
+            self.start_searched(board)
+        flat = self.flat_grid(board)
+        for k in flat.open_neighbors(flat.index(self.i, self.j)):
+            if self.searched[k] != self.stamp and k not in self.frontier:
+                i, j = flat.coord(k)
+                # ties on the heuristic go to the smaller coordinate, as they did with heapq
+                self.frontier.push(k, (self.heuristic(i, j) + 1, i, j))
 
     
 class CachedAStarAgent(AStarAgent):
     '''
     A Star agent that uses a cache to store heuristic values
+
+    The cache belongs to this agent only, see cache.py for the policies.
     '''
+    __slots__ = ('cache',)
+
+    cache_policy = 'lru'
+    cache_capacity = 256
+
     def __init__(self, color, i, j, goal_i, goal_j, board):
         super().__init__(color, i, j, goal_i, goal_j, board)
+        self.cache = make_cache(self.cache_policy, self.cache_capacity, board)
 
     def name(self):
         return 'CachedAStarAgent'
 
-    @lru_cache(maxsize=256)
     def heuristic(self, i=None, j=None):
         '''
         Give the straightline distance between current position and goal, ignoring obstacles
@@ -552,13 +465,22 @@ class CachedAStarAgent(AStarAgent):
             i = self.i
         if j == None:
             j = self.j
+        return self.cache.lookup(i, j, self.heuristic_value)
+
+    def heuristic_value(self, i, j):
+        '''
+        Compute the heuristic on a cache miss
+        '''
         self.heuristic_calls += 1
         return ((self.goal_i - i) ** 2 + (self.goal_j - j) ** 2) ** (1/2)
+
+    def stats(self):
+        stats = super().stats()
+        stats.update(self.cache.stats())
+        return stats
     
 class SetLookupCachedAStarAgent(CachedAStarAgent):
-    def __init__(self, color, i, j, goal_i, goal_j, board):
-        super().__init__(color, i, j, goal_i, goal_j, board)
-        self.searched = set() # use a set here for faster lookup
+    __slots__ = ()
 
     def name(self):
         return 'SetLookupCachedAStarAgent'
@@ -570,96 +492,232 @@ class SetLookupCachedAStarAgent(CachedAStarAgent):
         if self.is_goal():
             return
         
-        moves = self.open_moves(board)
-        self.frontier += moves
-        
-        if not self.frontier:
+        coord = self.expand(board)
+        if coord == None:
             self.no_solution = True
             return
 
-        idx = self.get_choice(self.frontier, self.heuristic)
-        coord = self.frontier.pop(idx)
-
-        board[self.i][self.j] = 0
+        board[self.i, self.j] = FREE
         self.i, self.j = coord
-        board[self.i][self.j] = self
-        self.searched.add((self.i, self.j))
+        board[self.i, self.j] = OCCUPIED
+        self.searched[self.flat.index(self.i, self.j)] = self.stamp
 
 
-class OptimizedAStarAgent(CachedAStarAgent):
+class OptimizedAStarAgent(AStarAgent):
     '''
     Take all previous optimizations and combine them into one agent
 
-    It has:
-        - A set for faster lookup
-        - A heap for finding the best next move
-        - A cache for storing heuristic
-        - Removal redundant checks in open_moves
+    This is a thin adapter over the core search engine (search.a_star), which has:
+        - Real g-costs, so the path it finds is optimal
+        - A binary heap frontier with lazy deletion
+        - A closed set and parent array stored by flat index
+    On top of that, its heuristic is the octile distance, which is tighter than
+    the straight line distance on an 8-connected grid. It is precomputed once
+    per goal, so every heuristic call is an array lookup, which is faster
+    than the cache of CachedAStarAgent would be.
+    '''
+    __slots__ = ()
+
+    heuristic_metric = 'octile'
+
+    def name(self):
+        return 'OptimizedAStarAgent'
+
+
+class JPSAStarAgent(OptimizedAStarAgent):
+    '''
+    A* agent that uses Jump Point Search.
+
+    The board is a uniform-cost 8-connected grid, so most neighbors can be
+    pruned as symmetric, and the search jumps along straight and diagonal lines
+    instead of pushing every cell it passes onto the heap.
+    '''
+    __slots__ = ()
+
+    def name(self):
+        return 'JPSAStarAgent'
+
+    def search(self, board):
+        return jump_point_search(board, (self.i, self.j), (self.goal_i, self.goal_j), self.heuristic,
+                                 self.search_workspace(board))
+
+
+class BidirectionalAStarAgent(OptimizedAStarAgent):
+    '''
+    A* agent that searches from both ends at once.
+
+    Unlike BidirectionalSearchAgent, neither end moves on the board while
+    searching. Each search has its own heap and closed bitmap, and the search
+    stops as soon as the best meeting point found is provably optimal, see
+    search.bidirectional_a_star. The backward search is guided by a field
+    for the start cell, the same way the forward search uses the goal's.
+    '''
+    __slots__ = ()
+
+    def name(self):
+        return 'BidirectionalAStarAgent'
+
+    def search(self, board):
+        start_field = self.metric_field(self.i, self.j)
+
+        def reverse_heuristic(i, j):
+            self.heuristic_calls += 1
+            return start_field.item(i, j)
+
+        return bidirectional_a_star(board, (self.i, self.j), (self.goal_i, self.goal_j), self.heuristic, reverse_heuristic,
+                                    self.search_workspace(board))
+
+
+class DistanceFieldAgent(AStarAgent):
+    '''
+    Agent that follows a distance field instead of searching.
+
+    The field holds the true distance from every cell to the goal, so it is a
+    perfect heuristic, and walking it downhill gives a shortest path with no
+    search at all. Flooding it costs a full Dijkstra over the board, which
+    pays off when many agents share a goal: the Board caches the field per
+    board version and goal, and every agent after the first just reads it.
+
+    The field is only flooded when the agent plans its path, so that the time
+    it takes is counted by Board.test. heuristic() keeps using the octile field.
+    '''
+    __slots__ = ()
+
+    heuristic_metric = 'octile'
+
+    def name(self):
+        return 'DistanceFieldAgent'
+
+    def goal_field(self, board):
+        '''
+        The distance field for our goal, from the Board's cache if we
+        were placed by one
+        '''
+        if self.owner != None:
+            return self.owner.distance_field([(self.goal_i, self.goal_j)])
+        return distance_field(board, [(self.goal_i, self.goal_j)])
+
+    def plan(self, board):
+        '''
+        Follow the field from the current position to the goal
+        '''
+        field = self.goal_field(board)
+        path = follow_field(field, (self.i, self.j))
+        if path == None:
+            self.no_solution = True
+            return
+
+        # walking the field expands every cell of the path but the goal into
+        # the next one, and holds the path
+        steps = len(path) - 1
+        self.count_search(SearchResult(path, field.item(self.i, self.j), steps, steps, min(steps, 1), len(path)))
+
+        self.path = path
+        self.path_index = 1
+        self.path_cost = self.travelled + field.item(self.i, self.j)
+
+
+class DStarLiteAgent(AStarAgent):
+    '''
+    Agent that repairs its plan when obstacles change instead of replanning.
+
+    Other A* agents throw their path away when the Board reports changed
+    cells and search again from scratch. This agent keeps a search.DStarLite
+    planner for its whole run and only repairs the part of the search the
+    change affected, so replanning costs scale with the size of the change.
+
+    path_cost is the distance travelled so far plus the planner's
+    distance from the current cell to the goal.
     '''
+    __slots__ = ('planner', 'changes')
+
+    heuristic_metric = 'octile'
+
     def __init__(self, color, i, j, goal_i, goal_j, board):
         super().__init__(color, i, j, goal_i, goal_j, board)
-        self.searched = set()
+        self.planner = None
+        self.changes = []
 
     def name(self):
-        return 'OptimizedAStarAgent'
-    
+        return 'DStarLiteAgent'
+
+    def cells_changed(self, cells):
+        '''
+        Keep the changed cells, the plan is repaired on the next move
+        '''
+        self.changes += cells
+
+    def plan(self, board):
+        self.planner = DStarLite(board, (self.i, self.j), (self.goal_i, self.goal_j))
+        self.planner.compute()
+
     def move(self, board):
         '''
-        Moves the given agent on the board
+        Moves the agent one step along the current best path
         '''
-        if self.is_goal():
+        if self.is_goal() or self.no_solution:
             return
-        
-        self.open_moves(board)
 
-        if not self.frontier:
+        start = self.profile.start()
+        if self.planner == None:
+            self.plan(board)
+            self.profile.stop('search', start)
+        elif self.changes:
+            self.planner.update_cells(board, self.changes)
+            self.changes = []
+            self.profile.stop('search', start)
+
+        coord = self.planner.next_step()
+        if self.planner.cost() == float('inf') or coord == None:
             self.no_solution = True
             return
-        
-        coord = heapq.heappop(self.frontier)
 
-        board[self.i][self.j] = 0
-        _, self.i, self.j = coord
-        board[self.i][self.j] = self
+        i, j = coord
+        self.travelled += SQRT2 if i != self.i and j != self.j else 1
 
-    @lru_cache(maxsize=256)
-    def heuristic(self, i=None, j=None):
-        '''
-        Give the straightline distance between current position and goal, ignoring obstacles
-        '''
-        if i == None:
-            i = self.i
-        if j == None:
-            j = self.j
-        self.heuristic_calls += 1
-        return ((self.goal_i - i) ** 2 + (self.goal_j - j) ** 2) ** (1/2)
-    
-    def open_moves(self, board):
+        board[self.i, self.j] = FREE
+        self.i, self.j = coord
+        board[self.i, self.j] = OCCUPIED
+        self.planner.move_to(coord)
+        self.path_cost = self.travelled + self.planner.cost()
+
+    def stats(self):
         '''
-        Automatically push all open moves to the frontier
+        The counts come from the planner, which keeps them over every
+        repair. The cells it reached are the ones with a finite rhs.
         '''
-        options = [
-            (self.i, self.j),
-            (self.i + 1, self.j),
-            (self.i + 1, self.j + 1),
-            (self.i + 1, self.j - 1),
-            (self.i, self.j + 1),
-            (self.i, self.j - 1),
-            (self.i - 1, self.j + 1),
-            (self.i - 1, self.j),
-            (self.i - 1, self.j - 1),
-        ]
+        if self.planner != None:
+            planner = self.planner
+            self.nodes_expanded = planner.expanded
+            self.nodes_generated = planner.generated
+            self.peak_frontier = planner.peak_frontier
+            self.peak_visited = sum(1 for rhs in planner.rhs if rhs < float('inf'))
+        return super().stats()
+
 
-        n = len(board)
-        for coord in options:
-            i, j = coord
-            modified_coord = (self.heuristic(i, j) + 1, coord[0], coord[1])
+class HPAStarAgent(AStarAgent):
+    '''
+    Agent that plans with hierarchical pathfinding (HPA*).
 
-            is_valid = 0 <= i < n and 0 <= j < n
-            check_searhced = coord not in self.searched  # remove redundant check of the frontier
-            if is_valid and check_searhced and (not board[i][j] or board[i][j] == 1):
-                heapq.heappush(self.frontier, modified_coord)
-                self.searched.add(coord)
+    The search runs on a small abstract graph of cluster transitions and is
+    only refined inside the clusters along the way, see hierarchy.py. The
+    graph is built once per board and cached on the Board, so the cost of
+    building it is shared by every agent placed on that board. Paths are
+    a few percent longer than the optimal ones.
+    '''
+    __slots__ = ()
+
+    cluster_size = 16
+
+    def name(self):
+        return 'HPAStarAgent'
+
+    def search(self, board):
+        if self.owner != None:
+            graph = self.owner.cluster_graph(self.cluster_size)
+        else:
+            graph = ClusterGraph(board, self.cluster_size)
+        return graph.find_path((self.i, self.j), (self.goal_i, self.goal_j))
 
 
 
@@ -700,7 +758,7 @@ def obstacleAdjustmentHeuristic(self, i=None, j=None):
         else:
             checked.add((adjust_i, adjust_j))
 
-        if (self.board[adjust_i][adjust_j] == 2):
+        if (self.board[adjust_i, adjust_j] == OBSTACLE):
             value += 1
     return value
 
@@ -722,26 +780,39 @@ class MHDAStarAgent(AStarAgent):
     '''
     A star agent that uses Manhattan Distance
     '''
+    __slots__ = ()
+
+    heuristic_metric = 'manhattan'
+
     def name(self):
         return 'MHDAStarAgent'
     
-    def heuristic(self, i=None, j=None):
-        value = mhdHeuristic(self, i, j)
-        return value
-    
 
 class MHDBidirectionalLocalSearchAgent(BidirectionalLocalSearchAgent):
     '''
     Bidirectional local search agent that uses Manhattan Distance
     '''
+    __slots__ = ()
+
     def name(self):
         return 'MHDBidirectionalLocalSearchAgent'
     
     def goal_heuristic(self, i=None, j=None):
+        if self.goal_penalties == None:
+            self.start_penalties()
+        if i != None and self.goal_penalties[self.flat.index(i, j)] > 100:
+            # stuck going back and forth, give up like BidirectionalLocalSearchAgent
+            self.no_solution = True
+            return -1
         value = mhdHeuristic(self, self.goal_i, self.goal_j)
         return value
 
     def heuristic(self, i=None, j=None):
+        if self.penalties == None:
+            self.start_penalties()
+        if i != None and self.penalties[self.flat.index(i, j)] > 100:
+            self.no_solution = True
+            return -1
         value = mhdHeuristic(self, i, j)
         return value
 
@@ -753,6 +824,8 @@ class ObstacleAdjustmentAStarAgent(AStarAgent):
     Possibly better for finding optimized paths but not great
     for quick pathfinding
     '''
+    __slots__ = ()
+
     def name(self):
         return 'ObstacleAdjustmentAStarAgent'
     
@@ -0,0 +1,130 @@
+'''
+Parallel version of Board.test.
+
+Every (iteration, agent class) pair becomes its own job, and the jobs are dealt
+out across a process pool. A job rebuilds its board from a seed derived from
+the base seed and the iteration number, so every agent in an iteration sees the
+same board and coordinates no matter which process runs it. Given the same
+seed, the results match Board.test(iterations, agent_classes, seed).
+
+Both runners default to seed=None. Board.test then carries on from the
+current random state, and parallel_test draws a base seed from it, so an
+unseeded call of either one sees new boards every time. A worker process
+always seeds its random module for each job, since it can't carry the
+random state over from the jobs before it.
+
+Jobs can also replay a scenario file. Each worker memory-maps the file once
+and only reads the scenarios it is handed.
+'''
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from board import Board, add_record, iteration_seed
+from scenarios import ScenarioFile
+from search import WorkspacePool
+from profiling import Profile, NO_PROFILE
+
+# scenario files opened by this worker process, by path
+open_scenarios = {}
+
+# search buffers for the life of a worker process, so its jobs reuse them
+workspaces = WorkspacePool()
+
+
+def run_job(job):
+    '''
+    Run a single agent on a single board. This runs in a worker process.
+
+    The job's seed is never None, parallel_test draws one if it wasn't
+    given, and the random module is reseeded for every job as Board.test
+    does with a seed.
+    '''
+    params, seed, iteration, agent_class, scenario_path, profile, metrics = job
+    board = Board(**params)
+    board.workspaces = workspaces
+    if scenario_path != None:
+        if scenario_path not in open_scenarios:
+            open_scenarios[scenario_path] = ScenarioFile(scenario_path)
+        [coord, goal_coord] = board.load_scenario(open_scenarios[scenario_path], iteration)
+    else:
+        board.seed(iteration_seed(seed, iteration))
+        board.generate_board()
+        [coord, goal_coord] = board.get_open_coords()
+
+    pairs = None
+    if agent_class.team_planner != None:
+        pairs = board.get_open_pairs(board.num_agents, [(coord, goal_coord)])
+    random.seed(iteration_seed(seed, iteration))
+    phases = Profile() if profile else NO_PROFILE
+    record = board.run_class(agent_class, coord, goal_coord, pairs, phases, metrics)
+    record.update(phases.record())
+    return record
+
+
+def parallel_test(board, iterations=10, agent_classes=[], seed=None, workers=None, scenarios=None, sink=None, run='', profile=False,
+                  metrics=False):
+    '''
+    Test agent classes against each other across a process pool.
+
+    Returns the same dict as Board.test, so it can be passed to any of the
+    chart functions in testing.py.
+
+    Parameters:
+        board (Board): board whose size and island settings are used
+        iterations (int): number of boards to generate
+        agent_classes (Agent[]): the agent classes to test
+        seed (int): base seed, every job derives its own seed from it,
+            drawn from the random module if not given
+        workers (int): number of processes, defaults to the number of CPUs
+        scenarios (ScenarioFile): replay this file instead of generating boards
+        sink (ResultsSink): write records to this sink instead of returning them,
+            skipping the ones already in it, as in Board.test
+        run (str): label for the records written to the sink
+        profile (bool): add the profiling columns of Board.test
+        metrics (bool): trace the runs for the peak_bytes column of Board.test
+    '''
+    if workers == None:
+        workers = os.cpu_count()
+    if seed == None:
+        seed = random.randrange(2 ** 32)
+
+    scenario_path = None
+    if scenarios != None:
+        if iterations > len(scenarios):
+            raise ValueError(f'{iterations} iterations requested but there are only {len(scenarios)} scenarios')
+        scenario_path = scenarios.path
+
+    params = {
+        'rows': board.rows,
+        'cols': board.cols,
+        'num_islands': board.num_islands,
+        'min_island_size': board.min_island_size,
+        'max_island_size': board.max_island_size,
+        'num_agents': board.num_agents,
+    }
+    jobs = []
+    for i in range(iterations):
+        for agent_class in agent_classes:
+            if sink != None and sink.completed(run, i, agent_class.__name__):
+                continue
+            jobs.append((params, seed, i, agent_class, scenario_path, profile, metrics))
+
+    out = {}
+    for agent in agent_classes:
+        out[agent.__name__] = []
+        out[agent.__name__ + '_heuristic_calls'] = []
+        out[agent.__name__ + '_path_cost'] = []
+
+    # hand out jobs in chunks so the workers don't wait on the pool for every job
+    chunksize = max(1, len(jobs) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map yields results in job order, so the lists line up by iteration
+        for job, record in zip(jobs, pool.map(run_job, jobs, chunksize=chunksize)):
+            if sink != None:
+                sink.write(run, job[2], job[3].__name__, record)
+            else:
+                add_record(out, job[3].__name__, record)
+
+    if sink != None:
+        return None
+    return out
@@ -0,0 +1,79 @@
+'''
+Opt-in profiling of where the agents spend their time.
+
+Board.test only times whole runs. A Profile passed to Board.run_agent,
+run_team or run_class is handed to the agent, which times its own phases
+with it: every move, its open_moves and get_choice, and the searches that
+plan a path. The frontiers from frontier.py that the step-by-step agents
+keep time their own operations with the same Profile.
+
+    profile = Profile()
+    board.run_agent(GuidedLocalSearchAgent, coord, goal_coord, profile)
+    profile.record()  # {'profile_get_choice_calls': ..., 'profile_get_choice_ms': ..., ...}
+
+Agents and frontiers start out with NO_PROFILE, whose timers do nothing,
+so an unprofiled run only pays for a method call at each timed phase.
+Nothing is patched, the timers are plain calls in the agent and frontier
+code. Times include the phases called from inside a phase, so move includes
+open_moves and the frontier operations. Heuristic calls are too cheap and
+too many to time one by one, heuristic_calls already counts them.
+'''
+import time
+
+# the phases a Profile times, so every record has the same columns
+PHASES = ('move', 'open_moves', 'get_choice', 'search', 'queue_push', 'queue_pop', 'frontier_add',
+          'frontier_pop_nearest')
+
+
+class Profile():
+    '''
+    Call count and cumulative time in ns for each phase
+    '''
+    __slots__ = ('calls', 'times')
+
+    def __init__(self):
+        self.calls = dict.fromkeys(PHASES, 0)
+        self.times = dict.fromkeys(PHASES, 0)
+
+    def start(self):
+        '''
+        Start timing a phase, returns the start time to pass to stop()
+        '''
+        return time.perf_counter_ns()
+
+    def stop(self, phase, start):
+        '''
+        Count a call of the phase that started at start
+        '''
+        self.times[phase] += time.perf_counter_ns() - start
+        self.calls[phase] += 1
+
+    def record(self):
+        '''
+        The phases as entries for a Board.run_agent record,
+        'profile_<phase>_calls' and 'profile_<phase>_ms' for every phase
+        '''
+        out = {}
+        for phase in PHASES:
+            out['profile_' + phase + '_calls'] = self.calls[phase]
+            out['profile_' + phase + '_ms'] = self.times[phase] / 1000000
+        return out
+
+
+class NoProfile():
+    '''
+    Profile that times nothing, for unprofiled runs
+    '''
+    __slots__ = ()
+
+    def start(self):
+        return 0
+
+    def stop(self, phase, start):
+        pass
+
+    def record(self):
+        return {}
+
+
+NO_PROFILE = NoProfile()
@@ -0,0 +1,221 @@
+'''
+Streaming test results.
+
+Board.test keeps every result in memory and only hands them back at the end,
+so a crash late in a long sweep loses everything. A ResultsSink instead appends
+every (run, iteration, agent) record to a JSONL file the moment it completes.
+When a test is restarted with the same sink, records that are already in the
+file are skipped.
+
+The aggregate functions below read records one at a time, so the chart
+functions in testing.py can be built straight from a results file without
+loading it into memory.
+'''
+import json
+import os
+
+
+class ResultsSink():
+    '''
+    Append-only JSONL file of test records.
+
+    Every line is one record from Board.run_agent, plus the run label,
+    the iteration and the agent name.
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        if os.path.exists(path):
+            for record in iter_records(path):
+                self.done.add((record['run'], record['iteration'], record['agent']))
+        self.file = open(path, 'a')
+        # a crash can leave a partly written last line, end it so the next record starts on its own line
+        if self.file.tell() > 0:
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    self.file.write('\n')
+
+    def completed(self, run, iteration, agent):
+        '''
+        Return True if this record is already in the file
+        '''
+        return (run, iteration, agent) in self.done
+
+    def write(self, run, iteration, agent, record):
+        '''
+        Append a record and flush it to disk straight away
+        '''
+        line = {'run': run, 'iteration': iteration, 'agent': agent}
+        line.update(record)
+        self.file.write(json.dumps(line) + '\n')
+        self.file.flush()
+        self.done.add((run, iteration, agent))
+
+    def close(self):
+        self.file.close()
+
+
+def iter_records(path, run=None):
+    '''
+    Read the records in a results file one at a time, optionally only
+    the ones from a given run. A partly written last line is ignored.
+    '''
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if run == None or record['run'] == run:
+                yield record
+
+
+def iter_data(data, agents, columns=()):
+    '''
+    Turn the dict returned by Board.test back into records, so the
+    aggregate functions work on either one. The records hold the time and
+    the given columns of each agent, like 'peak_frontier'.
+    '''
+    for agent in agents:
+        name = agent.__name__
+        for i, value in enumerate(data[name]):
+            record = {'run': None, 'iteration': i, 'agent': name, 'time': value}
+            for column in columns:
+                record[column] = data[name + '_' + column][i]
+            yield record
+
+
+def load_results(path, run, agents):
+    '''
+    Build the dict Board.test would have returned from the records of one run,
+    for the functions that need it all at once. This loads the whole run
+    into memory.
+    '''
+    names = set(agent.__name__ for agent in agents)
+    rows = {}
+    for record in iter_records(path, run):
+        if record['agent'] in names:
+            rows[(record['iteration'], record['agent'])] = record
+
+    out = {}
+    for agent in agents:
+        out[agent.__name__] = []
+    for (_, name), record in sorted(rows.items()):
+        for key, value in record.items():
+            if key in ('run', 'iteration', 'agent'):
+                continue
+            if key == 'time':
+                out[name].append(value)
+            else:
+                out.setdefault(name + '_' + key, []).append(value)
+    return out
+
+
+def average_times(records, agents):
+    '''
+    Average time to solution of each agent, leaving out unsolved problems
+    '''
+    totals = {agent.__name__: 0 for agent in agents}
+    counts = {agent.__name__: 0 for agent in agents}
+    for record in records:
+        name = record['agent']
+        if name in totals and record['time'] > 0:
+            totals[name] += record['time']
+            counts[name] += 1
+
+    averages = {}
+    for name in totals:
+        averages[name] = totals[name] / counts[name] if counts[name] > 0 else 0
+    return averages
+
+
+def solved_counts(records, agents):
+    '''
+    Number of problems each agent solved
+    '''
+    out = {agent.__name__: 0 for agent in agents}
+    for record in records:
+        if record['agent'] in out and record['time'] > 0:
+            out[record['agent']] += 1
+    return out
+
+
+def fastest_counts(records, agents):
+    '''
+    Number of problems each agent solved fastest.
+
+    Only iterations that haven't seen every agent yet are kept in memory,
+    which is a handful even when records arrive out of order.
+    '''
+    out = {agent.__name__: 0 for agent in agents}
+    pending = {}
+    for record in records:
+        name = record['agent']
+        if name not in out:
+            continue
+        key = (record['run'], record['iteration'])
+        times = pending.setdefault(key, {})
+        times[name] = record['time']
+        if len(times) < len(out):
+            continue
+
+        del pending[key]
+        fastest = None
+        for name in out:
+            if times[name] > 0 and (fastest == None or times[name] < times[fastest]):
+                fastest = name
+        if fastest:
+            out[fastest] += 1
+    return out
+
+
+def time_summaries(records, agents):
+    '''
+    Mean and standard deviation of the time to solution of each agent in
+    each run, leaving out unsolved problems. Uses Welford's method so it
+    only keeps three numbers per (run, agent).
+
+    Returns {run: {agent name: (mean, stdev)}}
+    '''
+    names = set(agent.__name__ for agent in agents)
+    stats = {}
+    for record in records:
+        if record['agent'] not in names or record['time'] <= 0:
+            continue
+        key = (record['run'], record['agent'])
+        count, mean, m2 = stats.get(key, (0, 0, 0))
+        count += 1
+        delta = record['time'] - mean
+        mean += delta / count
+        m2 += delta * (record['time'] - mean)
+        stats[key] = (count, mean, m2)
+
+    out = {}
+    for (run, name), (count, mean, m2) in stats.items():
+        stdev = (m2 / (count - 1)) ** (1/2) if count > 1 else 0
+        out.setdefault(run, {})[name] = (mean, stdev)
+    return out
+
+
+def metric_averages(records, agents, metrics):
+    '''
+    Average of each of the given metrics, like 'nodes_expanded', for each
+    agent in each run. Unsolved problems count too, the work of a search
+    that fails is still work.
+
+    Returns {run: {agent name: {metric: mean}}}
+    '''
+    names = set(agent.__name__ for agent in agents)
+    totals = {}
+    for record in records:
+        if record['agent'] not in names or metrics[0] not in record:
+            continue
+        key = (record['run'], record['agent'])
+        count, sums = totals.get(key, (0, [0] * len(metrics)))
+        totals[key] = (count + 1, [total + record[metric] for total, metric in zip(sums, metrics)])
+
+    out = {}
+    for (run, name), (count, sums) in totals.items():
+        out.setdefault(run, {})[name] = {metric: total / count for metric, total in zip(metrics, sums)}
+    return out
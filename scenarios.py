@@ -0,0 +1,102 @@
+'''
+Seeded scenarios and the scenario file format.
+
+A scenario is a board plus a start and goal coordinate. Scenarios are generated
+from a seed, so the same seed always gives the same workload, and they can be
+written to a compact binary file that is memory-mapped on load. Replaying a
+scenario file runs identical workloads across agents and across commits,
+without paying for board generation.
+
+File layout (all little-endian):
+    header: magic b'PFSC', version (uint16), padding (uint16),
+            rows, cols, count (uint32 each)
+    coordinate table: count x 4 uint32 (start_i, start_j, goal_i, goal_j)
+    grids: count packed bit-grids of rows * cols bits, 1 where there is an obstacle
+'''
+import struct
+import numpy as np
+from board import Board, iteration_seed
+from grid import OBSTACLE, make_grid
+
+MAGIC = b'PFSC'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIII')
+
+
+def generate_scenarios(board, count, seed=0):
+    '''
+    Generate scenarios with the board's size and island settings.
+
+    Scenario k is generated from iteration_seed(seed, k), the same seed
+    Board.test uses for iteration k, so a seeded test and a scenario file
+    built from the same seed describe the same workload.
+
+    Yields (grid, (start_i, start_j), (goal_i, goal_j)) tuples.
+    '''
+    for k in range(count):
+        board.seed(iteration_seed(seed, k))
+        board.generate_board()
+        [coord, goal_coord] = board.get_open_coords()
+        yield board.board, coord, goal_coord
+
+
+def write_scenarios(path, board, count, seed=0):
+    '''
+    Generate scenarios and write them to a scenario file
+    '''
+    rows, cols = board.rows, board.cols
+    coords = np.zeros((count, 4), dtype='<u4')
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, rows, cols, count))
+        # the coordinate table comes first, fill it in once the grids are written
+        f.write(coords.tobytes())
+        for k, (grid, coord, goal_coord) in enumerate(generate_scenarios(board, count, seed)):
+            f.write(np.packbits(grid == OBSTACLE).tobytes())
+            coords[k] = coord + goal_coord
+        f.seek(HEADER.size)
+        f.write(coords.tobytes())
+
+
+class ScenarioFile():
+    '''
+    A memory-mapped scenario file. Only the scenarios that are
+    actually used get read from disk.
+    '''
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            magic, version, _, rows, cols, count = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{path} is not a version {VERSION} scenario file')
+
+        self.rows = rows
+        self.cols = cols
+        self.count = count
+        self.coords = np.memmap(path, dtype='<u4', mode='r', offset=HEADER.size, shape=(count, 4))
+        grid_bytes = (rows * cols + 7) // 8
+        self.grids = np.memmap(path, dtype=np.uint8, mode='r', offset=HEADER.size + count * 16, shape=(count, grid_bytes))
+
+    def __len__(self):
+        return self.count
+
+    def board(self, k):
+        '''
+        Unpack the grid of scenario k into a new board grid
+        '''
+        bits = np.unpackbits(self.grids[k], count=self.rows * self.cols)
+        grid = make_grid(self.rows, self.cols)
+        grid[:] = (bits * OBSTACLE).reshape(self.rows, self.cols)
+        return grid
+
+    def coords_for(self, k):
+        '''
+        Return [(start_i, start_j), (goal_i, goal_j)] for scenario k
+        '''
+        start_i, start_j, goal_i, goal_j = (int(x) for x in self.coords[k])
+        return [(start_i, start_j), (goal_i, goal_j)]
+
+    def make_board(self):
+        '''
+        Create a Board of the right size to replay this file on
+        '''
+        return Board(rows=self.rows, cols=self.cols)
@@ -0,0 +1,741 @@
+'''
+Core search engine.
+
+The agents in agents.py and optimized_agents.py move one step at a time so
+that the search can be watched in the simulation. The functions in here
+instead run a complete search over the board and hand back the path, which
+the agents then follow.
+
+Cells are addressed with flat indices (i * cols + j) so the bookkeeping
+arrays are plain lists instead of dictionaries of tuples. The lists live in a
+SearchWorkspace, which can be handed from one search to the next so that a
+batch of queries on the same board doesn't allocate them again every time.
+A WorkspacePool keeps workspaces between searches that aren't in a batch,
+like the ones the agents on a Board run one after another.
+'''
+import heapq
+import numpy as np
+from array import array
+from grid import OBSTACLE
+
+SQRT2 = 2 ** (1/2)
+
+# (di, dj, cost) of every move on the 8-connected grid
+MOVES = (
+    (1, 0, 1),
+    (0, 1, 1),
+    (-1, 0, 1),
+    (0, -1, 1),
+    (1, 1, SQRT2),
+    (1, -1, SQRT2),
+    (-1, 1, SQRT2),
+    (-1, -1, SQRT2),
+)
+
+
+class SearchResult():
+    '''
+    The outcome of a single search.
+
+    path is a list of (i, j) coordinates from start to goal (inclusive),
+    or None when the goal can't be reached. cost is the length of that path,
+    or -1 when there is no solution. peak_frontier is the most entries the
+    frontier held at once, stale ones included, and peak_visited the number
+    of cells the search reached, which all hold a g-cost by the end.
+    '''
+    def __init__(self, path, cost, expanded, generated, peak_frontier=0, peak_visited=0):
+        self.path = path
+        self.cost = cost
+        self.expanded = expanded
+        self.generated = generated
+        self.peak_frontier = peak_frontier
+        self.peak_visited = peak_visited
+
+    def __repr__(self):
+        return f'SearchResult(cost={self.cost}, expanded={self.expanded}, generated={self.generated})'
+
+
+class SearchWorkspace():
+    '''
+    Scratch buffers for searching one board, reused between searches.
+
+    Nothing is cleared between searches. Each search starts a new generation
+    instead, and an entry only counts if it was stamped in the current one:
+    seen[k] for g[k] and parent[k], closed[k] for the closed set.
+
+    The board's cells are copied when the workspace is made, so later
+    changes to the board aren't seen by searches using it until load()
+    copies them again.
+
+    The buffers have room for the bordered flat indices of grid.FlatGrid as
+    well as i * cols + j, so agents can keep their searched maps in them too.
+    '''
+    def __init__(self, board):
+        rows, cols = board.shape
+        n = (rows + 2) * (cols + 2)
+        self.shape = (rows, cols)
+        # reading a bytearray gives plain ints, much faster than numpy scalars
+        self.cells = bytearray(rows * cols)
+        self.grid = np.frombuffer(self.cells, dtype=np.uint8).reshape(rows, cols)
+        self.load(board)
+        self.g = [float('inf')] * n
+        self.parent = [-1] * n
+        self.seen = [0] * n
+        self.closed = [0] * n
+        self.generation = 0
+        self.backward = None
+        self.counts = None
+        self.kernel_arrays = None
+
+    def load(self, board):
+        '''
+        Copy the cells of a board the same size into the workspace,
+        in place so nothing is allocated
+        '''
+        self.board = board
+        np.copyto(self.grid, board)
+
+    def begin(self):
+        '''
+        Start a new search and return its generation
+        '''
+        self.generation += 1
+        return self.generation
+
+    def counters(self):
+        '''
+        A zeroed array of 16 bit counters with one per flat index, for the
+        penalties of the local search agents. Counts can't be told apart by
+        generation, so unlike the other buffers it is zeroed in place, which
+        is still cheaper than allocating one for every agent.
+        '''
+        if self.counts == None:
+            self.counts = array('H', [0]) * len(self.seen)
+        else:
+            np.frombuffer(self.counts, dtype=np.uint16)[:] = 0
+        return self.counts
+
+    def arrays(self):
+        '''
+        NumPy arrays for g, parent, seen and closed, for the compiled A*
+        kernel in compiled.py. They are made on first use, and are stamped
+        with the generations from begin() like the lists.
+        '''
+        if self.kernel_arrays == None:
+            n = len(self.seen)
+            self.kernel_arrays = (np.empty(n), np.empty(n, dtype=np.int64), np.zeros(n, dtype=np.int64),
+                                  np.zeros(n, dtype=np.int64))
+        return self.kernel_arrays
+
+    def reverse(self):
+        '''
+        A second set of buffers on the same cells, for the backward
+        half of a bidirectional search
+        '''
+        if self.backward == None:
+            self.backward = SearchWorkspace(self.board)
+            self.backward.cells = self.cells
+            self.backward.grid = self.grid
+        return self.backward
+
+
+class WorkspacePool():
+    '''
+    Hands out SearchWorkspaces and takes them back when a search is done,
+    so the next search of a board the same size reuses their buffers
+    instead of allocating new ones. A workspace from the pool starts a new
+    generation like any other, so nothing has to be cleared.
+
+    At most max_idle workspaces are kept for each board size.
+    '''
+    def __init__(self, max_idle=4):
+        self.max_idle = max_idle
+        self.idle = {}
+
+    def acquire(self, board):
+        '''
+        Return a workspace holding the current cells of the board
+        '''
+        idle = self.idle.get(board.shape)
+        if idle:
+            workspace = idle.pop()
+            workspace.load(board)
+            return workspace
+        return SearchWorkspace(board)
+
+    def release(self, workspace):
+        '''
+        Give a workspace back to the pool
+        '''
+        idle = self.idle.setdefault(workspace.shape, [])
+        if len(idle) < self.max_idle:
+            idle.append(workspace)
+
+
+def octile(i, j, goal_i, goal_j):
+    '''
+    Exact distance between two cells on an empty 8-connected grid
+    '''
+    di = abs(goal_i - i)
+    dj = abs(goal_j - j)
+    if di < dj:
+        return dj + (SQRT2 - 1) * di
+    return di + (SQRT2 - 1) * dj
+
+
+def reconstruct_path(parent, start, goal, cols):
+    '''
+    Walk the parent array back from the goal and return the path
+    as a list of (i, j) coordinates
+    '''
+    path = []
+    k = goal
+    while k != start:
+        path.append(divmod(k, cols))
+        k = parent[k]
+    path.append(divmod(start, cols))
+    path.reverse()
+    return path
+
+
+def a_star(board, start, goal, heuristic=None, workspace=None):
+    '''
+    Run A* with f = g + h from start to goal on the 8-connected grid.
+
+    Straight moves cost 1 and diagonal moves cost sqrt(2). Cells at or above
+    OBSTACLE (obstacles and other agents) are blocked.
+
+    The frontier is a binary heap. Instead of a decrease-key operation, a
+    better path to a node pushes a new entry and the stale one is skipped
+    when it's popped (lazy deletion). The search stops as soon as the goal
+    is popped, without draining the rest of the frontier.
+
+    Parameters:
+        board (np.ndarray): the board grid
+        start ((int, int)): start coordinate
+        goal ((int, int)): goal coordinate
+        heuristic (function): heuristic(i, j) -> estimated distance to goal.
+            Defaults to the octile distance.
+        workspace (SearchWorkspace): buffers to reuse, made for this board.
+            A new one is made when none is given.
+    '''
+    rows, cols = board.shape
+    goal_i, goal_j = goal
+    if heuristic == None:
+        heuristic = lambda i, j: octile(i, j, goal_i, goal_j)
+
+    if workspace == None:
+        workspace = SearchWorkspace(board)
+    cells = workspace.cells
+    g, parent, seen, closed = workspace.g, workspace.parent, workspace.seen, workspace.closed
+    gen = workspace.begin()
+    s = start[0] * cols + start[1]
+    t = goal_i * cols + goal_j
+
+    g[s] = 0
+    seen[s] = gen
+    h = heuristic(start[0], start[1])
+    frontier = [(h, h, s)]
+    expanded = 0
+    generated = 1
+    peak_frontier = 1
+    visited = 1
+
+    while frontier:
+        _, _, k = heapq.heappop(frontier)
+        if closed[k] == gen:
+            continue
+        if k == t:
+            path = reconstruct_path(parent, s, t, cols)
+            return SearchResult(path, g[t], expanded, generated, peak_frontier, visited)
+
+        closed[k] = gen
+        expanded += 1
+        i, j = divmod(k, cols)
+        g_k = g[k]
+
+        for di, dj, cost in MOVES:
+            ni = i + di
+            nj = j + dj
+            if not (0 <= ni < rows and 0 <= nj < cols):
+                continue
+            nk = ni * cols + nj
+            if closed[nk] == gen or cells[nk] >= OBSTACLE:
+                continue
+
+            g_new = g_k + cost
+            if seen[nk] != gen or g_new < g[nk]:
+                visited += seen[nk] != gen
+                seen[nk] = gen
+                g[nk] = g_new
+                parent[nk] = k
+                h = heuristic(ni, nj)
+                # ties on f go to the node closer to the goal
+                heapq.heappush(frontier, (g_new + h, h, nk))
+                generated += 1
+        if len(frontier) > peak_frontier:
+            peak_frontier = len(frontier)
+
+    return SearchResult(None, -1, expanded, generated, peak_frontier, visited)
+
+
+def bidirectional_a_star(board, start, goal, heuristic=None, reverse_heuristic=None, workspace=None):
+    '''
+    Run A* from both ends at once, meeting in the middle.
+
+    The forward search runs from start towards goal and the backward search
+    from goal towards start, each with its own heap, g-costs, parents and
+    closed bitmap. Moves cost the same in both directions, so the backward
+    search can use the same neighbors. Every time either search lowers the
+    g-cost of a cell the other search has also reached, the path through that
+    cell is a candidate, and mu is the cheapest candidate so far.
+
+    Each search always expands from its smaller heap. The search stops once
+    mu <= max(forward min f, backward min f): with consistent heuristics every
+    path that hasn't been seen yet costs at least that much, so mu is optimal.
+
+    Parameters are the same as a_star, plus reverse_heuristic(i, j), the
+    estimated distance to start. Both default to the octile distance and
+    must be consistent, which the octile and straight line distances are.
+    The backward search uses workspace.reverse() for its buffers.
+    '''
+    rows, cols = board.shape
+    start_i, start_j = start
+    goal_i, goal_j = goal
+    if heuristic == None:
+        heuristic = lambda i, j: octile(i, j, goal_i, goal_j)
+    if reverse_heuristic == None:
+        reverse_heuristic = lambda i, j: octile(i, j, start_i, start_j)
+
+    if workspace == None:
+        workspace = SearchWorkspace(board)
+    cells = workspace.cells
+    s = start_i * cols + start_j
+    t = goal_i * cols + goal_j
+    if s == t:
+        return SearchResult([start], 0, 0, 1, 1, 1)
+    # a_star never generates a blocked goal, so neither do we
+    if cells[t] >= OBSTACLE:
+        return SearchResult(None, -1, 0, 1, 1, 1)
+
+    # index 0 is the forward search, index 1 the backward search
+    workspaces = (workspace, workspace.reverse())
+    g = (workspaces[0].g, workspaces[1].g)
+    parent = (workspaces[0].parent, workspaces[1].parent)
+    seen = (workspaces[0].seen, workspaces[1].seen)
+    closed = (workspaces[0].closed, workspaces[1].closed)
+    gens = (workspaces[0].begin(), workspaces[1].begin())
+    heuristics = (heuristic, reverse_heuristic)
+
+    g[0][s] = 0
+    seen[0][s] = gens[0]
+    g[1][t] = 0
+    seen[1][t] = gens[1]
+    h_s = heuristic(start_i, start_j)
+    h_t = reverse_heuristic(goal_i, goal_j)
+    frontiers = ([(h_s, h_s, s)], [(h_t, h_t, t)])
+    expanded = 0
+    generated = 2
+    # both frontiers together, and the cells reached by either search, counted once per search
+    peak_frontier = 2
+    visited = 2
+
+    mu = float('inf')
+    meet = -1
+
+    while True:
+        # drop closed entries from the tops so the minimum f is current
+        for d in (0, 1):
+            frontier = frontiers[d]
+            while frontier and closed[d][frontier[0][2]] == gens[d]:
+                heapq.heappop(frontier)
+        if not frontiers[0] or not frontiers[1]:
+            break
+        if mu <= max(frontiers[0][0][0], frontiers[1][0][0]):
+            break
+
+        d = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        g_d, g_other = g[d], g[1 - d]
+        seen_d, seen_other = seen[d], seen[1 - d]
+        parent_d, closed_d = parent[d], closed[d]
+        gen, gen_other = gens[d], gens[1 - d]
+        h_d = heuristics[d]
+        frontier = frontiers[d]
+
+        _, _, k = heapq.heappop(frontier)
+        closed_d[k] = gen
+        expanded += 1
+        i, j = divmod(k, cols)
+        g_k = g_d[k]
+
+        for di, dj, cost in MOVES:
+            ni = i + di
+            nj = j + dj
+            if not (0 <= ni < rows and 0 <= nj < cols):
+                continue
+            nk = ni * cols + nj
+            # the start cell holds the agent, so the backward search can't
+            # step onto it, it meets the forward search next to it instead
+            if closed_d[nk] == gen or cells[nk] >= OBSTACLE:
+                continue
+
+            g_new = g_k + cost
+            if seen_d[nk] != gen or g_new < g_d[nk]:
+                visited += seen_d[nk] != gen
+                seen_d[nk] = gen
+                g_d[nk] = g_new
+                parent_d[nk] = k
+                h = h_d(ni, nj)
+                # a cell that can't beat the best meeting so far is never worth expanding
+                if g_new + h < mu:
+                    heapq.heappush(frontier, (g_new + h, h, nk))
+                    generated += 1
+                if seen_other[nk] == gen_other and g_new + g_other[nk] < mu:
+                    mu = g_new + g_other[nk]
+                    meet = nk
+        if len(frontiers[0]) + len(frontiers[1]) > peak_frontier:
+            peak_frontier = len(frontiers[0]) + len(frontiers[1])
+
+    if meet == -1:
+        return SearchResult(None, -1, expanded, generated, peak_frontier, visited)
+
+    path = reconstruct_path(parent[0], s, meet, cols)
+    backward = reconstruct_path(parent[1], t, meet, cols)
+    backward.reverse()
+    path += backward[1:]
+    return SearchResult(path, mu, expanded, generated, peak_frontier, visited)
+
+
+def jump_point_search(board, start, goal, heuristic=None, workspace=None):
+    '''
+    Run Jump Point Search from start to goal on the 8-connected grid.
+
+    Every move on the board costs the same, so many paths between two cells
+    are symmetric. JPS prunes the neighbors that another path would reach
+    just as cheaply, and instead of pushing every cell it "jumps" along
+    straight and diagonal lines until it hits the goal or a cell with a
+    forced neighbor (a jump point). Only jump points go on the heap.
+
+    Diagonal moves are allowed past obstacle corners, same as in a_star,
+    so the paths are the same length. Parameters are the same as a_star,
+    and the returned path lists every cell, not just the jump points.
+    '''
+    rows, cols = board.shape
+    goal_i, goal_j = goal
+    if heuristic == None:
+        heuristic = lambda i, j: octile(i, j, goal_i, goal_j)
+
+    if workspace == None:
+        workspace = SearchWorkspace(board)
+    cells = workspace.cells
+    s = start[0] * cols + start[1]
+    t = goal_i * cols + goal_j
+
+    def walkable(i, j):
+        return 0 <= i < rows and 0 <= j < cols and cells[i * cols + j] < OBSTACLE
+
+    def jump_straight(i, j, di, dj):
+        '''
+        Walk from (i, j) in a straight line until a jump point is found.
+        Returns None if the line runs into an obstacle first.
+        '''
+        while True:
+            i += di
+            j += dj
+            if not walkable(i, j):
+                return None
+            if i == goal_i and j == goal_j:
+                return (i, j)
+            if di:
+                if (walkable(i + di, j + 1) and not walkable(i, j + 1)) or \
+                        (walkable(i + di, j - 1) and not walkable(i, j - 1)):
+                    return (i, j)
+            else:
+                if (walkable(i + 1, j + dj) and not walkable(i + 1, j)) or \
+                        (walkable(i - 1, j + dj) and not walkable(i - 1, j)):
+                    return (i, j)
+
+    def jump(i, j, di, dj):
+        '''
+        Jump from (i, j) in the given direction. Diagonal jumps stop as soon
+        as either of the straight jumps they spawn finds a jump point.
+        '''
+        if not (di and dj):
+            return jump_straight(i, j, di, dj)
+
+        while True:
+            i += di
+            j += dj
+            if not walkable(i, j):
+                return None
+            if i == goal_i and j == goal_j:
+                return (i, j)
+            if (walkable(i - di, j + dj) and not walkable(i - di, j)) or \
+                    (walkable(i + di, j - dj) and not walkable(i, j - dj)):
+                return (i, j)
+            if jump_straight(i, j, di, 0) or jump_straight(i, j, 0, dj):
+                return (i, j)
+
+    def directions(k):
+        '''
+        The pruned set of directions to jump in from node k
+        '''
+        i, j = divmod(k, cols)
+        if k == s:
+            return [(di, dj) for di, dj, _ in MOVES if walkable(i + di, j + dj)]
+
+        pi, pj = divmod(parent[k], cols)
+        di = (i > pi) - (i < pi)
+        dj = (j > pj) - (j < pj)
+
+        out = []
+        if di and dj:
+            if walkable(i, j + dj):
+                out.append((0, dj))
+            if walkable(i + di, j):
+                out.append((di, 0))
+            if walkable(i + di, j + dj):
+                out.append((di, dj))
+            if not walkable(i - di, j):
+                out.append((-di, dj))
+            if not walkable(i, j - dj):
+                out.append((di, -dj))
+        elif di:
+            if walkable(i + di, j):
+                out.append((di, 0))
+            if not walkable(i, j + 1):
+                out.append((di, 1))
+            if not walkable(i, j - 1):
+                out.append((di, -1))
+        else:
+            if walkable(i, j + dj):
+                out.append((0, dj))
+            if not walkable(i + 1, j):
+                out.append((1, dj))
+            if not walkable(i - 1, j):
+                out.append((-1, dj))
+        return out
+
+    g, parent, seen, closed = workspace.g, workspace.parent, workspace.seen, workspace.closed
+    gen = workspace.begin()
+
+    g[s] = 0
+    seen[s] = gen
+    h = heuristic(start[0], start[1])
+    frontier = [(h, h, s)]
+    expanded = 0
+    generated = 1
+    peak_frontier = 1
+    visited = 1
+
+    while frontier:
+        _, _, k = heapq.heappop(frontier)
+        if closed[k] == gen:
+            continue
+        if k == t:
+            jump_points = reconstruct_path(parent, s, t, cols)
+            return SearchResult(expand_path(jump_points), g[t], expanded, generated, peak_frontier, visited)
+
+        closed[k] = gen
+        expanded += 1
+        i, j = divmod(k, cols)
+        g_k = g[k]
+
+        for di, dj in directions(k):
+            point = jump(i, j, di, dj)
+            if point == None:
+                continue
+            ni, nj = point
+            nk = ni * cols + nj
+            if closed[nk] == gen:
+                continue
+
+            g_new = g_k + octile(i, j, ni, nj)
+            if seen[nk] != gen or g_new < g[nk]:
+                visited += seen[nk] != gen
+                seen[nk] = gen
+                g[nk] = g_new
+                parent[nk] = k
+                h = heuristic(ni, nj)
+                heapq.heappush(frontier, (g_new + h, h, nk))
+                generated += 1
+        if len(frontier) > peak_frontier:
+            peak_frontier = len(frontier)
+
+    return SearchResult(None, -1, expanded, generated, peak_frontier, visited)
+
+
+def expand_path(jump_points):
+    '''
+    Fill in the cells between consecutive jump points, which always
+    lie on a straight or diagonal line
+    '''
+    path = [jump_points[0]]
+    for ni, nj in jump_points[1:]:
+        i, j = path[-1]
+        di = (ni > i) - (ni < i)
+        dj = (nj > j) - (nj < j)
+        while (i, j) != (ni, nj):
+            i += di
+            j += dj
+            path.append((i, j))
+    return path
+
+
+class DStarLite():
+    '''
+    Incremental planner using D* Lite (Koenig and Likhachev, 2002).
+
+    D* Lite searches backwards from the goal, so the g-values it keeps are
+    distances to the goal and stay valid while the start moves. When cells
+    change, only the cells whose distance actually changed are put back on
+    the heap, so repairing the plan costs about as much as the change
+    affected, not a new search over the board.
+
+    Only obstacles block. The planner keeps its own copy of which cells are
+    blocked, and update_cells reads the new state of the cells it is told
+    about from the board.
+    '''
+    def __init__(self, board, start, goal):
+        rows, cols = board.shape
+        n = rows * cols
+        self.rows = rows
+        self.cols = cols
+        self.blocked = bytearray((board == OBSTACLE).tobytes())
+        self.g = [float('inf')] * n
+        self.rhs = [float('inf')] * n
+        # the key each cell is queued with, or None when it isn't queued
+        self.queued = [None] * n
+        self.frontier = []
+        self.start = start[0] * cols + start[1]
+        self.last = self.start
+        self.goal = goal[0] * cols + goal[1]
+        self.km = 0
+        self.expanded = 0
+        self.generated = 0
+        self.peak_frontier = 0
+
+        self.rhs[self.goal] = 0
+        self.push(self.goal)
+
+    def heuristic(self, k):
+        '''
+        Octile distance from the start to cell k
+        '''
+        i, j = divmod(k, self.cols)
+        start_i, start_j = divmod(self.start, self.cols)
+        return octile(i, j, start_i, start_j)
+
+    def key(self, k):
+        m = min(self.g[k], self.rhs[k])
+        return (m + self.heuristic(k) + self.km, m)
+
+    def push(self, k):
+        key = self.key(k)
+        self.queued[k] = key
+        heapq.heappush(self.frontier, (key, k))
+        self.generated += 1
+        if len(self.frontier) > self.peak_frontier:
+            self.peak_frontier = len(self.frontier)
+
+    def neighbors(self, k):
+        '''
+        Yield (neighbor, cost) for every cell next to k. Moves are the
+        same in both directions, so these are both the successors and
+        the predecessors of k.
+        '''
+        i, j = divmod(k, self.cols)
+        for di, dj, cost in MOVES:
+            ni = i + di
+            nj = j + dj
+            if 0 <= ni < self.rows and 0 <= nj < self.cols:
+                yield ni * self.cols + nj, cost
+
+    def update_vertex(self, k):
+        if k != self.goal:
+            best = float('inf')
+            if not self.blocked[k]:
+                g = self.g
+                blocked = self.blocked
+                for nk, cost in self.neighbors(k):
+                    if not blocked[nk] and cost + g[nk] < best:
+                        best = cost + g[nk]
+            self.rhs[k] = best
+
+        if self.g[k] != self.rhs[k]:
+            self.push(k)
+        else:
+            self.queued[k] = None
+
+    def compute(self):
+        '''
+        Expand cells until the g-value of the start is correct
+        '''
+        g = self.g
+        rhs = self.rhs
+        frontier = self.frontier
+        s = self.start
+        while frontier:
+            key, k = frontier[0]
+            if self.queued[k] != key:
+                # stale entry, the cell was requeued or taken off since
+                heapq.heappop(frontier)
+                continue
+            if key >= self.key(s) and rhs[s] == g[s]:
+                break
+
+            heapq.heappop(frontier)
+            self.queued[k] = None
+            new_key = self.key(k)
+            if key < new_key:
+                self.push(k)
+            elif g[k] > rhs[k]:
+                g[k] = rhs[k]
+                self.expanded += 1
+                for nk, _ in self.neighbors(k):
+                    self.update_vertex(nk)
+            else:
+                g[k] = float('inf')
+                self.expanded += 1
+                self.update_vertex(k)
+                for nk, _ in self.neighbors(k):
+                    self.update_vertex(nk)
+
+    def cost(self):
+        '''
+        Distance from the start to the goal, inf if it can't be reached
+        '''
+        return self.g[self.start]
+
+    def next_step(self):
+        '''
+        The best cell to move to from the start, or None if there is none
+        '''
+        best = None
+        best_value = float('inf')
+        for nk, cost in self.neighbors(self.start):
+            if not self.blocked[nk] and cost + self.g[nk] < best_value:
+                best = nk
+                best_value = cost + self.g[nk]
+        if best == None:
+            return None
+        return divmod(best, self.cols)
+
+    def move_to(self, coord):
+        self.start = coord[0] * self.cols + coord[1]
+
+    def update_cells(self, board, cells):
+        '''
+        Repair the plan after the given (i, j) cells changed on the board
+        '''
+        self.km += self.heuristic(self.last)
+        self.last = self.start
+
+        for i, j in cells:
+            k = i * self.cols + j
+            self.blocked[k] = int(board[i, j] == OBSTACLE)
+            # every move into or out of the cell changed cost
+            self.update_vertex(k)
+            for nk, _ in self.neighbors(k):
+                self.update_vertex(nk)
+        self.compute()
@@ -0,0 +1,106 @@
+'''
+Checks of the step-by-step agents in agents.py and optimized_agents.py.
+'''
+import pytest
+from board import Board
+from agents import MAX_PENALTY, AStarAgent, GuidedLocalSearchAgent, RandomLocalSearchAgent
+from optimized_agents import (BidirectionalLocalSearchAgent, MHDBidirectionalLocalSearchAgent, OptimizedLocalSearchAgent,
+                              DistanceFieldAgent, DStarLiteAgent, MatrixLookupAStarAgent, SetLookupAStarAgent,
+                              SetLookupCachedAStarAgent)
+from conftest import dijkstra
+
+
+def test_optimized_local_search_heads_for_the_goal():
+    board = Board(rows=10, cols=10)
+    agent = board.place_single_agent(OptimizedLocalSearchAgent, 2, 2, 7, 5)
+    # no cell has a penalty yet, so the heuristic is the distance to the goal
+    assert agent.heuristic(4, 4) == pytest.approx(((7 - 4) ** 2 + (5 - 4) ** 2) ** (1/2))
+
+    moves = 0
+    while not agent.is_goal() and not agent.no_solution and moves < 100:
+        agent.move(board.board)
+        moves += 1
+    # on an empty board every move gets closer
+    assert agent.is_goal()
+    assert moves == 5
+
+
+@pytest.mark.parametrize('agent_class', (AStarAgent, DistanceFieldAgent, DStarLiteAgent))
+def test_path_cost_counts_the_walk_before_a_replan(agent_class):
+    board = Board(rows=6, cols=10)
+    agent = board.place_single_agent(agent_class, 2, 0, 2, 9)
+    for _ in range(3):
+        agent.move(board.board)
+    assert (agent.i, agent.j) == (2, 3)
+
+    # wall off the straight line ahead, so the rest of the way is a detour
+    for i in range(4):
+        board.set_obstacle(i, 5)
+    rest = dijkstra(board.board, (2, 3), (2, 9))
+    while not agent.is_goal() and not agent.no_solution:
+        agent.move(board.board)
+    assert agent.is_goal()
+    assert agent.path_cost == pytest.approx(3 + rest)
+
+
+@pytest.mark.parametrize('agent_class', (GuidedLocalSearchAgent, BidirectionalLocalSearchAgent,
+                                         MHDBidirectionalLocalSearchAgent, OptimizedLocalSearchAgent))
+def test_penalties_stay_below_the_limit(agent_class):
+    board = Board(rows=40, cols=40, num_islands=40, min_island_size=1, max_island_size=15)
+    board.seed(1)
+    for _ in range(5):
+        board.generate_board()
+        (i, j), (goal_i, goal_j) = board.get_open_coords()
+        board.clear_agents()
+        agent = board.place_single_agent(agent_class, i, j, goal_i, goal_j)
+        moves = 0
+        while not agent.is_goal() and not agent.no_solution:
+            agent.move(board.board)
+            moves += 1
+            # every agent gives up long before this
+            assert moves < 200000
+        assert max(agent.penalties) <= MAX_PENALTY
+        if hasattr(agent, 'goal_penalties'):
+            assert max(agent.goal_penalties) <= MAX_PENALTY
+        agent.detach()
+
+
+def test_random_local_search_gives_up_after_the_move_limit():
+    board = Board(rows=10, cols=10)
+    agent = board.place_single_agent(RandomLocalSearchAgent, 2, 2, 7, 5)
+    agent.moves = 1000001
+    agent.move(board.board)
+    # the agent stops where it is, and says so, instead of returning forever
+    assert agent.no_solution
+    assert (agent.i, agent.j) == (2, 2)
+
+
+def test_local_search_agents_reuse_the_boards_buffers():
+    board = Board(rows=12, cols=12)
+    first = board.place_single_agent(BidirectionalLocalSearchAgent, 1, 1, 10, 8)
+    while not first.is_goal() and not first.no_solution:
+        first.move(board.board)
+    assert first.flat is board.flat_grid()
+    penalties, goal_penalties = first.penalties, first.goal_penalties
+    assert max(penalties) > 0 and max(goal_penalties) > 0
+    board.clear_agents()
+
+    # the next agent gets the same counters back from the Board's pool, zeroed
+    second = board.place_single_agent(BidirectionalLocalSearchAgent, 2, 3, 9, 9)
+    second.heuristic()
+    assert second.flat is first.flat
+    assert second.penalties is penalties and second.goal_penalties is goal_penalties
+    assert max(penalties) == 0 and max(goal_penalties) == 0
+
+
+@pytest.mark.parametrize('agent_class', (MatrixLookupAStarAgent, SetLookupAStarAgent, SetLookupCachedAStarAgent))
+def test_greedy_agents_reach_the_goal(agent_class):
+    board = Board(rows=10, cols=10)
+    agent = board.place_single_agent(agent_class, 1, 1, 8, 6)
+    moves = 0
+    while not agent.is_goal() and not agent.no_solution and moves < 100:
+        agent.move(board.board)
+        moves += 1
+    # on an empty board the greedy search walks straight there
+    assert agent.is_goal()
+    assert moves == 7
@@ -0,0 +1,86 @@
+'''
+Checks of the Board.
+'''
+import numpy as np
+import pytest
+from board import Board
+from agents import AStarAgent
+from grid import FREE, GOAL, OBSTACLE, OCCUPIED
+from search import a_star, bidirectional_a_star, jump_point_search
+from conftest import queries, dijkstra, check_path
+
+
+def test_agents_are_kept_off_the_grid():
+    board = Board(rows=6, cols=8)
+    board.board[2, 3] = OBSTACLE
+    agent = board.place_single_agent(AStarAgent, 0, 0, 5, 7)
+    board.agents.append(agent)
+    assert board.board.dtype == np.uint8
+    assert board.board[0, 0] == OCCUPIED
+    assert board.board[5, 7] == GOAL
+    assert board.agent_at(0, 0) is agent
+    assert board.agent_at(5, 7) == None
+
+    # agents only move their OCCUPIED marker, index_agents finds them again
+    agent.move(board.board)
+    board.index_agents()
+    assert (agent.i, agent.j) != (0, 0)
+    assert board.agent_at(agent.i, agent.j) is agent
+    assert board.agent_at(0, 0) == None
+    assert (board.board == OCCUPIED).sum() == 1
+    assert board.board[agent.i, agent.j] == OCCUPIED
+
+    board.clear_agents()
+    assert board.agent_at(agent.i, agent.j) == None
+    assert board.board[2, 3] == OBSTACLE
+    assert (board.board == FREE).sum() == 6 * 8 - 1
+
+
+def test_open_coords_are_open():
+    board = Board(num_islands=60, min_island_size=5, max_island_size=20, rows=20, cols=20)
+    board.seed(2)
+    board.generate_board()
+    for _ in range(200):
+        start, goal = board.get_open_coords()
+        assert board.board[start] == FREE
+        assert board.board[goal] == FREE
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_solve_many_matches_dijkstra(seed):
+    grid, pairs = queries(seed, 8)
+    free = grid.copy()
+    # an agent standing on the board doesn't block the queries
+    grid[pairs[0][0]] = OCCUPIED
+    before = grid.copy()
+    board = Board(rows=grid.shape[0], cols=grid.shape[1])
+    board.board = grid
+    for algorithm in (a_star, jump_point_search, bidirectional_a_star):
+        results = board.solve_many(pairs, algorithm)
+        assert [result.cost for result in results] == pytest.approx([dijkstra(free, start, goal) for start, goal in pairs])
+        for (start, goal), result in zip(pairs, results):
+            check_path(free, result, start, goal)
+    assert (board.board == before).all()
+
+
+def test_generate_board_repeats_with_a_seed():
+    board = Board(num_islands=30, min_island_size=3, max_island_size=20, rows=25, cols=40)
+    boards = []
+    for _ in range(2):
+        board.seed(5)
+        board.generate_board()
+        boards.append(board.board.copy())
+    assert (boards[0] == boards[1]).all()
+
+    # islands grow on the inside of the board, with at most max_island_size blocks each
+    obstacles = boards[0] == OBSTACLE
+    assert ((boards[0] == FREE) | obstacles).all()
+    assert 0 < obstacles.sum() <= 30 * 20
+    assert not obstacles[0].any() and not obstacles[-1].any()
+    assert not obstacles[:, 0].any() and not obstacles[:, -1].any()
+
+
+def test_generate_board_without_islands():
+    board = Board(num_islands=0, rows=10, cols=12)
+    board.generate_board()
+    assert (board.board == FREE).all()
@@ -0,0 +1,51 @@
+'''
+Checks of the eviction policies in cache.py.
+'''
+import pytest
+from cache import LRUCache, LFUCache, DenseCache, make_cache
+
+
+def lookups(cache, cells):
+    '''
+    Look the cells up in order, and return the ones that had to be computed
+    '''
+    computed = []
+
+    def compute(i, j):
+        computed.append((i, j))
+        return 10 * i + j
+
+    for i, j in cells:
+        assert cache.lookup(i, j, compute) == 10 * i + j
+    return computed
+
+
+def test_lru_evicts_the_least_recently_used():
+    cache = LRUCache(2)
+    # (0, 1) was used more often, but (0, 2) more recently
+    assert lookups(cache, [(0, 1), (0, 1), (0, 2), (0, 3), (0, 2), (0, 1)]) == [(0, 1), (0, 2), (0, 3), (0, 1)]
+    assert cache.stats() == {'cache_hits': 2, 'cache_misses': 4, 'cache_evictions': 2}
+
+
+def test_lfu_evicts_the_least_frequently_used():
+    cache = LFUCache(2)
+    assert lookups(cache, [(0, 1), (0, 1), (0, 2), (0, 3), (0, 2), (0, 1)]) == [(0, 1), (0, 2), (0, 3), (0, 2)]
+    assert cache.stats() == {'cache_hits': 2, 'cache_misses': 4, 'cache_evictions': 2}
+
+    # ties on the count go to the least recently used
+    cache = LFUCache(2)
+    assert lookups(cache, [(1, 1), (1, 2), (1, 3), (1, 2), (1, 1)]) == [(1, 1), (1, 2), (1, 3), (1, 1)]
+
+
+def test_dense_never_evicts():
+    cache = DenseCache(4, 5)
+    cells = [(i, j) for i in range(4) for j in range(5)]
+    assert lookups(cache, cells + cells) == cells
+    assert cache.stats() == {'cache_hits': 20, 'cache_misses': 20, 'cache_evictions': 0}
+
+
+def test_make_cache():
+    assert isinstance(make_cache('lru', 8, None), LRUCache)
+    assert make_cache('lfu', 8, None).capacity == 8
+    with pytest.raises(ValueError):
+        make_cache('fifo', 8, None)
@@ -0,0 +1,30 @@
+'''
+Checks of the Conflict-Based Search planner in cbs.py, on boards from
+fixed seeds.
+'''
+import pytest
+from cbs import CBSAgent, find_conflicts
+from multiagent import CooperativeAStarAgent
+from conftest import place_team, check_team
+
+
+def test_find_conflicts():
+    # a and b both on cell 5 at time 1
+    assert find_conflicts([[1, 5, 9], [2, 5, 3]]) == [(1, 0, 1, 5, None)]
+    # a moves from cell 1 to 2 while b moves from 2 to 1
+    assert find_conflicts([[1, 2], [2, 1]]) == [(0, 0, 1, 1, 2)]
+    # b runs over a, which has stopped on its goal
+    assert find_conflicts([[4], [3, 4, 5]]) == [(1, 0, 1, 4, None)]
+    assert find_conflicts([[1, 2, 3], [4, 5, 6]]) == []
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_cbs_plans_have_no_conflicts_and_lowest_cost(seed):
+    board = place_team(CBSAgent, seed, 8)
+    assert check_team(board, CBSAgent)
+    cbs_cost = sum(agent.path_cost for agent in board.agents)
+
+    # CBS plans have the lowest sum of costs, so never cost more than prioritized plans
+    board = place_team(CooperativeAStarAgent, seed, 8)
+    if check_team(board, CooperativeAStarAgent):
+        assert cbs_cost <= sum(agent.path_cost for agent in board.agents) + 1e-9
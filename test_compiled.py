@@ -0,0 +1,60 @@
+'''
+Checks that the agents in compiled.py match the Python agents they
+extend, with or without Numba.
+'''
+import pytest
+from board import Board
+from agents import GuidedLocalSearchAgent
+from grid import FlatGrid, padding
+from search import SearchWorkspace
+from optimized_agents import OptimizedAStarAgent
+from compiled import CompiledAStarAgent, CompiledGuidedLocalSearchAgent, a_star_kernel, guided_walk_kernel, njit
+from metrics import COUNTS
+from conftest import queries, dijkstra
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_compiled_agents_match_python_agents(seed):
+    board = Board(num_islands=30, rows=25, cols=25)
+    board.seed(seed)
+    board.generate_board()
+    coord, goal_coord = board.get_open_coords()
+    for agent_class, compiled_class in ((OptimizedAStarAgent, CompiledAStarAgent),
+                                        (GuidedLocalSearchAgent, CompiledGuidedLocalSearchAgent)):
+        expected = board.run_agent(agent_class, coord, goal_coord)
+        record = board.run_agent(compiled_class, coord, goal_coord)
+        assert record['compiled'] == int(njit != None)
+        assert (record['time'] == -1) == (expected['time'] == -1)
+        assert record['path_cost'] == pytest.approx(expected['path_cost'])
+        assert record['heuristic_calls'] == expected['heuristic_calls']
+        assert [record[name] for name in COUNTS] == [expected[name] for name in COUNTS]
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_a_star_kernel_reuses_workspace_arrays(seed):
+    board, pairs = queries(seed, 6)
+    flat = FlatGrid(board)
+    workspace = SearchWorkspace(board)
+    arrays = workspace.arrays()
+    for start, goal in pairs:
+        # every search stamps the same arrays with a new generation
+        assert workspace.arrays() is arrays
+        path, cost, *_ = a_star_kernel(padding(board), flat.index(*start), flat.index(*goal), *arrays,
+                                       workspace.begin())
+        assert cost == pytest.approx(dijkstra(board, start, goal))
+        if cost >= 0:
+            assert flat.coord(path[0]) == start and flat.coord(path[-1]) == goal
+
+
+@pytest.mark.skipif(njit == None, reason='needs Numba')
+def test_kernels_compile_before_the_timed_run():
+    board = Board(num_islands=10, rows=15, cols=15)
+    board.seed(1)
+    board.generate_board()
+    coord, goal_coord = board.get_open_coords()
+    board.place_single_agent(CompiledAStarAgent, *coord, *goal_coord)
+    # placing the agent compiled both kernels, so the run itself doesn't
+    assert len(a_star_kernel.signatures) == 1 and len(guided_walk_kernel.signatures) == 1
+    board.run_agent(CompiledAStarAgent, coord, goal_coord)
+    board.run_agent(CompiledGuidedLocalSearchAgent, coord, goal_coord)
+    assert len(a_star_kernel.signatures) == 1 and len(guided_walk_kernel.signatures) == 1
@@ -0,0 +1,113 @@
+'''
+Checks of the heuristic, distance and label fields in fields.py.
+'''
+import pytest
+from board import Board
+from agents import AStarAgent, GuidedLocalSearchAgent
+from grid import OBSTACLE, make_grid
+from search import SQRT2
+from fields import METRICS, heuristic_field, distance_field, follow_field, component_labels
+from conftest import queries, dijkstra
+
+
+@pytest.mark.parametrize('metric', METRICS)
+def test_heuristic_field_matches_its_metric(metric):
+    distance = {
+        'euclidean': lambda di, dj: (di ** 2 + dj ** 2) ** (1/2),
+        'octile': lambda di, dj: max(di, dj) + (SQRT2 - 1) * min(di, dj),
+        'manhattan': lambda di, dj: di + dj,
+        'chebyshev': lambda di, dj: max(di, dj),
+    }[metric]
+    field = heuristic_field(7, 9, 2, 5, metric)
+    assert field.shape == (7, 9)
+    assert not field.flags.writeable
+    for i in range(7):
+        for j in range(9):
+            assert field[i, j] == pytest.approx(distance(abs(i - 2), abs(j - 5)))
+
+    with pytest.raises(ValueError):
+        heuristic_field(7, 9, 2, 5, 'cosine')
+
+
+def test_agents_look_their_heuristic_up():
+    agent = AStarAgent(None, 1, 2, 8, 3, make_grid(10, 12))
+    assert agent.heuristic(4, 11) == pytest.approx(((8 - 4) ** 2 + (3 - 11) ** 2) ** (1/2))
+    assert agent.heuristic() == pytest.approx((7 ** 2 + 1) ** (1/2))
+    assert agent.heuristic_calls == 2
+
+
+def test_board_caches_heuristic_fields_per_version():
+    board = Board(rows=10, cols=12)
+    first = board.place_single_agent(AStarAgent, 1, 2, 8, 3)
+    second = board.place_single_agent(AStarAgent, 5, 5, 8, 3)
+    first.heuristic()
+    second.heuristic()
+    # agents placed on the same board with the same goal share one field
+    assert first.field is second.field
+    assert first.field is board.heuristic_field((8, 3), 'euclidean')
+    assert board.heuristic_field((8, 3), 'octile') is not first.field
+
+    board.changed()
+    field = board.heuristic_field((8, 3), 'euclidean')
+    assert field is not first.field
+    assert (field == first.field).all()
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_distance_field_matches_dijkstra(seed):
+    board, pairs = queries(seed, 3)
+    sources = [goal for _, goal in pairs]
+    field = distance_field(board, sources)
+    assert not field.flags.writeable
+    for start, _ in pairs:
+        distances = [d for d in (dijkstra(board, start, source) for source in sources) if d != -1]
+        if not distances:
+            assert field[start] == float('inf')
+            assert follow_field(field, start) == None
+            continue
+        assert field[start] == pytest.approx(min(distances))
+
+        # walking the field downhill is a shortest path to the nearest source
+        path = follow_field(field, start)
+        assert path[0] == start
+        assert path[-1] in sources
+        length = 0
+        for (i, j), (ni, nj) in zip(path, path[1:]):
+            assert max(abs(ni - i), abs(nj - j)) == 1
+            assert board[ni, nj] != OBSTACLE
+            length += ((ni - i) ** 2 + (nj - j) ** 2) ** (1/2)
+        assert length == pytest.approx(field[start])
+
+
+def test_board_caches_distance_fields_per_version():
+    board = Board(rows=12, cols=12)
+    board.seed(1)
+    board.generate_board()
+    field = board.distance_field([(0, 0)])
+    assert board.distance_field([(0, 0)]) is field
+    assert board.distance_field([(0, 0), (11, 11)]) is not field
+
+    board.changed()
+    assert board.distance_field([(0, 0)]) is not field
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_component_labels_match_dijkstra(seed):
+    board, pairs = queries(seed, 6)
+    labels = component_labels(board)
+    assert ((labels == 0) == (board == OBSTACLE)).all()
+    for start, goal in pairs:
+        assert (labels[start] == labels[goal]) == (dijkstra(board, start, goal) != -1)
+
+
+def test_agents_give_up_on_walled_off_goals():
+    board = Board(rows=8, cols=8)
+    board.board[:, 4] = OBSTACLE
+    board.changed()
+    assert not board.reachable((1, 1), (6, 6))
+    assert board.reachable((1, 1), (7, 3))
+
+    agent = board.place_single_agent(GuidedLocalSearchAgent, 1, 1, 6, 6)
+    assert agent.no_solution
+    agent.move(board.board)
+    assert (agent.i, agent.j) == (1, 1)
@@ -0,0 +1,55 @@
+'''
+Checks of the frontiers in frontier.py against plain lists.
+'''
+import random
+from frontier import IndexedPriorityQueue, CoordinateFrontier
+
+
+def test_indexed_priority_queue_pops_lowest_first():
+    rng = random.Random(0)
+    queue = IndexedPriorityQueue()
+    best = {}
+    for _ in range(300):
+        item = rng.randrange(100)
+        priority = rng.randrange(50)
+        queue.push(item, priority)
+        best[item] = min(priority, best.get(item, priority))
+        assert item in queue
+    assert len(queue) == len(best)
+
+    popped = [queue.pop() for _ in range(len(best))]
+    assert sorted(popped) == sorted(best)
+    assert [best[item] for item in popped] == sorted(best.values())
+    assert not queue
+
+
+def test_indexed_priority_queue_breaks_ties_in_order():
+    queue = IndexedPriorityQueue()
+    for item in 'cab':
+        queue.push(item, 1)
+    queue.push('d', 0)
+    # lowering a priority keeps the item's place among equal priorities
+    queue.push('b', 0)
+    queue.push('c', 2)
+    assert [queue.pop() for _ in range(4)] == ['b', 'd', 'c', 'a']
+
+
+def test_coordinate_frontier_pops_the_nearest():
+    rng = random.Random(1)
+    frontier = CoordinateFrontier(capacity=2)
+    cells = []
+    for _ in range(500):
+        if cells and rng.random() < 0.4:
+            i = rng.randrange(20)
+            j = rng.randrange(20)
+            # min takes the first of the nearest cells, the one added first
+            nearest = min(cells, key=lambda cell: (cell[0] - i) ** 2 + (cell[1] - j) ** 2)
+            assert frontier.pop_nearest(i, j) == nearest
+            cells.remove(nearest)
+        else:
+            cell = (rng.randrange(20), rng.randrange(20))
+            frontier.add(cell)
+            if cell not in cells:
+                cells.append(cell)
+        assert len(frontier) == len(cells)
+        assert all(cell in frontier for cell in cells)
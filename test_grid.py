@@ -0,0 +1,43 @@
+'''
+Checks of the bordered grid and flat index neighbors in grid.py.
+'''
+import numpy as np
+import pytest
+from grid import GOAL, OBSTACLE, OCCUPIED, NEIGHBORS, FlatGrid, make_grid, padding
+from conftest import queries
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_flat_neighbors_match_bounds_checks(seed):
+    board, _ = queries(seed, 0)
+    flat = FlatGrid(board)
+    rows, cols = board.shape
+    for i in range(rows):
+        for j in range(cols):
+            expected = [(i + di, j + dj) for di, dj in NEIGHBORS
+                        if 0 <= i + di < rows and 0 <= j + dj < cols and board[i + di, j + dj] < OBSTACLE]
+            assert flat.open_coords(i, j) == expected
+            assert [flat.coord(k) for k in flat.open_neighbors(flat.index(i, j))] == expected
+            assert flat.coord(flat.index(i, j)) == (i, j)
+
+
+def test_flat_grid_sees_the_board_change():
+    board = make_grid(3, 4)
+    flat = FlatGrid(board)
+    board[0, 1] = OBSTACLE
+    assert (0, 1) not in flat.open_coords(1, 1)
+    assert flat.marked_neighbor(1, 1) == None
+    board[2, 2] = GOAL
+    board[0, 0] = OCCUPIED
+    assert flat.marked_neighbor(1, 1) == (2, 2)
+
+
+def test_padding_needs_a_grid_from_make_grid():
+    board = make_grid(3, 4)
+    assert padding(board).shape == (5, 6)
+    assert (padding(board)[[0, -1]] == OBSTACLE).all()
+    assert (padding(board)[:, [0, -1]] == OBSTACLE).all()
+    with pytest.raises(ValueError):
+        padding(np.zeros((3, 4), dtype=np.uint8))
+    with pytest.raises(ValueError):
+        padding(board.copy())
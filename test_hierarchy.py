@@ -0,0 +1,26 @@
+'''
+Checks of the hierarchical paths in hierarchy.py against a_star,
+on random boards from fixed seeds.
+'''
+import pytest
+from hierarchy import ClusterGraph
+from search import a_star
+from conftest import queries, check_path
+
+
+@pytest.mark.parametrize('seed', range(100))
+@pytest.mark.parametrize('cluster_size', (4, 7))
+def test_find_path_is_valid_and_near_optimal(seed, cluster_size):
+    board, pairs = queries(seed)
+    graph = ClusterGraph(board, cluster_size)
+    for start, goal in pairs:
+        result = graph.find_path(start, goal)
+        best = a_star(board, start, goal).cost
+        # paths go through the transition cells, so they can be longer
+        # than the shortest path, but never shorter, and never missing
+        if best == -1:
+            assert result.path == None
+        else:
+            assert result.path != None
+            assert result.cost >= best - 1e-9
+        check_path(board, result, start, goal)
@@ -0,0 +1,116 @@
+'''
+Checks that LocalSearchBatch moves its agents like the agent classes
+in agents.py, on boards from fixed seeds.
+'''
+import random
+import numpy as np
+import pytest
+from board import Board
+from agents import SteepestAscentAgent, GuidedLocalSearchAgent, SimulatedAnnealingAgent, RandomLocalSearchAgent
+from grid import OCCUPIED
+from lockstep import LocalSearchBatch, PairCounts
+
+# moves after which a run that hasn't ended is cut off
+MAX_MOVES = 3000
+
+
+def seeded_board(seed, count, rows=40, cols=40):
+    '''
+    A seeded board without agents, and count start and goal pairs on it
+    '''
+    board = Board(num_islands=40, max_island_size=25, rows=rows, cols=cols)
+    board.seed(seed)
+    board.generate_board()
+    pairs = [board.get_open_coords() for _ in range(count)]
+    board.clear_agents()
+    return board, pairs
+
+
+def walk(cells, start):
+    '''
+    The cells a run moved into, in order
+    '''
+    out = []
+    prev = start
+    for cell in cells:
+        if cell != prev:
+            out.append(cell)
+            prev = cell
+    return out
+
+
+def test_pair_counts_match_a_dict():
+    rng = random.Random(0)
+    table = PairCounts(100, capacity=8)
+    counts = {}
+    for _ in range(500):
+        keys = rng.sample(range(100), rng.randint(1, 60))
+        table.add(np.array(keys, dtype=np.int64))
+        for key in keys:
+            counts[key] = min(counts.get(key, 0), 100) + 1
+        probe = np.array(rng.sample(range(150), 100), dtype=np.int64).reshape(10, 10)
+        assert table.get(probe).tolist() == [[counts.get(key, 0) for key in row] for row in probe.tolist()]
+    assert table.size == len(counts)
+    assert max(counts.values()) == 101
+
+
+@pytest.mark.parametrize('seed', range(10))
+@pytest.mark.parametrize('agent_class', (SteepestAscentAgent, GuidedLocalSearchAgent))
+def test_batch_matches_agents(agent_class, seed):
+    board, pairs = seeded_board(seed, 6)
+    runs = []
+    for start, goal in pairs:
+        board.clear_agents()
+        agent = board.place_single_agent(agent_class, start[0], start[1], goal[0], goal[1])
+        cells = []
+        while not agent.is_goal() and not agent.no_solution and len(cells) < MAX_MOVES:
+            agent.move(board.board)
+            cells.append((agent.i, agent.j))
+        runs.append((walk(cells, tuple(start)), agent.is_goal(), agent.no_solution, agent.heuristic_calls))
+    board.clear_agents()
+
+    before = board.board.copy()
+    batch = LocalSearchBatch(board.board, agent_class, [start for start, _ in pairs], [goal for _, goal in pairs],
+                             collide=False)
+    steps = []
+    while batch.ticks < MAX_MOVES and batch.step():
+        steps.append([tuple(coord) for coord in batch.coords().tolist()])
+    # without collide, the board is never written to
+    assert (board.board == before).all()
+
+    for x, (cells, done, failed, heuristic_calls) in enumerate(runs):
+        assert walk([step[x] for step in steps], tuple(pairs[x][0])) == cells
+        assert batch.done[x] == done
+        assert batch.failed[x] == failed
+        assert batch.heuristic_calls[x] == heuristic_calls
+
+
+@pytest.mark.parametrize('agent_class', list(LocalSearchBatch.rules))
+def test_colliding_agents_never_share_a_cell(agent_class):
+    board, pairs = seeded_board(3, 400)
+    starts = []
+    goals = []
+    for start, goal in pairs:
+        if start not in starts:
+            starts.append(start)
+            goals.append(goal)
+    batch = LocalSearchBatch(board.board, agent_class, starts, goals, seed=1)
+    for _ in range(200):
+        if not batch.step():
+            break
+        coords = [tuple(coord) for coord in batch.coords().tolist()]
+        searching = [coord for coord, done in zip(coords, batch.done) if not done]
+        assert len(set(searching)) == len(searching)
+        assert all(board.board[coord] == OCCUPIED for coord in coords)
+
+
+@pytest.mark.parametrize('agent_class', (SimulatedAnnealingAgent, RandomLocalSearchAgent))
+def test_random_rules_repeat_with_a_seed(agent_class):
+    board, pairs = seeded_board(4, 50)
+    runs = []
+    for _ in range(2):
+        batch = LocalSearchBatch(board.board, agent_class, [start for start, _ in pairs],
+                                 [goal for _, goal in pairs], seed=7, collide=False)
+        batch.run(500)
+        runs.append((batch.coords().tolist(), batch.stats()))
+    assert runs[0] == runs[1]
@@ -0,0 +1,82 @@
+'''
+Checks of the search counts the agents keep for metrics.py.
+'''
+import pytest
+from board import Board
+from search import a_star
+from metrics import COUNTS
+from profiling import Profile
+from agents import (AStarAgent, BidirectionalSearchAgent, SteepestAscentAgent, DelayedImprovementAgent,
+                    SimulatedAnnealingAgent, GuidedLocalSearchAgent, RandomLocalSearchAgent)
+from optimized_agents import (MemoryLookupLocalSearchAgent, CachedGuidedLocalSearchAgent, BidirectionalLocalSearchAgent,
+                              OptimizedLocalSearchAgent, MatrixLookupAStarAgent, SetLookupAStarAgent,
+                              HeapFrontierAStarAgent, CachedAStarAgent, SetLookupCachedAStarAgent, OptimizedAStarAgent,
+                              JPSAStarAgent, BidirectionalAStarAgent, DistanceFieldAgent, DStarLiteAgent, HPAStarAgent)
+from compiled import CompiledAStarAgent, CompiledGuidedLocalSearchAgent
+from multiagent import CooperativeAStarAgent
+from cbs import CBSAgent
+
+AGENTS = (AStarAgent, BidirectionalSearchAgent, SteepestAscentAgent, DelayedImprovementAgent, SimulatedAnnealingAgent,
+          GuidedLocalSearchAgent, RandomLocalSearchAgent, MemoryLookupLocalSearchAgent, CachedGuidedLocalSearchAgent,
+          BidirectionalLocalSearchAgent, OptimizedLocalSearchAgent, MatrixLookupAStarAgent, SetLookupAStarAgent,
+          HeapFrontierAStarAgent, CachedAStarAgent, SetLookupCachedAStarAgent, OptimizedAStarAgent, JPSAStarAgent,
+          BidirectionalAStarAgent, DistanceFieldAgent, DStarLiteAgent, HPAStarAgent, CompiledAStarAgent,
+          CompiledGuidedLocalSearchAgent)
+
+
+def metrics_board(seed=1):
+    board = Board(rows=30, cols=30)
+    board.seed(seed)
+    board.generate_board()
+    return board
+
+
+@pytest.mark.parametrize('agent_class', AGENTS)
+def test_every_agent_counts_its_search(agent_class):
+    board = metrics_board()
+    coord, goal_coord = board.get_open_coords()
+    record = board.run_agent(agent_class, coord, goal_coord)
+    assert record['nodes_expanded'] > 0
+    assert record['nodes_generated'] >= record['peak_frontier'] > 0
+    assert record['peak_visited'] > 0
+
+
+def test_planning_agents_count_their_search_result():
+    board = metrics_board()
+    coord, goal_coord = board.get_open_coords()
+    result = a_star(board.board, coord, goal_coord)
+    record = board.run_agent(OptimizedAStarAgent, coord, goal_coord)
+    assert [record[name] for name in COUNTS] == [result.expanded, result.generated, result.peak_frontier,
+                                                 result.peak_visited]
+
+
+@pytest.mark.parametrize('agent_class', (HeapFrontierAStarAgent, MatrixLookupAStarAgent, GuidedLocalSearchAgent,
+                                         RandomLocalSearchAgent))
+def test_step_agents_expand_one_cell_per_move(agent_class):
+    board = metrics_board()
+    coord, goal_coord = board.get_open_coords()
+    profile = Profile()
+    record = board.run_agent(agent_class, coord, goal_coord, profile)
+    assert record['nodes_expanded'] == profile.calls['move']
+    # every open neighbor is generated once at most
+    assert record['nodes_generated'] <= 8 * record['nodes_expanded']
+
+
+@pytest.mark.parametrize('agent_class', (CooperativeAStarAgent, CBSAgent))
+def test_teams_add_up_the_counts_of_their_agents(agent_class):
+    board = metrics_board()
+    pairs = board.get_open_pairs(3)
+    record = board.run_team(agent_class, pairs)
+    assert record['nodes_expanded'] > 0
+    assert record['nodes_generated'] >= record['peak_frontier'] > 0
+
+
+def test_metrics_come_from_the_timed_run():
+    board = metrics_board()
+    plain = board.test(2, [HeapFrontierAStarAgent, GuidedLocalSearchAgent], seed=5)
+    traced = board.test(2, [HeapFrontierAStarAgent, GuidedLocalSearchAgent], seed=5, metrics=True)
+    for name in ('HeapFrontierAStarAgent', 'GuidedLocalSearchAgent'):
+        for column in COUNTS:
+            assert traced[name + '_' + column] == plain[name + '_' + column]
+        assert all(peak > 0 for peak in traced[name + '_peak_bytes'])
+        assert name + '_peak_bytes' not in plain
@@ -0,0 +1,13 @@
+'''
+Checks that the team plans from multiagent.py never collide,
+on boards from fixed seeds.
+'''
+import pytest
+from multiagent import CooperativeAStarAgent
+from conftest import place_team, check_team
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_prioritized_plans_have_no_conflicts(seed):
+    board = place_team(CooperativeAStarAgent, seed, 12)
+    assert check_team(board, CooperativeAStarAgent)
@@ -0,0 +1,37 @@
+'''
+Checks that parallel.parallel_test gives the same results as Board.test.
+'''
+import random
+from board import Board
+from agents import AStarAgent, GuidedLocalSearchAgent, SimulatedAnnealingAgent
+from parallel import parallel_test
+
+
+AGENTS = [AStarAgent, GuidedLocalSearchAgent, SimulatedAnnealingAgent]
+
+
+def check_same_records(parallel, serial, agents):
+    assert set(parallel) == set(serial)
+    for key in serial:
+        if key in (agent.__name__ for agent in agents):
+            # times differ from run to run, but not which problems were solved
+            assert [time == -1 for time in parallel[key]] == [time == -1 for time in serial[key]]
+        else:
+            assert parallel[key] == serial[key]
+
+
+def test_parallel_test_matches_test():
+    board = Board(rows=20, cols=20)
+    serial = board.test(4, AGENTS, seed=11)
+    parallel = parallel_test(board, 4, AGENTS, seed=11, workers=2)
+    check_same_records(parallel, serial, AGENTS)
+
+
+def test_unseeded_parallel_test_draws_its_seed():
+    board = Board(rows=20, cols=20)
+    random.seed(4)
+    parallel = parallel_test(board, 3, AGENTS, workers=2)
+    # without a seed, parallel_test takes its base seed from the random module
+    random.seed(4)
+    serial = board.test(3, AGENTS, seed=random.randrange(2 ** 32))
+    check_same_records(parallel, serial, AGENTS)
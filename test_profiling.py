@@ -0,0 +1,63 @@
+'''
+Checks of the phase timers in profiling.py.
+'''
+import heapq
+from board import Board
+from frontier import IndexedPriorityQueue, CoordinateFrontier
+from agents import BidirectionalSearchAgent, GuidedLocalSearchAgent
+from optimized_agents import HeapFrontierAStarAgent, OptimizedAStarAgent
+from multiagent import CooperativeAStarAgent
+from profiling import Profile, NO_PROFILE, PHASES
+
+
+def profile_board():
+    board = Board(rows=30, cols=30)
+    board.seed(1)
+    board.generate_board()
+    return board
+
+
+def profile_run(agent_class, profile=None):
+    board = profile_board()
+    coord, goal_coord = board.get_open_coords()
+    if profile == None:
+        profile = Profile()
+    record = board.run_agent(agent_class, coord, goal_coord, profile)
+    return record, profile.record()
+
+
+def test_phases_are_counted():
+    record, phases = profile_run(HeapFrontierAStarAgent)
+    assert phases['profile_queue_push_calls'] > 0
+    assert phases['profile_open_moves_calls'] == phases['profile_move_calls']
+    assert profile_run(BidirectionalSearchAgent)[1]['profile_frontier_add_calls'] > 0
+    assert profile_run(OptimizedAStarAgent)[1]['profile_search_calls'] == 1
+    assert profile_run(GuidedLocalSearchAgent)[1]['profile_get_choice_calls'] > 0
+
+
+def test_every_phase_has_a_column():
+    _, phases = profile_run(GuidedLocalSearchAgent)
+    assert sorted(phases) == sorted(['profile_' + phase + '_' + unit for phase in PHASES for unit in ('calls', 'ms')])
+    assert phases['profile_move_ms'] >= phases['profile_get_choice_ms'] > 0
+
+
+def test_team_planning_is_timed():
+    board = profile_board()
+    pairs = board.get_open_pairs(3)
+    profile = Profile()
+    board.run_team(CooperativeAStarAgent, pairs, profile)
+    assert profile.calls['search'] == 1
+    assert profile.calls['move'] > 0
+
+
+def test_unprofiled_runs_match_and_patch_nothing():
+    def functions():
+        return (heapq.heappush, heapq.heappop, dict(vars(IndexedPriorityQueue)), dict(vars(CoordinateFrontier)),
+                dict(vars(HeapFrontierAStarAgent)))
+    before = functions()
+    profiled, _ = profile_run(HeapFrontierAStarAgent)
+    unprofiled, phases = profile_run(HeapFrontierAStarAgent, NO_PROFILE)
+    assert functions() == before
+    assert phases == {}
+    assert profiled['path_cost'] == unprofiled['path_cost']
+    assert profiled['heuristic_calls'] == unprofiled['heuristic_calls']
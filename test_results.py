@@ -0,0 +1,45 @@
+'''
+Checks of the results files in results.py.
+'''
+from board import Board
+from agents import AStarAgent, GuidedLocalSearchAgent
+from results import ResultsSink, iter_records, load_results
+
+AGENTS = [AStarAgent, GuidedLocalSearchAgent]
+
+
+def test_sink_records_load_back(tmp_path):
+    path = str(tmp_path / 'results.jsonl')
+    board = Board(rows=15, cols=15)
+    data = board.test(3, AGENTS, seed=5)
+    sink = ResultsSink(path)
+    assert board.test(3, AGENTS, seed=5, sink=sink, run='a') == None
+    sink.close()
+
+    loaded = load_results(path, 'a', AGENTS)
+    assert set(loaded) == set(data)
+    for key in data:
+        if key in (agent.__name__ for agent in AGENTS):
+            assert [time == -1 for time in loaded[key]] == [time == -1 for time in data[key]]
+        else:
+            assert loaded[key] == data[key]
+
+
+def test_sink_skips_completed_records(tmp_path):
+    path = str(tmp_path / 'results.jsonl')
+    board = Board(rows=15, cols=15)
+    sink = ResultsSink(path)
+    board.test(2, AGENTS, seed=5, sink=sink, run='a')
+    sink.close()
+    # a crash while writing leaves a partial last line
+    with open(path, 'a') as f:
+        f.write('{"run": "a", "iter')
+
+    sink = ResultsSink(path)
+    assert sink.completed('a', 1, 'AStarAgent')
+    assert not sink.completed('a', 2, 'AStarAgent')
+    board.test(3, AGENTS, seed=5, sink=sink, run='a')
+    sink.close()
+
+    records = [(record['iteration'], record['agent']) for record in iter_records(path, 'a')]
+    assert records == [(i, agent.__name__) for i in range(3) for agent in AGENTS]
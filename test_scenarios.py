@@ -0,0 +1,30 @@
+'''
+Checks of the scenario files in scenarios.py.
+'''
+from board import Board
+from agents import AStarAgent
+from scenarios import ScenarioFile, generate_scenarios, write_scenarios
+
+
+def test_scenario_file_round_trip(tmp_path):
+    board = Board(num_islands=15, rows=20, cols=20)
+    path = str(tmp_path / 'boards.scen')
+    write_scenarios(path, board, 5, seed=3)
+
+    scenarios = ScenarioFile(path)
+    assert len(scenarios) == 5
+    assert (scenarios.rows, scenarios.cols) == (20, 20)
+    for k, (grid, coord, goal_coord) in enumerate(generate_scenarios(board, 5, seed=3)):
+        assert (scenarios.board(k) == grid).all()
+        assert scenarios.coords_for(k) == [coord, goal_coord]
+
+
+def test_replaying_scenarios_matches_a_seeded_test(tmp_path):
+    board = Board(num_islands=15, rows=20, cols=20)
+    path = str(tmp_path / 'boards.scen')
+    write_scenarios(path, board, 4, seed=3)
+
+    replayed = board.test(4, [AStarAgent], scenarios=ScenarioFile(path))
+    seeded = board.test(4, [AStarAgent], seed=3)
+    assert replayed['AStarAgent_path_cost'] == seeded['AStarAgent_path_cost']
+    assert replayed['AStarAgent_heuristic_calls'] == seeded['AStarAgent_heuristic_calls']
@@ -0,0 +1,109 @@
+'''
+Checks of the searches in search.py against a plain Dijkstra search,
+on random boards from fixed seeds.
+'''
+import random
+import pytest
+from grid import FREE, OBSTACLE
+from search import DStarLite, WorkspacePool, a_star, bidirectional_a_star, jump_point_search
+from conftest import random_board, open_cell, queries, check_path, dijkstra
+
+
+@pytest.mark.parametrize('seed', range(100))
+def test_a_star_matches_dijkstra(seed):
+    board, pairs = queries(seed)
+    for start, goal in pairs:
+        result = a_star(board, start, goal)
+        assert result.cost == pytest.approx(dijkstra(board, start, goal))
+        check_path(board, result, start, goal)
+
+
+@pytest.mark.parametrize('seed', range(100))
+def test_jump_point_search_matches_dijkstra(seed):
+    board, pairs = queries(seed)
+    for start, goal in pairs:
+        result = jump_point_search(board, start, goal)
+        assert result.cost == pytest.approx(dijkstra(board, start, goal))
+        check_path(board, result, start, goal)
+
+
+@pytest.mark.parametrize('seed', range(100))
+def test_bidirectional_a_star_matches_dijkstra(seed):
+    board, pairs = queries(seed)
+    for start, goal in pairs:
+        result = bidirectional_a_star(board, start, goal)
+        assert result.cost == pytest.approx(dijkstra(board, start, goal))
+        check_path(board, result, start, goal)
+
+
+def d_star_cost(planner):
+    cost = planner.cost()
+    if cost == float('inf'):
+        return -1
+    return cost
+
+
+@pytest.mark.parametrize('seed', range(100))
+def test_d_star_lite_matches_dijkstra(seed):
+    board, pairs = queries(seed)
+    for start, goal in pairs:
+        planner = DStarLite(board, start, goal)
+        planner.compute()
+        assert d_star_cost(planner) == pytest.approx(dijkstra(board, start, goal))
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_d_star_lite_repairs_match_dijkstra(seed):
+    board, [(start, goal)] = queries(seed, 1)
+    rng = random.Random(seed)
+    rows, cols = board.shape
+    planner = DStarLite(board, start, goal)
+    planner.compute()
+    for _ in range(5):
+        # walk a few steps, then flip some cells away from the walker and the goal
+        for _ in range(rng.randint(0, 3)):
+            step = planner.next_step()
+            if planner.cost() == float('inf') or step == None or start == goal:
+                break
+            start = step
+            planner.move_to(start)
+
+        changed = []
+        for _ in range(rng.randint(1, 6)):
+            cell = (rng.randrange(rows), rng.randrange(cols))
+            if cell != start and cell != goal and cell not in changed:
+                board[cell] = FREE if board[cell] == OBSTACLE else OBSTACLE
+                changed.append(cell)
+        planner.update_cells(board, changed)
+        assert d_star_cost(planner) == pytest.approx(dijkstra(board, start, goal))
+
+
+def test_workspace_pool_reuses_workspaces():
+    board, _ = queries(0, 0)
+    pool = WorkspacePool(max_idle=1)
+    first = pool.acquire(board)
+    second = pool.acquire(board)
+    assert first is not second
+    pool.release(first)
+    # only max_idle workspaces are kept
+    pool.release(second)
+    assert pool.acquire(board) is first
+    assert pool.acquire(board) is not second
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_reused_workspaces_match_dijkstra(seed):
+    rng = random.Random(seed)
+    pool = WorkspacePool()
+    # every board has the same size, so they all share one workspace
+    for _ in range(5):
+        board = random_board(rng, 12, 15, 0.3)
+        workspace = pool.acquire(board)
+        for _ in range(4):
+            start = open_cell(rng, board)
+            goal = open_cell(rng, board)
+            for algorithm in (a_star, jump_point_search, bidirectional_a_star):
+                result = algorithm(board, start, goal, workspace=workspace)
+                assert result.cost == pytest.approx(dijkstra(board, start, goal))
+                check_path(board, result, start, goal)
+        pool.release(workspace)
@@ -1,17 +1,24 @@
 from board import Board
+from parallel import parallel_test
+from scenarios import ScenarioFile, write_scenarios
+from results import ResultsSink, iter_records, iter_data, load_results, average_times, fastest_counts, solved_counts, time_summaries, metric_averages
+from metrics import METRICS
+import os
 from agents import *
 from optimized_agents import *
 from matplotlib import pyplot as plt
-from statistics import stdev, mean, median
+from statistics import mean, median
 
-def performanceLinechart(agents, iterations, board, fname, data=None):
+def performanceLinechart(agents, iterations, board, fname, data=None, results=None, run=None):
     '''
     This function generates a line chart of the performance of each agent
     for a given board and number of iterations. The results of the tests
     are saved to the /test_results/single_runs/{fname} file.
+
+    Instead of data, a results file written by a ResultsSink can be given,
+    along with the run to draw. That run is loaded into memory.
     '''
-    if data == None:
-        data = board.test(iterations, agents)
+    data = testData(agents, iterations, board, data, results, run)
 
     bar_labels = list(map(lambda agent: agent.__name__, agents))
     plt.figure(figsize=(12, 6))
@@ -34,28 +41,40 @@ def performanceLinechart(agents, iterations, board, fname, data=None):
     plt.savefig(f'./test_results/single_runs/{fname}')
 
 
-def averagePerformanceBarChart(agents, iterations, board, fname, data=None):
+def testData(agents, iterations, board, data, results, run):
     '''
-    This function generates a bar chart of the AVERAGE performance of each agent
-    for a given board and number of iterations. The results of the tests
-    are saved to the /test_results/averages/{fname} file.
+    Return the data to build a chart from, as returned by Board.test:
+    the given run loaded from the results file, the given data, or a fresh test.
+    '''
+    if results != None:
+        return load_results(results, run, agents)
+    if data == None:
+        data = board.test(iterations, agents)
+    return data
+
 
+def testRecords(agents, iterations, board, data, results, run):
     '''
+    Return the records to build a chart from: the given results file read
+    one record at a time, the given data, or a fresh test.
+    '''
+    if results != None:
+        return iter_records(results, run)
     if data == None:
         data = board.test(iterations, agents)
+    return iter_data(data, agents)
 
-    averages = {}
-    for agent in agents:
-        total = 0
-        items = 0
-        for item in data[agent.__name__]:
-            if item > 0:
-                total += item
-                items += 1
-        if items > 0:
-            averages[agent.__name__] = total / items
-        else:
-            averages[agent.__name__] = 0
+
+def averagePerformanceBarChart(agents, iterations, board, fname, data=None, results=None, run=None):
+    '''
+    This function generates a bar chart of the AVERAGE performance of each agent
+    for a given board and number of iterations. The results of the tests
+    are saved to the /test_results/averages/{fname} file.
+
+    Instead of data, a results file written by a ResultsSink can be given,
+    optionally only using the records of a single run.
+    '''
+    averages = average_times(testRecords(agents, iterations, board, data, results, run), agents)
     
     print(board.rows, board.cols)
     plt.figure(figsize=(12, 6))
@@ -67,35 +86,16 @@ def averagePerformanceBarChart(agents, iterations, board, fname, data=None):
     plt.savefig(f'./test_results/averages/{fname}')
 
 
-def fastestSolutionBarChart(agents, iterations, board, fname, data=None):
+def fastestSolutionBarChart(agents, iterations, board, fname, data=None, results=None, run=None):
     '''
     This function generates a bar chart of the number of FASTEST solutions found by each agent
     for a given board and number of iterations. The results of the tests
     are saved to the /test_results/fastest/{fname} file.
-    '''
-    if data == None:
-        data = board.test(iterations, agents)
-
-    fastest = {}
-    for i in range(iterations):
-        current_fastest = float('inf')
-        current_fastest_agent = None
-
-        for agent in agents:
-            if data[agent.__name__][i] < current_fastest and data[agent.__name__][i] > 0:
-                current_fastest = data[agent.__name__][i]
-                current_fastest_agent = agent.__name__
-
-        if current_fastest_agent:
-            if current_fastest_agent in fastest:
-                fastest[current_fastest_agent] += 1
-            else:
-                fastest[current_fastest_agent] = 1
-
-    for agent in agents:
-        if agent.__name__ not in fastest:
-            fastest[agent.__name__] = 0
 
+    Instead of data, a results file written by a ResultsSink can be given,
+    optionally only using the records of a single run.
+    '''
+    fastest = fastest_counts(testRecords(agents, iterations, board, data, results, run), agents)
 
     plt.figure(figsize=(12, 6))
     plt.bar(fastest.keys(), fastest.values())
@@ -106,7 +106,7 @@ def fastestSolutionBarChart(agents, iterations, board, fname, data=None):
     plt.savefig(f'./test_results/fastest/{fname}')
 
 
-def heuristicCallsBarChart(agents, iterations, board, fname, data=None):
+def heuristicCallsBarChart(agents, iterations, board, fname, data=None, results=None, run=None):
     '''
     This function generates a line chart of the # of times each agent called their heuristic function
     for a given board and number of iterations. The results of the tests
@@ -114,9 +114,11 @@ def heuristicCallsBarChart(agents, iterations, board, fname, data=None):
 
     This testing method is not the most optimal, since the charts it produces are not very useful.
     Instead, this method is used to print the mean and median number of heuristic calls for each agent.
+
+    Instead of data, a results file written by a ResultsSink can be given,
+    along with the run to draw. That run is loaded into memory.
     '''
-    if data == None:
-        data = board.test(iterations, agents)
+    data = testData(agents, iterations, board, data, results, run)
 
     bar_labels = list(map(lambda agent: agent.__name__, agents))
     plt.figure(figsize=(12, 6))
@@ -140,27 +142,16 @@ def heuristicCallsBarChart(agents, iterations, board, fname, data=None):
     plt.savefig(f'./test_results/heuristic_calls/{fname}')
 
 
-def problemsSolvedBarChart(agents, iterations, board, fname, data=None):
+def problemsSolvedBarChart(agents, iterations, board, fname, data=None, results=None, run=None):
     '''
     This function generates a bar chart of the number of problems solved by each agent
     for a given board and number of iterations. The results of the tests
     are saved to the /test_results/problems_solved/{fname} file.
-    '''
-    if data == None:
-        data = board.test(iterations, agents)
-
-    out = {}
-    for i in range(iterations):
-        for agent in agents:
-            if data[agent.__name__][i] > 0:
-                if agent.__name__ in out:
-                    out[agent.__name__] += 1
-                else:
-                    out[agent.__name__] = 1
 
-    for agent in agents:
-        if agent.__name__ not in out:
-            out[agent.__name__] = 0
+    Instead of data, a results file written by a ResultsSink can be given,
+    optionally only using the records of a single run.
+    '''
+    out = solved_counts(testRecords(agents, iterations, board, data, results, run), agents)
 
     plt.figure(figsize=(12, 6))
     plt.bar(out.keys(), out.values())
@@ -171,24 +162,71 @@ def problemsSolvedBarChart(agents, iterations, board, fname, data=None):
     plt.savefig(f'./test_results/problems_solved/{fname}')
 
 
-def testIncreasingBoardSize(agents, fname):
+def testIncreasingBoardSize(agents, fname, workers=1, seed=None, scenario_dir=None, results=None, metrics=False):
     '''
     Run a set of tests with 10 increasing board sizes.
 
     Test from 10x10 to 1000x1000
+
+    With more than one worker, the iterations for each board size are
+    spread over a process pool with parallel_test.
+
+    With a scenario_dir, each board size replays the scenario file
+    {scenario_dir}/board_{size}.scen, which is generated from the seed
+    the first time it is needed.
+
+    With a results file, every record is streamed to it as it completes, with
+    board_{size} as its run, and a restarted test skips the records that are
+    already there. Give it a seed or a scenario_dir so the boards match.
+
+    With metrics, the runs are also traced for their peak_bytes (see
+    metrics.py), and the average of each metric over board size is saved
+    with metricsLinechart to /test_results/increasing_board/metrics_{fname}.
     '''
     out = {}
+    metric_out = {agent.__name__: {metric: [] for metric in METRICS} for agent in agents}
+    sink = None
+    if results != None:
+        sink = ResultsSink(results)
+
     ranges = [10, 20, 30, 40, 50, 60, 70, 80, 90, 100, 110, 120, 130, 140, 150, 160, 170, 180, 190, 200, 210, 220, 230, 240, 250, 260, 270, 280, 290, 300]
 
     for i in range(len(ranges)):
         print(f'Board: {ranges[i]}x{ranges[i]}')
         board = Board(rows=ranges[i], cols=ranges[i], num_islands=int(ranges[i] * ranges[i] * (1/50)), min_island_size=1, max_island_size=15)
-        data = board.test(100, agents)
+
+        scenarios = None
+        if scenario_dir != None:
+            path = os.path.join(scenario_dir, f'board_{ranges[i]}.scen')
+            if not os.path.exists(path):
+                os.makedirs(scenario_dir, exist_ok=True)
+                write_scenarios(path, board, 100, seed or 0)
+            scenarios = ScenarioFile(path)
+
+        run = f'board_{ranges[i]}'
+        if workers > 1:
+            data = parallel_test(board, 100, agents, seed=seed, workers=workers, scenarios=scenarios, sink=sink, run=run,
+                                 metrics=metrics)
+        else:
+            data = board.test(100, agents, seed=seed, scenarios=scenarios, sink=sink, run=run, metrics=metrics)
+
+        if sink != None:
+            summaries = time_summaries(iter_records(results, run), agents).get(run, {})
+        else:
+            summaries = time_summaries(iter_data(data, agents), agents).get(None, {})
+
+        if metrics:
+            if sink != None:
+                averages = metric_averages(iter_records(results, run), agents, METRICS).get(run, {})
+            else:
+                averages = metric_averages(iter_data(data, agents, METRICS), agents, METRICS).get(None, {})
+            for agent in agents:
+                for metric in METRICS:
+                    metric_out[agent.__name__][metric].append(averages.get(agent.__name__, {}).get(metric, 0))
         for agent in agents:
-            nonzero = list(filter(lambda x: x > 0, data[agent.__name__]))
-            standard_dev = stdev(nonzero) * 0.2
-            if len(nonzero) > 0:
-                average = mean(nonzero)
+            if agent.__name__ in summaries:
+                average, standard_dev = summaries[agent.__name__]
+                standard_dev = standard_dev * 0.2
 
                 if agent.__name__ in out:
                     out[agent.__name__]['y1'].append(average - standard_dev)
@@ -201,6 +239,9 @@ def testIncreasingBoardSize(agents, fname):
                         'y3': [average]
                     }
 
+    if sink != None:
+        sink.close()
+
     plt.figure(figsize=(12, 6))
 
     for agent in agents:
@@ -213,6 +254,39 @@ def testIncreasingBoardSize(agents, fname):
     plt.legend()
     plt.savefig(f'./test_results/increasing_board/{fname}')    
 
+    if metrics:
+        metricsLinechart(agents, ranges, metric_out, f'metrics_{fname}')
+
+
+def metricsLinechart(agents, ranges, averages, fname):
+    '''
+    This function generates one line chart per metric from metrics.py, of the
+    average value of each agent over increasing board size. averages holds
+    {agent name: {metric: [average for each board size]}}, as collected by
+    testIncreasingBoardSize. The charts are saved to the
+    /test_results/increasing_board/{fname} file.
+
+    Unlike times, the metrics don't change with the machine or the load on
+    it, so these charts show how the agents scale.
+    '''
+    labels = {
+        'nodes_expanded': 'Nodes Expanded',
+        'nodes_generated': 'Nodes Generated',
+        'peak_frontier': 'Peak Frontier Size',
+        'peak_visited': 'Peak Visited Cells',
+        'peak_bytes': 'Peak Memory (bytes)',
+    }
+    fig, axes = plt.subplots(1, len(METRICS), figsize=(6 * len(METRICS), 6))
+    for ax, metric in zip(axes, METRICS):
+        for agent in agents:
+            ax.plot(ranges, averages[agent.__name__][metric], label=agent.__name__)
+        ax.set_xlabel('Board Size (n x n)')
+        ax.set_ylabel(f'Average {labels[metric]}')
+        ax.set_title(labels[metric])
+    axes[0].legend()
+    fig.suptitle('Agent Search Metrics Over Increasing Board Size')
+    fig.savefig(f'./test_results/increasing_board/{fname}')
+
 
 def main():
     '''
@@ -229,7 +303,7 @@ def main():
     agents = [GuidedLocalSearchAgent, BidirectionalLocalSearchAgent, CachedGuidedLocalSearchAgent, OptimizedLocalSearchAgent]
 
     # list of a* agents
-    # agents = [AStarAgent, MatrixLookupAStarAgent, SetLookupAStarAgent, CachedAStarAgent, OptimizedAStarAgent]
+    # agents = [AStarAgent, MatrixLookupAStarAgent, SetLookupAStarAgent, CachedAStarAgent, OptimizedAStarAgent, JPSAStarAgent, BidirectionalAStarAgent, HPAStarAgent]
 
     iterations = 100
     board = b2